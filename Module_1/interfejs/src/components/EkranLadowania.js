@@ -9,7 +9,7 @@ function EkranLadowania() {
 
   useEffect(() => {
     const interval = setInterval(() => {
-      fetch("http://localhost:8002/api/documents/")
+      fetch("http://localhost:8002/api/documents/?fields=analysisResult.detectedItems")
         .then((res) => res.json())
         .then((dane) => {
           const lista = dane.documents || [];
@@ -1,14 +1,68 @@
+import csv
+import io
 import json
 from enum import Enum
 import re
+from typing import BinaryIO, Iterable, Iterator, Optional
 from starlette.datastructures import UploadFile
 from pypdf import PdfReader
 from docx import Document
-import pandas as pd
+from openpyxl import load_workbook
 import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
 
 
+def pdf_page_count(stream: BinaryIO) -> int:
+    return len(PdfReader(stream).pages)
+
+
+def iter_pdf_pages(stream: BinaryIO, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Yields the raw text of the PDF pages start..stop-1 one page at a time."""
+    reader = PdfReader(stream)
+    stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+    for number in range(start, stop):
+        yield reader.pages[number].extract_text() or ''
+
+
+def _row_text(values: Iterable) -> str:
+    return " ".join(str(value) for value in values if value is not None and value != "")
+
+
+def iter_xlsx_rows(stream: BinaryIO) -> Iterator[str]:
+    """Yields the text of every non-empty row of every sheet, reading the workbook row by row."""
+    # read_only - arkusze są parsowane strumieniowo, bez wczytywania wszystkich komórek do pamięci
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            for values in sheet.iter_rows(values_only=True):
+                text = _row_text(values)
+                if text:
+                    yield text
+    finally:
+        workbook.close()
+
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[str]:
+    """Yields the text of every non-empty CSV row, decoding and parsing the file row by row."""
+    reader = csv.reader(io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline=""))
+    for values in reader:
+        text = _row_text(values)
+        if text:
+            yield text
+
+
+def join_normalized(parts: Iterable[str]) -> str:
+    """Joins the parts with single spaces, normalizing whitespace part by part."""
+    buffer = io.StringIO()
+    for part in parts:
+        text = " ".join(part.split())
+        if text:
+            if buffer.tell():
+                buffer.write(" ")
+            buffer.write(text)
+    return buffer.getvalue()
+
+
 class FileConversion:
     class TypeOfFile(Enum):
         DOCX = "DOCX"
@@ -61,31 +115,13 @@ class FileConversion:
         return clean_text
 
     def __extract_xlsx(self) -> str:
-        df = pd.read_excel(self.__file.file, sheet_name=None)
-
-        text = ""
-        for sheet in df.values():
-            text += " ".join(sheet.astype(str).fillna("").values.flatten())
-
-        clean_text = re.sub(r'\s+', ' ', text).strip()
-        del df
-        return clean_text
+        return join_normalized(iter_xlsx_rows(self.__file.file))
 
     def __extract_csv(self) -> str:
-        df = pd.read_csv(self.__file.file)
-        text = " ".join(df.astype(str).fillna("").values.flatten())
-        clean_text = re.sub(r'\s+', ' ', text).strip()
-        del df
-        return clean_text
+        return join_normalized(iter_csv_rows(self.__file.file))
 
     def __extract_pdf(self) -> str:
-        reader = PdfReader(self.__file.file)
-        text = ''
-        for page in reader.pages:
-            text += page.extract_text()
-
-        clean_text = re.sub(r'\s+', ' ', text).strip()
-        return clean_text
+        return join_normalized(iter_pdf_pages(self.__file.file))
 
     def __extract_html(self) -> str:
         soup = BeautifulSoup(self.__file.file, 'html.parser')
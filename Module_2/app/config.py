@@ -1,3 +1,5 @@
+import os
+
 MAX_FILE_SIZE_MB = 10
 MAX_FILE_SIZE = MAX_FILE_SIZE_MB * 1024 * 1024
 ALLOWED_EXTS = ['docx', 'pdf', 'xlsx', 'csv', 'html', 'txt', 'json', 'xml']
@@ -10,4 +12,26 @@ ALLOWED_CONTENT_TYPES = [
     "text/plain",                                                               # .txt
     "application/json",                                                        # .json
     "application/xml"                                                          # .xml
-]
\ No newline at end of file
+]
+# Ekstrakcja tekstu w puli procesów (pypdf, python-docx, openpyxl i BeautifulSoup są synchroniczne i obciążają CPU)
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", os.cpu_count() or 1))
+# Po tylu zadaniach proces roboczy jest zastępowany nowym (ogranicza narastanie zużycia pamięci)
+EXTRACTION_MAX_TASKS_PER_WORKER = int(os.getenv("EXTRACTION_MAX_TASKS_PER_WORKER", 50))
+# Limit czasu CPU jednego zadania ekstrakcji w sekundach (0 - bez limitu)
+EXTRACTION_CPU_TIME_LIMIT = int(os.getenv("EXTRACTION_CPU_TIME_LIMIT", 60))
+# Limit czasu (w sekundach) ekstrakcji całego dokumentu dzielonego na wiele zadań, np. PDF (0 - bez limitu)
+EXTRACTION_DOCUMENT_TIME_LIMIT = float(os.getenv("EXTRACTION_DOCUMENT_TIME_LIMIT", 180))
+
+# Pobieranie stron internetowych (wspólna pula połączeń httpx)
+WEB_CONNECT_TIMEOUT = float(os.getenv("WEB_CONNECT_TIMEOUT", 5))
+WEB_READ_TIMEOUT = float(os.getenv("WEB_READ_TIMEOUT", 15))
+WEB_MAX_CONNECTIONS = int(os.getenv("WEB_MAX_CONNECTIONS", 20))
+WEB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("WEB_MAX_KEEPALIVE_CONNECTIONS", 10))
+WEB_MAX_REDIRECTS = int(os.getenv("WEB_MAX_REDIRECTS", 5))
+# Maksymalny rozmiar pobieranej strony - pobieranie jest przerywane po jego przekroczeniu
+WEB_MAX_BYTES = int(os.getenv("WEB_MAX_BYTES", MAX_FILE_SIZE))
+
+# Ekstrakcja PDF stronami: dokumenty o większej liczbie stron dzielone są na zakresy przetwarzane równolegle
+PDF_PAGES_PER_JOB = int(os.getenv("PDF_PAGES_PER_JOB", 8))
+# Ekstrakcja CSV/XLSX partiami wierszy: plik czytany jednokrotnie przez jeden proces, każda partia to osobna linia strumienia NDJSON
+SPREADSHEET_ROWS_PER_BATCH = int(os.getenv("SPREADSHEET_ROWS_PER_BATCH", 20000))
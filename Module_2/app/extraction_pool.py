@@ -0,0 +1,257 @@
+import asyncio
+import collections
+import contextlib
+import io
+import itertools
+import math
+import multiprocessing
+import queue
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+try:
+    import resource
+except ImportError:  # brak modułu resource (Windows) - limit czasu CPU nie jest egzekwowany
+    resource = None
+
+from starlette.datastructures import UploadFile
+
+from FileConversion.converter import (
+    FileConversion, iter_csv_rows, iter_pdf_pages, iter_xlsx_rows, join_normalized, pdf_page_count,
+)
+from app.config import (
+    EXTRACTION_WORKERS, EXTRACTION_MAX_TASKS_PER_WORKER, EXTRACTION_CPU_TIME_LIMIT, EXTRACTION_DOCUMENT_TIME_LIMIT,
+    PDF_PAGES_PER_JOB, SPREADSHEET_ROWS_PER_BATCH,
+)
+
+# Ekstrakcja tekstu wykonywana w osobnych procesach, dzięki czemu duży plik nie blokuje pętli
+# zdarzeń (i innych żądań). Procesy są odnawiane po max_tasks_per_child zadaniach, a każde zadanie
+# ma limit czasu CPU (RLIMIT_CPU) - po jego przekroczeniu proces dostaje SIGXCPU, przerywający zadanie.
+# Sygnał jest obsługiwany między instrukcjami Pythona, więc długie wywołanie w kodzie C kończy się przed przerwaniem.
+
+
+class ExtractionCpuTimeExceeded(Exception):
+    """Raised when an extraction job uses more CPU time than allowed."""
+
+
+class ExtractionTimeExceeded(Exception):
+    """Raised when the extraction of a document split into several jobs exceeds the document time limit."""
+
+
+class ExtractionWorkerCrashed(Exception):
+    """Raised when the worker process running an extraction job died (e.g. out of memory)."""
+
+
+def _cpu_time_exceeded(signum, frame):
+    raise ExtractionCpuTimeExceeded("Extraction exceeded the CPU time limit.")
+
+
+def _run_with_cpu_limit(cpu_time_limit: int, fn: Callable, *args) -> Any:
+    """Runs fn(*args) in the worker, interrupting it after cpu_time_limit seconds of CPU time."""
+    if not cpu_time_limit or resource is None:
+        return fn(*args)
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # RLIMIT_CPU dotyczy całego procesu, więc limit zadania liczony jest od dotychczasowego zużycia
+    job_limit = math.ceil(usage.ru_utime + usage.ru_stime) + cpu_time_limit
+    if hard != resource.RLIM_INFINITY:
+        job_limit = min(job_limit, hard)
+
+    previous_handler = signal.signal(signal.SIGXCPU, _cpu_time_exceeded)
+    resource.setrlimit(resource.RLIMIT_CPU, (job_limit, hard))
+    try:
+        return fn(*args)
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+        signal.signal(signal.SIGXCPU, previous_handler)
+
+
+def extract_text(content: bytes, extension: str, content_type: str) -> str:
+    """Extracts text from the file content (executed in a worker process)."""
+    file = UploadFile(file=io.BytesIO(content), size=len(content))
+    return FileConversion(file, extension, content_type).get_text()
+
+
+def count_pdf_pages(content: bytes) -> int:
+    """Returns the number of pages of the PDF (executed in a worker process)."""
+    return pdf_page_count(io.BytesIO(content))
+
+
+def extract_pdf_range(content: bytes, start: int, stop: int) -> List[str]:
+    """Extracts the raw text of the PDF pages start..stop-1 (executed in a worker process)."""
+    return list(iter_pdf_pages(io.BytesIO(content), start, stop))
+
+
+SPREADSHEET_ROW_READERS = {"csv": iter_csv_rows, "xlsx": iter_xlsx_rows}
+
+# Odstęp (s) sprawdzania, czy proces roboczy czytający arkusz nie zakończył się bez znacznika końca
+SPREADSHEET_BATCH_POLL_INTERVAL = 0.5
+
+
+def stream_spreadsheet_rows(content: bytes, extension: str, rows_per_batch: int, batches: Any) -> int:
+    """
+    Reads the CSV/XLSX file once, putting the text of every rows_per_batch non-empty rows on the
+    batches queue, followed by None (executed in a worker process). Returns the number of batches.
+    """
+    count = 0
+    try:
+        with contextlib.closing(SPREADSHEET_ROW_READERS[extension](io.BytesIO(content))) as rows:
+            while True:
+                batch = list(itertools.islice(rows, rows_per_batch))
+                if not batch:
+                    break
+                batches.put(join_normalized(batch))
+                count += 1
+    finally:
+        # Znacznik końca również po błędzie (np. przekroczony limit CPU), aby odbiorca nie czekał dalej
+        batches.put(None)
+    return count
+
+
+class ExtractionPool:
+    def __init__(
+        self,
+        workers: int = EXTRACTION_WORKERS,
+        max_tasks_per_child: int = EXTRACTION_MAX_TASKS_PER_WORKER,
+        cpu_time_limit: int = EXTRACTION_CPU_TIME_LIMIT,
+        document_time_limit: float = EXTRACTION_DOCUMENT_TIME_LIMIT,
+    ):
+        self.workers = max(1, workers)
+        self.max_tasks_per_child = max_tasks_per_child
+        self.cpu_time_limit = cpu_time_limit
+        self.document_time_limit = document_time_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager: Optional[Any] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Pula tworzona przy pierwszym użyciu; 'spawn' jest wymagany przez max_tasks_per_child
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_child or None,
+            )
+        return self._executor
+
+    def _get_manager(self) -> Any:
+        # Proces menedżera (kolejki partii arkuszy) uruchamiany przy pierwszym użyciu
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Runs fn(*args) in a worker process under the CPU time limit."""
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, _run_with_cpu_limit, self.cpu_time_limit, fn, *args)
+        except BrokenProcessPool as e:
+            # Zepsuta pula nie przyjmuje nowych zadań - kolejne żądanie utworzy nową
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise ExtractionWorkerCrashed(str(e) or "Extraction worker process died.")
+
+    async def extract(self, content: bytes, extension: str, content_type: str) -> str:
+        """Extracts text from the file content in a worker process."""
+        return await self.run(extract_text, content, extension, content_type)
+
+    async def _within_deadline(self, job: Any, deadline: Optional[float]) -> Any:
+        """Awaits the job, raising ExtractionTimeExceeded once the document deadline has passed."""
+        if deadline is None:
+            return await job
+        remaining = deadline - asyncio.get_running_loop().time()
+        try:
+            return await asyncio.wait_for(job, timeout=max(remaining, 0))
+        except asyncio.TimeoutError:
+            raise ExtractionTimeExceeded("Extraction exceeded the document time limit.")
+
+    async def _iter_ranges(
+        self, count_fn: Callable, range_fn: Callable, content: bytes, per_job: int, *args
+    ) -> AsyncIterator[str]:
+        """
+        Yields the parts returned by range_fn(content, *args, start, stop) for consecutive ranges of
+        per_job items (count_fn(content, *args) items in total), in order. Ranges are extracted in
+        parallel by the workers, at most `workers` ranges at a time; a range is yielded as soon as
+        it and all ranges before it are done. The whole document is bounded by document_time_limit
+        seconds (ExtractionTimeExceeded).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.document_time_limit if self.document_time_limit else None
+        count = await self._within_deadline(self.run(count_fn, content, *args), deadline)
+        starts = iter(range(0, count, per_job))
+        jobs = collections.deque()
+
+        def submit_next() -> None:
+            start = next(starts, None)
+            if start is not None:
+                jobs.append(asyncio.ensure_future(self.run(range_fn, content, *args, start, start + per_job)))
+
+        # Okno przesuwne: kolejny zakres zlecany dopiero po odebraniu poprzedniego, więc jeden duży
+        # dokument nie zajmuje kolejki puli wszystkimi zakresami naraz
+        for _ in range(self.workers):
+            submit_next()
+        try:
+            while jobs:
+                parts = await self._within_deadline(jobs[0], deadline)
+                jobs.popleft()
+                submit_next()
+                for part in parts:
+                    yield part
+        finally:
+            # Przerwany odbiór (np. rozłączony klient lub przekroczony limit czasu) - zakresy jeszcze
+            # nie rozpoczęte nie są wykonywane; rozpoczęte kończą się w procesie roboczym (limit CPU zadania)
+            for job in jobs:
+                job.cancel()
+            await asyncio.gather(*jobs, return_exceptions=True)
+
+    def iter_pdf_pages(self, content: bytes, pages_per_job: int = PDF_PAGES_PER_JOB) -> AsyncIterator[str]:
+        """Yields the raw text of each PDF page in order, extracting ranges of pages_per_job pages in parallel."""
+        return self._iter_ranges(count_pdf_pages, extract_pdf_range, content, pages_per_job)
+
+    async def iter_spreadsheet_rows(
+        self, content: bytes, extension: str, rows_per_batch: int = SPREADSHEET_ROWS_PER_BATCH
+    ) -> AsyncIterator[str]:
+        """
+        Yields the text of the CSV/XLSX file in batches of rows_per_batch non-empty rows. The file is
+        parsed once by a single worker, which sends each batch back as soon as it is read. The whole
+        document is bounded by document_time_limit seconds (ExtractionTimeExceeded).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.document_time_limit if self.document_time_limit else None
+        batches = self._get_manager().Queue()
+        job = asyncio.ensure_future(self.run(stream_spreadsheet_rows, content, extension, rows_per_batch, batches))
+        try:
+            while True:
+                try:
+                    batch = await self._within_deadline(
+                        loop.run_in_executor(None, batches.get, True, SPREADSHEET_BATCH_POLL_INTERVAL), deadline
+                    )
+                except queue.Empty:
+                    # Proces roboczy zakończony bez znacznika końca (np. awaria procesu) - zgłoś jego błąd
+                    if job.done() and job.exception() is not None:
+                        await job
+                    continue
+                if batch is None:
+                    break
+                yield batch
+            await self._within_deadline(job, deadline)
+        finally:
+            # Przerwany odbiór - zadanie jeszcze nie rozpoczęte nie jest wykonywane; rozpoczęte kończy
+            # się w procesie roboczym (limit CPU zadania)
+            job.cancel()
+            await asyncio.gather(job, return_exceptions=True)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+extraction_pool = ExtractionPool()
@@ -1,4 +1,16 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from app.extraction_pool import extraction_pool
 from app.routes import router
-app = FastAPI()
-app.include_router(router)
\ No newline at end of file
+from app.web_fetcher import web_fetcher
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await web_fetcher.close()
+    extraction_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
+app.include_router(router)
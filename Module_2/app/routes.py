@@ -1,12 +1,15 @@
 from typing import Optional
 
 from dns.rcode import NOERROR
-from fastapi import UploadFile, HTTPException, APIRouter, Body, File
+from fastapi import UploadFile, HTTPException, APIRouter, Body, File, Query
 from fastapi.params import Form
+from fastapi.responses import StreamingResponse
 
 from app.config import MAX_FILE_SIZE_MB
 from app.models import ExtractTextResponse
-from app.utils import  file_extraction, web_extraction
+from app.utils import  file_extraction, web_extraction, file_extraction_stream, web_extraction_stream
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 
 router = APIRouter()
 
@@ -17,10 +20,14 @@ router = APIRouter()
     description=(
         "Uploads a document or url and extracts plain text content from supported formats. "
         "Supports PDF, DOCX, XLSX, CSV, HTML, TXT, JSON, and XML. "
-        f"Max file size: {MAX_FILE_SIZE_MB}MB."
+        f"Max file size: {MAX_FILE_SIZE_MB}MB. "
+        "With stream=true the text is returned as NDJSON, one line per PDF page as soon as it is extracted."
     ),
     responses={
-        200: {"description": "Text successfully extracted."},
+        200: {
+            "description": "Text successfully extracted.",
+            "content": {NDJSON_MEDIA_TYPE: {"example": '{"type": "page", "page": 1, "text": "..."}'}},
+        },
         400: {"description": "Invalid file or website."},
         413: {"description": "File too large."},
         422: {"description": "Malformed request."},
@@ -29,9 +36,13 @@ router = APIRouter()
 async def extract_text_from_file(
     file: Optional[UploadFile] = File(default=None),
     website_url: Optional[str] = Form(default=None),
+    stream: bool = Query(default=False, description="Stream the text as NDJSON page by page."),
 ):
     response: ExtractTextResponse
 
+    if stream:
+        return await stream_text(file, website_url)
+
     if file is not None:
         response = await file_extraction(file)
     elif website_url is not None:
@@ -40,3 +51,38 @@ async def extract_text_from_file(
         raise HTTPException(status_code=422, detail="Malformed request.")
 
     return response
+
+
+@router.post(
+    "/file/stream",
+    response_class=StreamingResponse,
+    summary="Extract text from an uploaded file as a stream",
+    description=(
+        "Same input as POST /file, but the text is returned as NDJSON (chunked transfer): one "
+        '{"type": "page"} line per PDF page as soon as it is extracted (a single page for other formats '
+        'and websites), followed by a {"type": "done"} line with the metadata. '
+        "The caller can process the text incrementally instead of holding one large JSON string."
+    ),
+    responses={
+        200: {
+            "description": "NDJSON stream of the extracted text.",
+            "content": {NDJSON_MEDIA_TYPE: {"example": '{"type": "page", "page": 1, "text": "..."}'}},
+        },
+        400: {"description": "Invalid file or website."},
+        413: {"description": "File too large."},
+        422: {"description": "Malformed request."},
+    }
+)
+async def extract_text_stream(
+    file: Optional[UploadFile] = File(default=None),
+    website_url: Optional[str] = Form(default=None),
+):
+    return await stream_text(file, website_url)
+
+
+async def stream_text(file: Optional[UploadFile], website_url: Optional[str]) -> StreamingResponse:
+    if file is not None:
+        return StreamingResponse(await file_extraction_stream(file), media_type=NDJSON_MEDIA_TYPE)
+    elif website_url is not None:
+        return StreamingResponse(await web_extraction_stream(website_url), media_type=NDJSON_MEDIA_TYPE)
+    raise HTTPException(status_code=422, detail="Malformed request.")
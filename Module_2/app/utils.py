@@ -1,14 +1,45 @@
-import requests
-from bs4 import BeautifulSoup
+import json
+import re
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterable, Tuple
 
-from FileConversion.converter import FileConversion
-from app.config import ALLOWED_EXTS, ALLOWED_CONTENT_TYPES, MAX_FILE_SIZE, MAX_FILE_SIZE_MB
+from app.config import ALLOWED_EXTS, ALLOWED_CONTENT_TYPES, MAX_FILE_SIZE, MAX_FILE_SIZE_MB, WEB_MAX_BYTES
 from fastapi import UploadFile, HTTPException
 
+from app.extraction_pool import extraction_pool, ExtractionCpuTimeExceeded, ExtractionTimeExceeded, ExtractionWorkerCrashed
 from app.models import FileMetadata, ExtractTextResponse
+from app.web_fetcher import web_fetcher, html_to_text, FetchedPage, PageTooLarge
 
 
-async def file_extraction(file: UploadFile) -> ExtractTextResponse:
+CPU_TIME_EXCEEDED_DETAIL = "Text extraction took too long (CPU time limit exceeded)."
+DOCUMENT_TIME_EXCEEDED_DETAIL = "Text extraction took too long (document time limit exceeded)."
+WORKER_CRASHED_DETAIL = "Text extraction worker crashed."
+
+
+def normalize_whitespace(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip()
+
+def join_pages(parts: Iterable[str]) -> str:
+    """
+    Joins the extracted parts the same way as the NDJSON stream is read back (Module 3):
+    each part normalized as in its {"type": "page"} line, non-empty parts separated by a space.
+    """
+    return " ".join(text for text in map(normalize_whitespace, parts) if text)
+
+@contextmanager
+def extraction_errors():
+    """Maps failures of the extraction workers to HTTP errors."""
+    try:
+        yield
+    except ExtractionCpuTimeExceeded:
+        raise HTTPException(status_code=422, detail=CPU_TIME_EXCEEDED_DETAIL)
+    except ExtractionTimeExceeded:
+        raise HTTPException(status_code=422, detail=DOCUMENT_TIME_EXCEEDED_DETAIL)
+    except ExtractionWorkerCrashed:
+        raise HTTPException(status_code=500, detail=WORKER_CRASHED_DETAIL)
+
+async def read_upload(file: UploadFile) -> Tuple[bytes, str, str]:
+    """Validates the uploaded file and returns its content, extension and content type."""
     extension = file.filename.split(".")[-1].lower()
     content_type = file.headers.get('Content-Type')
 
@@ -21,32 +52,100 @@ async def file_extraction(file: UploadFile) -> ExtractTextResponse:
         raise HTTPException(status_code=413, detail=f"File too large. Max size is {MAX_FILE_SIZE_MB} MB")
 
     await file.seek(0)
+    return await file.read(), extension, content_type
+
+SPREADSHEET_TYPES = {
+    ('xlsx', "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    ('csv', "text/csv"),
+}
+
+async def iter_file_text(content: bytes, extension: str, content_type: str) -> AsyncIterator[str]:
+    """
+    Yields the text of the file part by part: page by page for PDF, in batches of rows for CSV/XLSX,
+    the whole text for other formats.
+    """
+    if (extension, content_type) == ('pdf', "application/pdf"):
+        async for page_text in extraction_pool.iter_pdf_pages(content):
+            yield page_text
+    elif (extension, content_type) in SPREADSHEET_TYPES:
+        async for rows_text in extraction_pool.iter_spreadsheet_rows(content, extension):
+            yield rows_text
+    else:
+        yield await extraction_pool.extract(content, extension, content_type)
 
-    extraction = FileConversion(file, extension, content_type)
-    extracted_text = extraction.get_text()
+async def ndjson_pages(parts: AsyncIterator[str], metadata: FileMetadata) -> AsyncIterator[bytes]:
+    """
+    Streams the extracted text as NDJSON: a {"type": "page"} line per part as soon as it is ready,
+    then a {"type": "done"} line with the metadata, or a {"type": "error"} line if extraction failed.
+    """
+    pages = 0
+    try:
+        async for part in parts:
+            pages += 1
+            yield ndjson_line({"type": "page", "page": pages, "text": normalize_whitespace(part)})
+    except ExtractionCpuTimeExceeded:
+        yield ndjson_line({"type": "error", "status": 422, "detail": CPU_TIME_EXCEEDED_DETAIL})
+        return
+    except ExtractionTimeExceeded:
+        yield ndjson_line({"type": "error", "status": 422, "detail": DOCUMENT_TIME_EXCEEDED_DETAIL})
+        return
+    except ExtractionWorkerCrashed:
+        yield ndjson_line({"type": "error", "status": 500, "detail": WORKER_CRASHED_DETAIL})
+        return
+    except Exception as e:
+        yield ndjson_line({"type": "error", "status": 500, "detail": f"Text extraction failed: {e}"})
+        return
+    yield ndjson_line({"type": "done", "pages": pages, "metadata": metadata.model_dump(mode="json")})
+
+def ndjson_line(record: dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+async def file_extraction(file: UploadFile) -> ExtractTextResponse:
+    content, extension, content_type = await read_upload(file)
+
+    with extraction_errors():
+        parts = [part async for part in iter_file_text(content, extension, content_type)]
     return ExtractTextResponse(
-        text=extracted_text,
+        text=join_pages(parts),
         metadata=FileMetadata(filename=file.filename, size=file.size)
     )
 
-async def web_extraction(website_url: str) -> ExtractTextResponse:
+async def file_extraction_stream(file: UploadFile) -> AsyncIterator[bytes]:
+    """Validates and reads the file, then returns the NDJSON stream of its pages (see ndjson_pages)."""
+    content, extension, content_type = await read_upload(file)
+    metadata = FileMetadata(filename=file.filename, size=file.size)
+    return ndjson_pages(iter_file_text(content, extension, content_type), metadata)
+
+async def fetch_website(website_url: str) -> FetchedPage:
     try:
-        response = requests.get(website_url)
-        response.raise_for_status()
+        return await web_fetcher.fetch(website_url)
+    except PageTooLarge:
+        raise HTTPException(status_code=413, detail=f"Website too large. Max size is {WEB_MAX_BYTES // (1024 * 1024)} MB")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch URL: {e}")
 
-    soup = BeautifulSoup(response.text, "html.parser")
-    text = soup.get_text()
-    clean_text = " ".join(text.split())
+async def iter_website_text(page: FetchedPage) -> AsyncIterator[str]:
+    yield await extraction_pool.run(html_to_text, page.content, page.charset)
+
+async def web_extraction(website_url: str) -> ExtractTextResponse:
+    page = await fetch_website(website_url)
+
+    with extraction_errors():
+        parts = [part async for part in iter_website_text(page)]
     return ExtractTextResponse(
-        text=clean_text,
+        text=join_pages(parts),
         metadata=FileMetadata(
             filename=website_url,
-            size=len(response.content)
+            size=len(page.content)
         )
     )
 
+async def web_extraction_stream(website_url: str) -> AsyncIterator[bytes]:
+    """Fetches the website, then returns the NDJSON stream of its text (a single page)."""
+    page = await fetch_website(website_url)
+    metadata = FileMetadata(filename=website_url, size=len(page.content))
+    return ndjson_pages(iter_website_text(page), metadata)
+
 def validate_file_type(extension: str, content_type: str) -> bool:
     return extension in ALLOWED_EXTS and content_type in ALLOWED_CONTENT_TYPES
 
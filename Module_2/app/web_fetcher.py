@@ -0,0 +1,140 @@
+import asyncio
+import codecs
+import re
+from typing import Optional
+
+import httpx
+from bs4 import BeautifulSoup
+from charset_normalizer import from_bytes
+
+from app.config import (
+    WEB_CONNECT_TIMEOUT,
+    WEB_READ_TIMEOUT,
+    WEB_MAX_CONNECTIONS,
+    WEB_MAX_KEEPALIVE_CONNECTIONS,
+    WEB_MAX_REDIRECTS,
+    WEB_MAX_BYTES,
+)
+
+# Asynchroniczne pobieranie stron internetowych: wspólna pula połączeń, limity czasu połączenia
+# i odczytu oraz strumieniowe pobieranie treści przerywane po przekroczeniu WEB_MAX_BYTES.
+# Dekodowanie i parsowanie HTML wykonywane jest poza pętlą zdarzeń (html_to_text w puli procesów).
+
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+SNIFF_BYTES = 4096
+
+
+class PageTooLarge(Exception):
+    """Raised when the fetched page exceeds the maximum size."""
+
+
+class FetchedPage:
+    def __init__(self, url: str, content: bytes, charset: Optional[str]):
+        self.url = url
+        self.content = content
+        self.charset = charset
+
+
+def _known_charset(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def detect_charset(content: bytes, declared_charset: Optional[str] = None) -> str:
+    """
+    Determines the page encoding: the charset of the Content-Type header, then the <meta> charset
+    of the document, then detection from the content itself (UTF-8 as the last resort).
+    """
+    charset = _known_charset(declared_charset)
+    if charset:
+        return charset
+
+    meta = META_CHARSET_RE.search(content[:SNIFF_BYTES])
+    charset = _known_charset(meta.group(1).decode("ascii", "ignore")) if meta else None
+    if charset:
+        return charset
+
+    best = from_bytes(content).best()
+    return (_known_charset(best.encoding) if best else None) or "utf-8"
+
+
+def html_to_text(content: bytes, declared_charset: Optional[str] = None) -> str:
+    """Decodes the page and returns its normalized text (executed in a worker process)."""
+    html = content.decode(detect_charset(content, declared_charset), errors="replace")
+    soup = BeautifulSoup(html, "html.parser")
+    return " ".join(soup.get_text().split())
+
+
+class WebFetcher:
+    def __init__(self, max_bytes: int = WEB_MAX_BYTES, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.max_bytes = max_bytes
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        # Klient jest związany z pętlą zdarzeń, w której powstał (np. TestClient uruchamia nową pętlę na żądanie)
+        if self._client is not None and self._loop is not loop:
+            await self._close_detached(self._client, self._loop)
+            self._client = None
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(WEB_READ_TIMEOUT, connect=WEB_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=WEB_MAX_CONNECTIONS,
+                    max_keepalive_connections=WEB_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+                follow_redirects=True,
+                max_redirects=WEB_MAX_REDIRECTS,
+                transport=self.transport,
+            )
+            self._loop = loop
+        return self._client
+
+    @staticmethod
+    async def _close_detached(client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Closes a client created in another event loop, on that loop while it still runs."""
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        # Pętla klienta została zamknięta - zamknięcie puli w bieżącej pętli; połączenia, których
+        # nie da się już zamknąć w martwej pętli, zwalnia odśmiecanie
+        try:
+            await client.aclose()
+        except Exception:
+            pass
+
+    async def fetch(self, url: str) -> FetchedPage:
+        """
+        Downloads the page, reading the body in chunks and aborting with PageTooLarge once it
+        exceeds max_bytes. HTTP and network errors are raised as httpx exceptions.
+        """
+        client = await self._get_client()
+        async with client.stream("GET", url) as response:
+            response.raise_for_status()
+
+            declared_length = response.headers.get("Content-Length")
+            if declared_length and declared_length.isdigit() and int(declared_length) > self.max_bytes:
+                raise PageTooLarge(f"Page size {declared_length} bytes exceeds {self.max_bytes} bytes.")
+
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) > self.max_bytes:
+                    raise PageTooLarge(f"Page exceeds {self.max_bytes} bytes.")
+
+            return FetchedPage(str(response.url), bytes(body), response.charset_encoding)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+
+web_fetcher = WebFetcher()
@@ -0,0 +1,170 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.extraction_pool import (
+    ExtractionPool, ExtractionCpuTimeExceeded, ExtractionTimeExceeded, ExtractionWorkerCrashed,
+    count_pdf_pages, extract_pdf_range, stream_spreadsheet_rows,
+)
+import app.extraction_pool as extraction_pool_module
+
+# -----------------------------
+# Worker functions (must be importable by the spawned worker processes)
+# -----------------------------
+
+def burn_cpu(seconds: float) -> int:
+    deadline = time.process_time() + seconds
+    counter = 0
+    while time.process_time() < deadline:
+        counter += 1
+    return counter
+
+def crash_worker() -> None:
+    os._exit(1)
+
+
+@pytest.fixture
+def pool():
+    pool = ExtractionPool(workers=1, max_tasks_per_child=10, cpu_time_limit=1)
+    yield pool
+    pool.shutdown()
+
+# -----------------------------
+# Tests
+# -----------------------------
+
+def test_extract_runs_in_worker_process(pool):
+    text = asyncio.run(pool.extract(b"Hello   pool\nworld", "txt", "text/plain"))
+    assert text == "Hello pool world"
+
+def test_cpu_time_limit_interrupts_job(pool):
+    with pytest.raises(ExtractionCpuTimeExceeded):
+        asyncio.run(pool.run(burn_cpu, 10))
+
+    # Proces roboczy pozostaje sprawny po przerwaniu zadania
+    assert asyncio.run(pool.run(burn_cpu, 0.1)) > 0
+
+def test_event_loop_stays_responsive_during_extraction(pool):
+    async def scenario():
+        job = asyncio.create_task(pool.run(burn_cpu, 0.8))
+        ticks = 0
+        while not job.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        await job
+        return ticks
+
+    assert asyncio.run(scenario()) > 10
+
+def test_workers_are_recycled_after_max_tasks():
+    pool = ExtractionPool(workers=1, max_tasks_per_child=1, cpu_time_limit=0)
+    try:
+        first = asyncio.run(pool.run(os.getpid))
+        second = asyncio.run(pool.run(os.getpid))
+    finally:
+        pool.shutdown()
+
+    assert first != os.getpid()
+    assert second != os.getpid()
+    assert first != second
+
+def test_crashed_worker_is_replaced(pool):
+    with pytest.raises(ExtractionWorkerCrashed):
+        asyncio.run(pool.run(crash_worker))
+
+    assert asyncio.run(pool.run(os.getpid)) != os.getpid()
+
+def test_pdf_pages_are_yielded_in_order_across_ranges(pool):
+    from test_file_upload import create_multipage_pdf
+
+    async def collect():
+        return [page async for page in pool.iter_pdf_pages(create_multipage_pdf(7), pages_per_job=3)]
+
+    pages = asyncio.run(collect())
+    assert [page.strip() for page in pages] == [f"Page {n} text" for n in range(1, 8)]
+
+@pytest.mark.parametrize("extension", ["csv", "xlsx"])
+def test_spreadsheet_rows_are_yielded_in_batches(pool, extension):
+    from test_file_upload import create_test_xlsx
+
+    content = b"name,age\nAlice,30\n\nBob,25\nCarol,41\n" if extension == "csv" else create_test_xlsx()
+
+    async def collect():
+        return [batch async for batch in pool.iter_spreadsheet_rows(content, extension, rows_per_batch=2)]
+
+    batches = asyncio.run(collect())
+    if extension == "csv":
+        assert batches == ["name age Alice 30", "Bob 25 Carol 41"]
+    else:
+        assert batches == ["Name Age Alice 30", "Bob 25"]
+
+def test_spreadsheet_is_parsed_once(monkeypatch):
+    import queue
+    from FileConversion.converter import iter_csv_rows
+
+    opened = []
+
+    def counting_reader(source):
+        opened.append(source)
+        return iter_csv_rows(source)
+
+    monkeypatch.setitem(extraction_pool_module.SPREADSHEET_ROW_READERS, "csv", counting_reader)
+    batches = queue.Queue()
+
+    count = stream_spreadsheet_rows(b"a\nb\nc\nd\ne\n", "csv", 2, batches)
+
+    assert count == 3
+    assert [batches.get_nowait() for _ in range(4)] == ["a b", "c d", "e", None]
+    assert len(opened) == 1
+
+def test_spreadsheet_worker_error_is_raised(pool):
+    async def collect():
+        return [batch async for batch in pool.iter_spreadsheet_rows(b"a,b\n", "ods", rows_per_batch=2)]
+
+    with pytest.raises(KeyError):
+        asyncio.run(collect())
+
+def fake_pdf_run(page_count: int, delay: float, in_flight: list):
+    """Replaces ExtractionPool.run: records the number of in-flight page ranges instead of running them in workers."""
+    async def run(fn, *args):
+        if fn is count_pdf_pages:
+            return page_count
+        assert fn is extract_pdf_range
+        _, start, stop = args
+        in_flight.append((in_flight[-1] if in_flight else 0) + 1)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            in_flight.append(in_flight[-1] - 1)
+        return [f"Page {n + 1}" for n in range(start, min(stop, page_count))]
+    return run
+
+def test_pdf_ranges_in_flight_are_limited_to_workers():
+    pool = ExtractionPool(workers=2, document_time_limit=0)
+    in_flight = []
+    pool.run = fake_pdf_run(20, 0.01, in_flight)
+
+    async def collect():
+        return [page async for page in pool.iter_pdf_pages(b"%PDF", pages_per_job=2)]
+
+    assert asyncio.run(collect()) == [f"Page {n}" for n in range(1, 21)]
+    assert max(in_flight) == 2
+    assert in_flight[-1] == 0
+
+def test_document_time_limit_stops_pdf_extraction():
+    pool = ExtractionPool(workers=2, document_time_limit=0.05)
+    in_flight = []
+    pool.run = fake_pdf_run(100, 0.02, in_flight)
+    pages = []
+
+    async def collect():
+        async for page in pool.iter_pdf_pages(b"%PDF", pages_per_job=1):
+            pages.append(page)
+
+    with pytest.raises(ExtractionTimeExceeded):
+        asyncio.run(collect())
+    assert 0 < len(pages) < 100
+    # Zakresy w toku są anulowane po przekroczeniu limitu
+    assert in_flight[-1] == 0
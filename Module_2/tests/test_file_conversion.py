@@ -2,7 +2,7 @@ import io
 import pytest
 import json
 from starlette.datastructures import UploadFile
-from FileConversion.converter import FileConversion
+from FileConversion.converter import FileConversion, iter_csv_rows, iter_xlsx_rows
 
 from reportlab.pdfgen import canvas
 from docx import Document
@@ -76,3 +76,35 @@ def test_file_conversion_text_extraction(ext, content_type, file_maker, expected
     text = converter.get_text()
 
     assert expected in text
+
+# -----------------------------
+# Row-streaming spreadsheets
+# -----------------------------
+
+def test_xlsx_rows_cover_all_sheets_and_skip_empty_cells():
+    buffer = io.BytesIO()
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Name", "Age", "City"])
+    ws.append(["Alice", None, "Kraków"])
+    ws.append([None, None, None])
+    second = wb.create_sheet("Second")
+    second.append(["Bob", 25.5])
+    wb.save(buffer)
+    buffer.seek(0)
+
+    rows = iter_xlsx_rows(buffer)
+
+    assert next(rows) == "Name Age City"
+    assert list(rows) == ["Alice Kraków", "Bob 25.5"]
+
+def test_csv_rows_handle_quoted_fields_and_bom():
+    content = '\ufeffname,comment\nAlice,"Hello, World"\n,\nBob,"multi\nline"\n'.encode("utf-8")
+
+    assert list(iter_csv_rows(io.BytesIO(content))) == ["name comment", "Alice Hello, World", "Bob multi\nline"]
+
+def test_csv_conversion_normalizes_whitespace():
+    file = UploadFile(filename="file.csv", file=io.BytesIO(b'name,comment\nBob,"multi\n   line"\n'))
+    converter = FileConversion(file=file, extension="csv", content_type="text/csv")
+
+    assert converter.get_text() == "name comment Bob multi line"
@@ -1,4 +1,5 @@
 import io
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
@@ -38,6 +39,16 @@ def create_test_xlsx() -> bytes:
     buffer.seek(0)
     return buffer.read()
 
+def create_multipage_pdf(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    for number in range(1, pages + 1):
+        c.drawString(100, 750, f"Page {number} text")
+        c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer.read()
+
 def generate_dummy_file(size_bytes: int) -> io.BytesIO:
     return io.BytesIO(b"a" * size_bytes)
 
@@ -128,3 +139,83 @@ def test_file_exceeding_max_size_returns_413():
 
     assert response.status_code == 413
     assert "File too large" in response.json()["detail"]
+
+
+# -----------------------------
+# NDJSON Streaming Tests
+# -----------------------------
+
+def test_pdf_stream_returns_page_per_line():
+    """
+    With stream=true a PDF is returned as NDJSON: one line per page, then the metadata.
+    """
+    file = {"file": ("pages.pdf", io.BytesIO(create_multipage_pdf(20)), "application/pdf")}
+
+    response = client.post("/file", params={"stream": "true"}, files=file)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["page"] for line in lines[:-1]] == list(range(1, 21))
+    assert [line["text"] for line in lines[:-1]] == [f"Page {n} text" for n in range(1, 21)]
+    assert lines[-1]["type"] == "done"
+    assert lines[-1]["pages"] == 20
+    assert lines[-1]["metadata"]["filename"] == "pages.pdf"
+
+def test_pdf_text_is_the_same_with_parallel_page_ranges():
+    """
+    A PDF split into page ranges returns the same text as before (pages in order).
+    """
+    file = {"file": ("pages.pdf", io.BytesIO(create_multipage_pdf(20)), "application/pdf")}
+
+    response = client.post("/file", files=file)
+
+    assert response.status_code == 200
+    assert response.json()["text"] == " ".join(f"Page {n} text" for n in range(1, 21))
+
+def test_file_and_stream_return_the_same_pdf_text():
+    """
+    /file returns the text the client gets by joining the non-empty /file/stream pages with a space.
+    """
+    content = create_multipage_pdf(12)
+
+    text = client.post("/file", files={"file": ("pages.pdf", io.BytesIO(content), "application/pdf")}).json()["text"]
+    response = client.post("/file/stream", files={"file": ("pages.pdf", io.BytesIO(content), "application/pdf")})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert text == " ".join(line["text"] for line in lines if line["type"] == "page" and line["text"])
+    assert text == " ".join(f"Page {n} text" for n in range(1, 13))
+
+def test_stream_of_other_format_is_a_single_page():
+    file = {"file": ("note.txt", io.BytesIO(b"Just   a note"), "text/plain")}
+
+    response = client.post("/file", params={"stream": "true"}, files=file)
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"type": "page", "page": 1, "text": "Just a note"}
+    assert lines[1]["type"] == "done"
+
+def test_stream_validates_before_streaming():
+    file = {"file": ("testfile.exe", io.BytesIO(b"dummy data"), "application/octet-stream")}
+
+    response = client.post("/file", params={"stream": "true"}, files=file)
+
+    assert response.status_code == 400
+
+def test_file_stream_endpoint_returns_ndjson():
+    """
+    POST /file/stream always returns the NDJSON stream.
+    """
+    file = {"file": ("pages.pdf", io.BytesIO(create_multipage_pdf(3)), "application/pdf")}
+
+    response = client.post("/file/stream", files=file)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["type"] for line in lines] == ["page", "page", "page", "done"]
+
+def test_file_stream_endpoint_without_input_returns_422():
+    response = client.post("/file/stream")
+
+    assert response.status_code == 422
@@ -0,0 +1,103 @@
+import csv
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from starlette.datastructures import UploadFile
+
+from FileConversion.converter import FileConversion
+
+# Porównanie szczytowego zużycia pamięci (RSS) ekstrakcji CSV/XLSX: dotychczasowa ścieżka przez
+# DataFrame (pandas) kontra odczyt wiersz po wierszu. Uruchamiany tylko, gdy ustawiono
+# SPREADSHEET_BENCHMARK_ROWS, np.:
+#   SPREADSHEET_BENCHMARK_ROWS=200000 pytest -s tests/test_spreadsheet_benchmark.py
+# Każdy pomiar wykonywany jest w nowym procesie, więc ru_maxrss dotyczy tylko jednej ekstrakcji.
+
+BENCHMARK_ROWS = int(os.getenv("SPREADSHEET_BENCHMARK_ROWS", "0"))
+COLUMNS = 8
+
+pytestmark = pytest.mark.skipif(not BENCHMARK_ROWS, reason="SPREADSHEET_BENCHMARK_ROWS not set")
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def synthetic_row(i: int) -> list:
+    return [f"Jan Kowalski {i}", f"jan.kowalski{i}@example.com", f"850102{i % 100000:05d}", i, i * 1.5,
+            "ul. Długa 12/3, 00-001 Warszawa", f"PL{i:026d}", "uwagi do umowy najmu lokalu"][:COLUMNS]
+
+
+def write_csv(path: str, rows: int) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([f"column_{c}" for c in range(COLUMNS)])
+        for i in range(rows):
+            writer.writerow(synthetic_row(i))
+
+
+def write_xlsx(path: str, rows: int) -> None:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append([f"column_{c}" for c in range(COLUMNS)])
+    for i in range(rows):
+        ws.append(synthetic_row(i))
+    wb.save(path)
+
+
+def dataframe_text(path: str, extension: str) -> str:
+    """The previous extraction path: the whole sheet as a DataFrame flattened to strings."""
+    with open(path, "rb") as f:
+        if extension == "xlsx":
+            sheets = pd.read_excel(f, sheet_name=None).values()
+        else:
+            sheets = [pd.read_csv(f)]
+        text = ""
+        for sheet in sheets:
+            text += " ".join(sheet.astype(str).fillna("").values.flatten())
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def streaming_text(path: str, extension: str) -> str:
+    with open(path, "rb") as f:
+        file = UploadFile(file=f, size=os.path.getsize(path))
+        return FileConversion(file, extension, CONTENT_TYPES[extension]).get_text()
+
+
+def measure(fn, path: str, extension: str):
+    """Runs the extraction in the current (fresh) process; returns the text length and RSS growth in MB."""
+    import resource
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    length = len(fn(path, extension))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss w KB (Linux)
+    return length, (peak - before) / 1024, peak / 1024
+
+
+def run_isolated(fn, path: str, extension: str):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(measure, fn, path, extension).result()
+
+
+@pytest.mark.parametrize("extension, writer", [("csv", write_csv), ("xlsx", write_xlsx)])
+def test_streaming_extraction_peak_rss(tmp_path, extension, writer):
+    path = str(tmp_path / f"benchmark.{extension}")
+    writer(path, BENCHMARK_ROWS)
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+
+    dataframe_length, dataframe_growth, dataframe_peak = run_isolated(dataframe_text, path, extension)
+    streaming_length, streaming_growth, streaming_peak = run_isolated(streaming_text, path, extension)
+
+    print(
+        f"\n{extension}: {BENCHMARK_ROWS} rows, {size_mb:.1f} MB file"
+        f"\n  DataFrame: growth {dataframe_growth:8.1f} MB, peak RSS {dataframe_peak:8.1f} MB, text {dataframe_length} chars"
+        f"\n  rows:      growth {streaming_growth:8.1f} MB, peak RSS {streaming_peak:8.1f} MB, text {streaming_length} chars"
+    )
+    assert streaming_growth < dataframe_growth
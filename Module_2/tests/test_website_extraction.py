@@ -1,57 +1,60 @@
+import asyncio
+import threading
+
+import httpx
 import pytest
-import requests_mock
 from fastapi.testclient import TestClient
 from app.main import app
+from app.web_fetcher import WebFetcher, detect_charset, html_to_text
 
 client = TestClient(app)
 
 
-import requests_mock
-from fastapi.testclient import TestClient
-from app.main import app  # upewnij się, że ścieżka jest poprawna
-
-client = TestClient(app)
+def mock_fetcher(monkeypatch, handler, max_bytes: int = 1024 * 1024) -> WebFetcher:
+    fetcher = WebFetcher(max_bytes=max_bytes, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr("app.utils.web_fetcher", fetcher)
+    return fetcher
 
 # ------------------------
 # Valid test (real site)
 # ------------------------
 
-def test_extract_text_from_valid_website():
-    with requests_mock.Mocker() as m:
-        html = "<html><body>Example Domain</body></html>"
-        m.get("https://example.com", text=html)
+def test_extract_text_from_valid_website(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert str(request.url) == "https://example.com"
+        return httpx.Response(200, html="<html><body>Example Domain</body></html>")
+    mock_fetcher(monkeypatch, handler)
 
-        response = client.post(
-            "/file",
-            data={"website_url": "https://example.com"}
-        )
+    response = client.post(
+        "/file",
+        data={"website_url": "https://example.com"}
+    )
 
-        assert response.status_code == 200
-        data = response.json()
-        assert "text" in data
-        assert "metadata" in data
-        assert data["metadata"]["filename"] == "https://example.com"
-        assert isinstance(data["metadata"]["size"], int)
-        assert "Example Domain" in data["text"]
+    assert response.status_code == 200
+    data = response.json()
+    assert "text" in data
+    assert "metadata" in data
+    assert data["metadata"]["filename"] == "https://example.com"
+    assert isinstance(data["metadata"]["size"], int)
+    assert "Example Domain" in data["text"]
 
 
 # ------------------------
 # Invalid test (bad URL)
 # ------------------------
 
-def test_extract_text_from_invalid_website():
-    with requests_mock.Mocker() as m:
-        m.get("http://invalid.url.1234", status_code=404)
+def test_extract_text_from_invalid_website(monkeypatch):
+    mock_fetcher(monkeypatch, lambda request: httpx.Response(404))
 
-        response = client.post(
-            "/file",
-            data={"website_url": "http://invalid.url.1234"}
-        )
+    response = client.post(
+        "/file",
+        data={"website_url": "http://invalid.url.1234"}
+    )
 
-        assert response.status_code == 400
-        data = response.json()
-        assert "detail" in data
-        assert "Failed to fetch URL" in data["detail"]
+    assert response.status_code == 400
+    data = response.json()
+    assert "detail" in data
+    assert "Failed to fetch URL" in data["detail"]
 
 # ------------------------
 # Edge case: No protocol
@@ -65,3 +68,101 @@ def test_extract_text_from_url_without_protocol():
 
     assert response.status_code == 400 or response.status_code == 422
     # 400 if the server attempts to fetch, 422 if body validation fails
+
+# ------------------------
+# Timeouts and size limit
+# ------------------------
+
+def test_extract_text_from_website_timeout(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ReadTimeout("timed out", request=request)
+    mock_fetcher(monkeypatch, handler)
+
+    response = client.post("/file", data={"website_url": "https://slow.example.com"})
+
+    assert response.status_code == 400
+    assert "timed out" in response.json()["detail"]
+
+def test_extract_text_from_too_large_website(monkeypatch):
+    async def chunks():
+        for _ in range(100):
+            yield b"<p>" + b"a" * 1000 + b"</p>"
+
+    # Brak nagłówka Content-Length - limit sprawdzany w trakcie pobierania
+    mock_fetcher(monkeypatch, lambda request: httpx.Response(200, content=chunks()), max_bytes=10_000)
+
+    response = client.post("/file", data={"website_url": "https://big.example.com"})
+
+    assert response.status_code == 413
+
+def test_extract_text_rejects_declared_too_large_website(monkeypatch):
+    mock_fetcher(
+        monkeypatch,
+        lambda request: httpx.Response(200, headers={"Content-Length": "50000"}, content=b"x" * 50000),
+        max_bytes=10_000,
+    )
+
+    response = client.post("/file", data={"website_url": "https://big.example.com"})
+
+    assert response.status_code == 413
+
+# ------------------------
+# Charset detection
+# ------------------------
+
+def test_extract_text_uses_header_charset(monkeypatch):
+    body = "<html><body>Zażółć gęślą jaźń</body></html>".encode("iso-8859-2")
+    mock_fetcher(
+        monkeypatch,
+        lambda request: httpx.Response(200, headers={"Content-Type": "text/html; charset=ISO-8859-2"}, content=body),
+    )
+
+    response = client.post("/file", data={"website_url": "https://pl.example.com"})
+
+    assert response.status_code == 200
+    assert response.json()["text"] == "Zażółć gęślą jaźń"
+
+def test_detect_charset_from_meta_tag():
+    body = '<html><head><meta charset="windows-1250"></head><body>Łódź</body></html>'.encode("cp1250")
+
+    assert detect_charset(body) == "cp1250"
+    assert html_to_text(body) == "Łódź"
+
+def test_detect_charset_ignores_unknown_declared_charset():
+    body = "<p>Kraków</p>".encode("utf-8")
+
+    assert detect_charset(body, "no-such-charset") == "utf-8"
+    assert html_to_text(body, "no-such-charset") == "Kraków"
+
+
+# ------------------------
+# Client per event loop
+# ------------------------
+
+def test_client_of_previous_closed_loop_is_closed():
+    fetcher = WebFetcher(transport=httpx.MockTransport(lambda request: httpx.Response(200, html="ok")))
+
+    first = asyncio.run(fetcher._get_client())
+    second = asyncio.run(fetcher._get_client())
+
+    assert second is not first
+    assert first.is_closed
+    assert not second.is_closed
+
+def test_client_of_previous_running_loop_is_closed_on_that_loop():
+    fetcher = WebFetcher(transport=httpx.MockTransport(lambda request: httpx.Response(200, html="ok")))
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        first = asyncio.run_coroutine_threadsafe(fetcher._get_client(), other_loop).result(timeout=5)
+        second = asyncio.run(fetcher._get_client())
+        # aclose zlecone w pętli, w której klient powstał
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.01), other_loop).result(timeout=5)
+
+        assert second is not first
+        assert first.is_closed
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(timeout=5)
+        other_loop.close()
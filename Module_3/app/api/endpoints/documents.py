@@ -9,7 +9,8 @@ from fastapi import (
     Form,
     status,
 )
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List
+import asyncio
 from datetime import datetime
 import traceback
 
@@ -20,10 +21,13 @@ from app.models.documents import (
     DocumentUpdate,
     DocumentList,
     DocumentInDB,
+    DocumentSearchResult,
+    ListCountMode,
     UploadResultItem
 )
 from app.services.documents import DocumentService
 from app.api.dependencies import get_document_service
+from app.core.config import settings
 from app.core.exceptions import (
     DocumentNotFoundException,
     DatabaseException,
@@ -33,6 +37,17 @@ from app.core.exceptions import (
 
 router = APIRouter()
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def iter_upload_chunks(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Reads an uploaded file in chunks."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
 
 @router.post(
     "/documents",
@@ -49,96 +64,93 @@ async def upload_documents(
     document_service: DocumentService = Depends(get_document_service),
 ):
     """
-    Handles uploading multiple files. Each file is processed individually.
-    Returns a list detailing the outcome for each file.
+    Handles uploading multiple files. Files are ingested concurrently (at most
+    settings.UPLOAD_CONCURRENCY at a time). Returns a list detailing the outcome
+    for each file, in the order the files were sent.
     """
-    results: List[UploadResultItem] = []
-
     if not files:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="No files were uploaded."
         )
 
-    for file in files:
-        filename = file.filename
-        if not filename:
-            results.append(
-                UploadResultItem(
-                    filename="N/A", status="failed", error="Missing filename."
-                )
-            )
-            continue
+    semaphore = asyncio.Semaphore(max(1, settings.UPLOAD_CONCURRENCY))
 
-        doc_id = None
-        file_content = b""
-
-        try:
-            file_format = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
-            if not file_format:
-                 raise ValidationException(f"Cannot determine file format for '{filename}'. Missing extension.")
-            
-            file_content = await file.read()
-            file_size = len(file_content)
-
-            if file_size == 0:
-                raise ValidationException("Uploaded file cannot be empty.")
-
-            doc_id = await document_service.create_document(
-                file_name=filename,
-                file_format=file_format,
-                file_content=file_content,
-                uploader_email=uploader_email,
-            )
-
-            results.append(
-                UploadResultItem(
-                    filename=filename, documentId=doc_id, status="uploaded"
-                )
-            )
-
-        except ValidationException as e:
-             print(f"Validation error processing file '{filename}': {e.detail}")
-             results.append(
-                 UploadResultItem(
-                    filename=filename,
-                    status="failed",
-                    error=str(e.detail),
-                 )
-             )
-        except DatabaseException as e:
-            print(f"Database error processing file '{filename}': {e.detail}")
-            traceback.print_exc()
-            results.append(
-                UploadResultItem(
-                    filename=filename,
-                    status="failed",
-                    error="Failed to store document due to a database issue.",
-                )
-            )
-        except Exception as e:
-            print(f"Unexpected error processing file '{filename}': {e}")
-            traceback.print_exc()
-            results.append(
-                UploadResultItem(
-                    filename=filename,
-                    status="failed",
-                    error="An unexpected server error occurred during upload.",
-                )
-            )
-        finally:
-            try:
-                await file.close()
-            except Exception as close_err:
-                print(f"Error closing file handle for '{filename}': {close_err}")
+    async def ingest_bounded(file: UploadFile) -> UploadResultItem:
+        async with semaphore:
+            return await ingest_upload_file(file, uploader_email, document_service)
 
+    # gather zwraca wyniki w kolejności przekazanych plików
+    results: List[UploadResultItem] = await asyncio.gather(*(ingest_bounded(file) for file in files))
     return results
 
 
+async def ingest_upload_file(
+    file: UploadFile,
+    uploader_email: EmailStr,
+    document_service: DocumentService,
+) -> UploadResultItem:
+    """Stores a single uploaded file and returns its upload result (errors are reported, not raised)."""
+    filename = file.filename
+    if not filename:
+        return UploadResultItem(
+            filename="N/A", status="failed", error="Missing filename."
+        )
+
+    try:
+        file_format = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        if not file_format:
+             raise ValidationException(f"Cannot determine file format for '{filename}'. Missing extension.")
+
+        if file.size == 0:
+            raise ValidationException("Uploaded file cannot be empty.")
+
+        # Plik jest zapisywany do GridFS fragmentami, bez wczytywania całości do pamięci
+        doc_id = await document_service.create_document_from_stream(
+            file_name=filename,
+            file_format=file_format,
+            chunks=iter_upload_chunks(file),
+            uploader_email=uploader_email,
+        )
+
+        return UploadResultItem(
+            filename=filename, documentId=doc_id, status="uploaded"
+        )
+
+    except ValidationException as e:
+         print(f"Validation error processing file '{filename}': {e.detail}")
+         return UploadResultItem(
+            filename=filename,
+            status="failed",
+            error=str(e.detail),
+         )
+    except DatabaseException as e:
+        print(f"Database error processing file '{filename}': {e.detail}")
+        traceback.print_exc()
+        return UploadResultItem(
+            filename=filename,
+            status="failed",
+            error="Failed to store document due to a database issue.",
+        )
+    except Exception as e:
+        print(f"Unexpected error processing file '{filename}': {e}")
+        traceback.print_exc()
+        return UploadResultItem(
+            filename=filename,
+            status="failed",
+            error="An unexpected server error occurred during upload.",
+        )
+    finally:
+        try:
+            await file.close()
+        except Exception as close_err:
+            print(f"Error closing file handle for '{filename}': {close_err}")
+
+
 @router.get(
     "/documents",
     response_model=DocumentList,
     summary="List Documents Metadata",
-    description="Retrieves paginated list of document metadata with filtering capabilities.",
+    description="Retrieves paginated list of document metadata with filtering capabilities. Follow next_cursor for constant-cost paging.",
 )
 async def list_documents(
     page: int = Query(1, ge=1, description="Page number starting from 1."),
@@ -148,6 +160,12 @@ async def list_documents(
     date_from: Optional[datetime] = Query(None, description="Filter documents uploaded from this date/time (ISO format)."),
     date_to: Optional[datetime] = Query(None, description="Filter documents uploaded up to this date/time (ISO format)."),
     query: Optional[str] = Query(None, description="Search term in original filename."),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; when given, page is ignored."),
+    count: ListCountMode = Query(ListCountMode.EXACT, description="How to count matching documents: 'exact', 'estimate' or 'none'."),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated large fields to include: 'normalizedText', 'analysisResult.detectedItems'.",
+    ),
     document_service: DocumentService = Depends(get_document_service),
 ):
     """Fetches list of document metadata, including filters and pagination."""
@@ -160,8 +178,13 @@ async def list_documents(
             date_from=date_from,
             date_to=date_to,
             query=query,
+            cursor=cursor,
+            count=count,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else [],
         )
         return result
+    except ValidationException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.detail)
     except DatabaseException as e:
         print(f"DB error listing docs: {e.detail}")
         traceback.print_exc()
@@ -178,6 +201,54 @@ async def list_documents(
         )
 
 
+@router.get(
+    "/documents/search",
+    response_model=DocumentSearchResult,
+    summary="Search Documents",
+    description="Full-text search over normalized text, detected sensitive data (values and labels) and filenames, ranked by relevance.",
+)
+async def search_documents(
+    q: str = Query(..., min_length=1, description="Search words (any of them matches); use \"quotes\" for an exact phrase, e.g. a PESEL number."),
+    page: int = Query(1, ge=1, description="Page number starting from 1."),
+    limit: int = Query(20, ge=1, le=100, description="Number of documents per page."),
+    conversion_status: Optional[str] = Query(None, description="Filter by conversion status (e.g., 'completed', 'pending')."),
+    original_format: Optional[str] = Query(None, description="Filter by original file format (e.g., 'pdf', 'docx')."),
+    count: ListCountMode = Query(ListCountMode.ESTIMATE, description="How to count matching documents: 'exact', 'estimate' or 'none'."),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated large fields to include: 'normalizedText', 'analysisResult.detectedItems'.",
+    ),
+    document_service: DocumentService = Depends(get_document_service),
+):
+    """Searches documents by content and detected items, most relevant first."""
+    try:
+        return await document_service.search_documents(
+            q,
+            page=page,
+            limit=limit,
+            conversion_status=conversion_status,
+            original_format=original_format,
+            count=count,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else [],
+        )
+    except ValidationException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.detail)
+    except DatabaseException as e:
+        print(f"DB error searching docs: {e.detail}")
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"DB error: {e.detail}",
+        )
+    except Exception as e:
+        print(f"Unexpected error searching docs: {e}")
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Unexpected error: {str(e)}",
+        )
+
+
 @router.get(
     "/documents/{document_id}",
     response_model=DocumentInDB,
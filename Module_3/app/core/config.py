@@ -13,11 +13,47 @@ class Settings(BaseSettings):
     
     # Module 2
     CONVERSION_SERVICE_URL: str = "http://extractor:8000/file"
+    # Strumieniowe API konwersji (NDJSON, np. "http://extractor:8000/file/stream"). Gdy ustawione, używane zamiast CONVERSION_SERVICE_URL.
+    CONVERSION_STREAM_URL: Optional[str] = None
 
     # Module 4
     DETECTION_SERVICE_URL: str = "http://detector-api:8000/detect"
+    # Asynchroniczne API zadań Modułu 4 (POST /jobs + wspólny long-poll). Gdy puste, używane jest synchroniczne /detect.
+    DETECTION_JOBS_URL: Optional[str] = None
+    DETECTION_JOB_POLL_WAIT: float = 20.0
 
     # Module 5
     NOTIFICATION_SERVICE_URL: str = "http://notifications:8765/api/send-notification/"
 
+    # Liczba plików z jednego żądania POST /documents zapisywanych równolegle
+    UPLOAD_CONCURRENCY: int = 8
+    # Deduplikacja plików po skrócie treści (kolekcja 'blobs', wspólny plik w GridFS i ponowne użycie wyników)
+    UPLOAD_DEDUPLICATION: bool = False
+
+    # Współdzielony klient HTTP pipeline'u (pula połączeń keep-alive)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_HTTP2: bool = True  # używane tylko, gdy zainstalowany jest pakiet 'h2'
+    HTTP_DEFAULT_TIMEOUT: float = 30.0
+
+    # Timeouty poszczególnych usług (sekundy)
+    CONVERSION_TIMEOUT: float = 180.0
+    DETECTION_TIMEOUT: float = 180.0
+    NOTIFICATION_TIMEOUT: float = 30.0
+
+    # Harmonogram potoku: liczba dokumentów przetwarzanych równolegle, rozmiar kolejki zdarzeń
+    # (pełna kolejka wstrzymuje odczyt strumienia zmian) i liczba workerów poszczególnych etapów
+    PIPELINE_WORKERS: int = 16
+    PIPELINE_QUEUE_SIZE: int = 100
+    PIPELINE_CONVERSION_WORKERS: int = 4
+    PIPELINE_DETECTION_WORKERS: int = 8  # równoczesne zlecenia zadań detekcji (oczekiwanie na wynik nie jest limitowane)
+    PIPELINE_NOTIFICATION_WORKERS: int = 4
+
+    # Dzierżawy dokumentów przy wielu replikach usługi (identyfikator właściciela domyślnie: host-pid-losowy sufiks)
+    PIPELINE_OWNER_ID: Optional[str] = None
+    LEASE_SECONDS: float = 120.0
+    LEASE_HEARTBEAT_INTERVAL: float = 30.0
+    LEASE_RECLAIM_INTERVAL: float = 60.0
+
 settings = Settings()
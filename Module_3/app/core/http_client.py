@@ -0,0 +1,73 @@
+import importlib.util
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClientContext:
+    """
+    Stores the HTTP client shared by the processing pipeline (calls to Modules 2, 4 and 5).
+    Used as a global singleton, like the MongoDB context.
+    """
+
+    client: httpx.AsyncClient | None = None
+
+
+http_context = HttpClientContext()
+
+
+def _http2_available() -> bool:
+    # HTTP/2 w httpx wymaga opcjonalnego pakietu 'h2'
+    return importlib.util.find_spec("h2") is not None
+
+
+async def start_http_client():
+    """
+    Creates the pooled, keep-alive HTTP client.
+    Called when a FastAPI application starts (lifespan).
+    """
+    if http_context.client is not None:
+        logger.info("HTTP client already started.")
+        return
+    http2 = settings.HTTP_HTTP2 and _http2_available()
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    http_context.client = httpx.AsyncClient(limits=limits, http2=http2, timeout=settings.HTTP_DEFAULT_TIMEOUT)
+    logger.info(
+        f"HTTP client started (max_connections={settings.HTTP_MAX_CONNECTIONS}, "
+        f"keepalive={settings.HTTP_MAX_KEEPALIVE_CONNECTIONS}, http2={http2})."
+    )
+
+
+async def close_http_client():
+    """
+    Closes the shared HTTP client and its connection pool.
+    Called when closing a FastAPI application (lifespan).
+    """
+    if http_context.client is not None:
+        logger.info("Closing HTTP client...")
+        await http_context.client.aclose()
+        http_context.client = None
+        logger.info("HTTP client closed.")
+
+
+@asynccontextmanager
+async def pipeline_http_client() -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Yields the shared HTTP client. Outside the application lifespan (e.g. scripts, tests)
+    a short-lived client is created instead.
+    """
+    if http_context.client is not None:
+        yield http_context.client
+    else:
+        async with httpx.AsyncClient(timeout=settings.HTTP_DEFAULT_TIMEOUT) as client:
+            yield client
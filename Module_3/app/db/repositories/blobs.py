@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.exceptions import DatabaseException
+
+# Repozytorium kolekcji 'blobs' - deduplikacja plików po skrócie treści. Każdy unikalny plik jest
+# zapisany w GridFS raz, a dokumenty odwołują się do niego; refCount liczy odwołania.
+
+BLOB_HASH_INDEX_NAME = "contentHash_unique"
+
+
+class BlobRepository:
+    def __init__(self, database: AsyncIOMotorDatabase):
+        """Initializes the repository with a database instance."""
+        self.collection: AsyncIOMotorCollection = database.blobs
+
+    async def create_indexes(self) -> None:
+        """Creates the unique index on the content hash."""
+        try:
+            await self.collection.create_index("contentHash", name=BLOB_HASH_INDEX_NAME, unique=True)
+        except Exception as e:
+            raise DatabaseException(f"Failed to create blob indexes: {str(e)}")
+
+    async def acquire(self, content_hash: str, gridfs_file_id: ObjectId, size: int) -> Dict[str, Any]:
+        """
+        Adds a reference to the blob with the given hash, registering gridfs_file_id as its
+        content when the hash is new. Returns the blob; when its gridfsId differs from
+        gridfs_file_id, identical content was already stored.
+        """
+        for attempt in range(2):
+            try:
+                return await self.collection.find_one_and_update(
+                    {"contentHash": content_hash},
+                    {
+                        "$inc": {"refCount": 1},
+                        "$setOnInsert": {
+                            "gridfsId": gridfs_file_id,
+                            "size": size,
+                            "createdAt": datetime.now(timezone.utc),
+                        },
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+            except DuplicateKeyError:
+                # Równoległy upsert tego samego skrótu - ponowienie trafi w istniejący blob
+                if attempt:
+                    raise DatabaseException(f"Failed to register blob {content_hash}: concurrent insert.")
+            except Exception as e:
+                raise DatabaseException(f"Failed to register blob {content_hash}: {str(e)}")
+
+    async def release(self, blob_id: ObjectId) -> Optional[ObjectId]:
+        """
+        Removes a reference to the blob. Returns the GridFS file id when it was the last
+        reference and the blob was removed (the caller deletes the file), otherwise None.
+        """
+        try:
+            blob = await self.collection.find_one_and_update(
+                {"_id": blob_id},
+                {"$inc": {"refCount": -1}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if blob is None or blob.get("refCount", 0) > 0:
+                return None
+            # Warunek refCount <= 0 chroni przed usunięciem bloba, do którego w międzyczasie dodano odwołanie
+            result = await self.collection.delete_one({"_id": blob_id, "refCount": {"$lte": 0}})
+        except Exception as e:
+            raise DatabaseException(f"Failed to release blob {blob_id}: {str(e)}")
+        return blob.get("gridfsId") if result.deleted_count else None
@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+from app.core.exceptions import DatabaseException
+
+# Repozytorium stanu strumieni zmian. Przechowuje token wznowienia (resume token) ostatnio
+# obsłużonego zdarzenia, dzięki czemu nasłuch po restarcie lub błędzie wznawia się od tego miejsca.
+
+
+class ChangeStreamStateRepository:
+    def __init__(self, database: AsyncIOMotorDatabase):
+        """Initializes the repository with a database instance."""
+        self.collection: AsyncIOMotorCollection = database.changeStreamState
+
+    async def get_resume_token(self, stream_name: str) -> Optional[Dict[str, Any]]:
+        """Returns the persisted resume token of the stream, or None if there is none."""
+        try:
+            state = await self.collection.find_one({"_id": stream_name}, {"resumeToken": 1})
+        except Exception as e:
+            raise DatabaseException(f"Failed to read resume token of stream '{stream_name}': {str(e)}")
+        return state.get("resumeToken") if state else None
+
+    async def save_resume_token(self, stream_name: str, resume_token: Dict[str, Any]) -> None:
+        """Persists the resume token of the last handled event of the stream."""
+        try:
+            await self.collection.update_one(
+                {"_id": stream_name},
+                {"$set": {"resumeToken": resume_token, "updatedAt": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        except Exception as e:
+            raise DatabaseException(f"Failed to save resume token of stream '{stream_name}': {str(e)}")
+
+    async def clear_resume_token(self, stream_name: str) -> None:
+        """Removes the resume token, so the stream starts from the current moment."""
+        try:
+            await self.collection.delete_one({"_id": stream_name})
+        except Exception as e:
+            raise DatabaseException(f"Failed to clear resume token of stream '{stream_name}': {str(e)}")
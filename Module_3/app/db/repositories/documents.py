@@ -1,26 +1,33 @@
 from enum import Enum
 import mimetypes
-from typing import Optional, Dict, Any, Tuple, AsyncIterator
+from typing import Optional, Dict, Any, Tuple, AsyncIterator, Sequence
 from motor.motor_asyncio import (
     AsyncIOMotorDatabase,
     AsyncIOMotorCollection,
     AsyncIOMotorGridFSBucket,
     AsyncIOMotorGridOut,
 )
-from bson import ObjectId
-from datetime import datetime, timezone
+from bson import ObjectId, json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from datetime import datetime, timedelta, timezone
+import base64
 import hashlib
-import io
 from gridfs.errors import NoFile as GridFSFileNotFound
+from pymongo import IndexModel, ReturnDocument
 
 from pydantic import BaseModel
 
 from app.core.exceptions import DatabaseException, ValidationException, FileNotFoundInGridFSException
+from app.db.repositories.blobs import BlobRepository
 from app.models.documents import (
     DocumentCreate,
     DocumentUpdate,
     DocumentInDB,
-    ConversionStatus
+    DocumentSummary,
+    DocumentSearchHit,
+    AnalysisStatus,
+    ConversionStatus,
+    ListCountMode,
 )
 
 # Klasa repozytorium implementuje wzorzec Repository,
@@ -28,6 +35,91 @@ from app.models.documents import (
 
 CHUNK_SIZE = 1024 * 1024
 
+# Sortowanie listy dokumentów (od najnowszych); _id rozstrzyga remisy znaczników czasu
+LIST_SORT = [("uploadTimestamp", -1), ("_id", -1)]
+
+# Górna granica liczenia przy szacowanej liczbie dokumentów listy (koszt liczenia nie rośnie z kolekcją)
+ESTIMATED_COUNT_LIMIT = 10000
+
+# Projekcja listy dokumentów - pomija normalizedText i analysisResult.detectedItems (duże pola),
+# zamiast listy wykrytych elementów zwracana jest ich liczba
+LIST_SUMMARY_PROJECTION = {
+    "originalFilename": 1,
+    "originalFormat": 1,
+    "uploaderEmail": 1,
+    "uploadTimestamp": 1,
+    "contentHash": 1,
+    "conversionTimestamp": 1,
+    "conversionStatus": 1,
+    "conversionError": 1,
+    "metadata": 1,
+    "originalDocumentPath": 1,
+    "processingTimeSeconds": 1,
+    "analysisResult.status": 1,
+    "analysisResult.timestamp": 1,
+    "analysisResult.error": 1,
+    "analysisResult.analysisTime": 1,
+    "detectedItemsCount": {"$size": {"$ifNull": ["$analysisResult.detectedItems", []]}},
+}
+# Pola, które można dołączyć do listy parametrem fields=
+LIST_OPTIONAL_FIELDS = ("normalizedText", "analysisResult.detectedItems")
+
+# Indeksy listy dokumentów: pola filtrów równościowych, a po nich pola sortowania - zakres dat
+# na uploadTimestamp korzysta z tego samego klucza. Każda kombinacja filtrów get_list ma swój indeks.
+LIST_INDEX_NAME = "uploadTimestamp_id"
+STATUS_LIST_INDEX_NAME = "conversionStatus_uploadTimestamp_id"
+FORMAT_LIST_INDEX_NAME = "originalFormat_uploadTimestamp_id"
+STATUS_FORMAT_LIST_INDEX_NAME = "conversionStatus_originalFormat_uploadTimestamp_id"
+# Wyszukiwanie dokumentów oczekujących na przetworzenie (backfill przy starcie) korzysta z indeksu
+# STATUS_LIST_INDEX_NAME. Zapytania nie wymuszają indeksu (hint): brak indeksu (np. nieudane tworzenie
+# przy starcie) spowalnia zapytanie zamiast kończyć je błędem OperationFailure.
+# Statusy analizy, przy których dokument po zakończonej konwersji nadal czeka na detekcję
+# (None - brak analysisResult, np. replika przerwała pracę w trakcie detekcji)
+UNFINISHED_ANALYSIS_STATUSES = (None, AnalysisStatus.PENDING.value, AnalysisStatus.NOT_STARTED.value)
+# Dokumenty wymagające przetworzenia: oczekujące na konwersję albo z niedokończoną analizą
+UNFINISHED_PROCESSING_FILTER = {
+    "$or": [
+        {"conversionStatus": ConversionStatus.STATUS_PENDING.value},
+        {
+            "conversionStatus": ConversionStatus.STATUS_COMPLETED.value,
+            "analysisResult.status": {"$in": list(UNFINISHED_ANALYSIS_STATUSES)},
+        },
+    ]
+}
+# Indeks używany do odzyskiwania dzierżaw (lease) porzuconych przez inne repliki
+LEASE_INDEX_NAME = "conversionStatus_leaseExpiresAt"
+# Indeks używany do wyszukiwania gotowych wyników dla identycznej treści (deduplikacja)
+CONTENT_HASH_INDEX_NAME = "contentHash"
+
+# Indeks pełnotekstowy wyszukiwania dokumentów (kolekcja może mieć tylko jeden indeks tekstowy).
+# Wagi podbijają trafienia w wykrytych danych i nazwie pliku względem treści dokumentu; język "none"
+# wyłącza angielski stemming i listę stop-słów, nieprzydatne dla polskich dokumentów i numerów (np. PESEL).
+TEXT_INDEX_NAME = "documents_text"
+TEXT_INDEX_WEIGHTS = {
+    "analysisResult.detectedItems.value": 10,
+    "analysisResult.detectedItems.label": 5,
+    "originalFilename": 5,
+    "normalizedText": 1,
+}
+
+DOCUMENT_INDEXES = [
+    IndexModel(LIST_SORT, name=LIST_INDEX_NAME),
+    IndexModel([("conversionStatus", 1)] + LIST_SORT, name=STATUS_LIST_INDEX_NAME),
+    IndexModel([("originalFormat", 1)] + LIST_SORT, name=FORMAT_LIST_INDEX_NAME),
+    IndexModel([("conversionStatus", 1), ("originalFormat", 1)] + LIST_SORT, name=STATUS_FORMAT_LIST_INDEX_NAME),
+    IndexModel([("conversionStatus", 1), ("leaseExpiresAt", 1)], name=LEASE_INDEX_NAME),
+    IndexModel([("contentHash", 1)], name=CONTENT_HASH_INDEX_NAME),
+    IndexModel(
+        [(field, "text") for field in TEXT_INDEX_WEIGHTS],
+        name=TEXT_INDEX_NAME,
+        weights=TEXT_INDEX_WEIGHTS,
+        default_language="none",
+    ),
+]
+# Indeksy zastąpione przez DOCUMENT_INDEXES (usuwane przy starcie): conversionStatus_uploadTimestamp
+# bez _id jako ostatniego klucza nie obsługuje stronicowania listy i dubluje STATUS_LIST_INDEX_NAME
+SUPERSEDED_INDEX_NAMES = ("conversionStatus_uploadTimestamp",)
+
 class DocumentRepository:
     def __init__(self, database: AsyncIOMotorDatabase, file_system: AsyncIOMotorGridFSBucket):
         """Initializes the repository with a database instance."""
@@ -35,69 +127,229 @@ class DocumentRepository:
         self.collection: AsyncIOMotorCollection = database.documents
         self.fs: AsyncIOMotorGridFSBucket = file_system
 
-    async def _calculate_hash(self, content: bytes) -> str:
-        """Computes a SHA-256 hash of the file contents."""
-        sha256_hash = hashlib.sha256()
-        sha256_hash.update(content)
-        return f"sha256:{sha256_hash.hexdigest()}"
+    async def create_indexes(self) -> None:
+        """
+        Drops the superseded indexes and creates the indexes of the 'documents' collection one by one
+        (no-op for existing ones), so a conflict on one index does not block the others.
+        """
+        errors = []
+        try:
+            existing = await self.collection.index_information()
+        except Exception as e:
+            existing = {}
+            errors.append(f"index_information: {str(e)}")
+        for name in SUPERSEDED_INDEX_NAMES:
+            if name not in existing:
+                continue
+            try:
+                await self.collection.drop_index(name)
+            except Exception as e:
+                errors.append(f"drop {name}: {str(e)}")
+        for index in DOCUMENT_INDEXES:
+            try:
+                await self.collection.create_indexes([index])
+            except Exception as e:
+                errors.append(f"{index.document['name']}: {str(e)}")
+        if errors:
+            raise DatabaseException(f"Failed to create indexes: {'; '.join(errors)}")
+
+    def _blobs(self) -> BlobRepository:
+        return BlobRepository(self.db)
+
+    def find_pending(self) -> AsyncIterator[Dict[str, Any]]:
+        """Iterates over documents still needing processing (conversion pending or analysis unfinished), oldest first."""
+        return self.collection.find(UNFINISHED_PROCESSING_FILTER).sort("uploadTimestamp", 1)
+
+    async def claim(self, document_id: str, owner: str, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claims a document that still needs processing (conversion pending or analysis
+        not finished) for the given owner. Succeeds when the document has no lease or its lease
+        has expired; returns the claimed document, or None when it is already processed or another
+        owner holds it.
+        """
+        if not ObjectId.is_valid(document_id):
+            return None
+        now = datetime.now(timezone.utc)
+        try:
+            return await self.collection.find_one_and_update(
+                {
+                    "_id": ObjectId(document_id),
+                    "$and": [
+                        UNFINISHED_PROCESSING_FILTER,
+                        {
+                            "$or": [
+                                {"leaseExpiresAt": None},
+                                {"leaseExpiresAt": {"$lt": now}},
+                                {"processingOwner": owner},
+                            ]
+                        },
+                    ],
+                },
+                {"$set": {"processingOwner": owner, "leaseExpiresAt": now + timedelta(seconds=lease_seconds)}},
+                return_document=ReturnDocument.AFTER,
+            )
+        except Exception as e:
+            raise DatabaseException(f"Failed to claim document {document_id}: {str(e)}")
+
+    async def renew_lease(self, document_id: str, owner: str, lease_seconds: float) -> bool:
+        """Extends the lease held by the owner; returns False when the lease was lost."""
+        try:
+            result = await self.collection.update_one(
+                {"_id": ObjectId(document_id), "processingOwner": owner},
+                {"$set": {"leaseExpiresAt": datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)}},
+            )
+        except Exception as e:
+            raise DatabaseException(f"Failed to renew lease of document {document_id}: {str(e)}")
+        return result.matched_count > 0
+
+    async def release_lease(self, document_id: str, owner: str) -> None:
+        """Removes the lease if it is still held by the owner."""
+        try:
+            await self.collection.update_one(
+                {"_id": ObjectId(document_id), "processingOwner": owner},
+                {"$unset": {"processingOwner": "", "leaseExpiresAt": ""}},
+            )
+        except Exception as e:
+            raise DatabaseException(f"Failed to release lease of document {document_id}: {str(e)}")
+
+    def find_expired_leases(self) -> AsyncIterator[Dict[str, Any]]:
+        """Iterates over unfinished documents whose lease expired (their owner stopped processing them)."""
+        return self.collection.find(
+            {
+                **UNFINISHED_PROCESSING_FILTER,
+                "leaseExpiresAt": {"$lt": datetime.now(timezone.utc)},
+            }
+        )
 
-    async def create(
+    async def create_from_stream(
         self,
         document_data: DocumentCreate,
-        file_content: bytes,
+        chunks: AsyncIterator[bytes],
         file_name_for_gridfs: str,
+        deduplicate: bool = False,
     ) -> str:
         """
-        Creates a new document: saves the file to GridFS and the metadata to the 'documents' collection.
+        Creates a new document from a stream of file chunks. Each chunk is written to GridFS
+        and added to the SHA-256 hash in the same pass, so the file is never held in memory.
+
+        With deduplicate, the file is registered in the 'blobs' collection by its hash. When the
+        same content is already stored, the new copy is removed, the document references the
+        existing file and reuses the normalized text and analysis of an already processed copy.
         Returns the ID of the created document (as a string).
         """
+        guessed_type, _ = mimetypes.guess_type(file_name_for_gridfs)
+        content_type_for_gridfs = guessed_type if guessed_type else "application/octet-stream"
+        grid_in = None
         gridfs_file_id = None
+        blob_id = None
         try:
-            file_stream = io.BytesIO(file_content)
-            guessed_type, _ = mimetypes.guess_type(file_name_for_gridfs)
-            content_type_for_gridfs = guessed_type if guessed_type else "application/octet-stream"
-            gridfs_file_id = await self.fs.upload_from_stream(
-                filename=file_name_for_gridfs,
-                source=file_stream,
+            grid_in = self.fs.open_upload_stream(
+                file_name_for_gridfs,
                 metadata={
                     "contentType": content_type_for_gridfs,
                     "originalFilename": document_data.original_filename,
                     "uploadTimestamp": datetime.now(timezone.utc),
                 },
             )
-            content_hash = await self._calculate_hash(file_content)
-
-            doc_dict = document_data.model_dump(by_alias=True)
-            doc_dict.update(
-                {
-                    "uploadTimestamp": datetime.now(timezone.utc),
-                    "contentHash": content_hash,
-                    "originalDocumentPath": f"gridfs:{str(gridfs_file_id)}",
-                    "conversionStatus": ConversionStatus.STATUS_PENDING.value,
-                    "analysisResult": None,
-                    "normalizedText": None,
-                }
-            )
+            sha256_hash = hashlib.sha256()
+            file_size = 0
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                await grid_in.write(chunk)
+                sha256_hash.update(chunk)
+                file_size += len(chunk)
+
+            if file_size == 0:
+                await grid_in.abort()
+                grid_in = None
+                raise ValidationException("File content cannot be empty.")
+
+            await grid_in.close()
+            gridfs_file_id = grid_in._id
+            grid_in = None
+
+            content_hash = f"sha256:{sha256_hash.hexdigest()}"
+            reused_results: Dict[str, Any] = {}
+            if deduplicate:
+                blob = await self._blobs().acquire(content_hash, gridfs_file_id, file_size)
+                blob_id = blob["_id"]
+                if blob["gridfsId"] != gridfs_file_id:
+                    # Identyczna treść jest już zapisana - nowa kopia w GridFS jest zbędna
+                    await self.fs.delete(gridfs_file_id)
+                    gridfs_file_id = blob["gridfsId"]
+                    reused_results = await self._find_reusable_results(content_hash)
 
+            doc_dict = self._new_document_dict(document_data, gridfs_file_id, content_hash)
+            if blob_id is not None:
+                doc_dict["blobId"] = blob_id
+            doc_dict.update(reused_results)
             result = await self.collection.insert_one(doc_dict)
 
             if not result.inserted_id:
-                await self.fs.delete(gridfs_file_id)
                 raise DatabaseException("Failed to insert document metadata.")
-            
+
             return str(result.inserted_id)
+        except ValidationException:
+            raise
         except Exception as e:
-            print(f"Error in create document: {e}")
+            print(f"Error in create document from stream: {e}")
+            if grid_in is not None:
+                try:
+                    await grid_in.abort()
+                except Exception as abort_error:
+                    print(f"Error aborting GridFS upload of '{file_name_for_gridfs}': {abort_error}")
+            if blob_id is not None:
+                # Plik może być współdzielony - usuwany tylko, gdy było to ostatnie odwołanie
+                try:
+                    gridfs_file_id = await self._blobs().release(blob_id)
+                except Exception as release_error:
+                    print(f"Error releasing blob {blob_id}: {release_error}")
+                    gridfs_file_id = None
             if gridfs_file_id:
                 try:
                     await self.fs.delete(gridfs_file_id)
                     print(f"Cleaned up GridFS file {gridfs_file_id} after error.")
                 except Exception as cleanup_error:
-                    print(
-                        f"Error cleaning up GridFS file {gridfs_file_id}: {cleanup_error}"
-                    )
+                    print(f"Error cleaning up GridFS file {gridfs_file_id}: {cleanup_error}")
             raise DatabaseException(f"Failed to create document with GridFS: {str(e)}")
 
+    async def _find_reusable_results(self, content_hash: str) -> Dict[str, Any]:
+        """Returns the conversion and analysis fields of a fully processed document with the same content."""
+        source = await self.collection.find_one(
+            {
+                "contentHash": content_hash,
+                "conversionStatus": ConversionStatus.STATUS_COMPLETED.value,
+                "analysisResult.status": AnalysisStatus.COMPLETED.value,
+            },
+            {"normalizedText": 1, "metadata": 1, "conversionTimestamp": 1, "analysisResult": 1},
+        )
+        if not source:
+            return {}
+        return {
+            "conversionStatus": ConversionStatus.STATUS_COMPLETED.value,
+            "conversionTimestamp": source.get("conversionTimestamp"),
+            "normalizedText": source.get("normalizedText"),
+            "metadata": source.get("metadata"),
+            "analysisResult": source.get("analysisResult"),
+            "deduplicatedFrom": source["_id"],
+        }
+
+    def _new_document_dict(self, document_data: DocumentCreate, gridfs_file_id: ObjectId, content_hash: str) -> Dict[str, Any]:
+        """Builds the 'documents' entry of a newly uploaded file."""
+        doc_dict = document_data.model_dump(by_alias=True)
+        doc_dict.update(
+            {
+                "uploadTimestamp": datetime.now(timezone.utc),
+                "contentHash": content_hash,
+                "originalDocumentPath": f"gridfs:{str(gridfs_file_id)}",
+                "conversionStatus": ConversionStatus.STATUS_PENDING.value,
+                "analysisResult": None,
+                "normalizedText": None,
+            }
+        )
+        return doc_dict
+
     async def get_by_id(self, document_id: str) -> Optional[DocumentInDB]:
         """Retrieves a document from the database based on its ID."""
         if not ObjectId.is_valid(document_id):
@@ -113,6 +365,118 @@ class DocumentRepository:
             print(f"Error getting document {document_id}: {e}")
             raise DatabaseException(f"Failed to get document {document_id}: {str(e)}")
 
+    @staticmethod
+    def build_list_filter(
+        conversion_status: Optional[str] = None,
+        original_format: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        query: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Builds the MongoDB filter of the document list (served by the DOCUMENT_INDEXES list indexes)."""
+        filter_dict = {}
+
+        if conversion_status:
+            try:
+                filter_dict["conversionStatus"] = ConversionStatus(conversion_status).value
+            except ValueError:
+                raise ValidationException(f"Invalid conversion status value: {conversion_status}")
+
+        if original_format:
+            filter_dict["originalFormat"] = original_format
+
+        date_filter = {}
+
+        if date_from:
+            date_filter["$gte"] = date_from
+
+        if date_to:
+            date_filter["$lte"] = date_to
+
+        if date_filter:
+            filter_dict["uploadTimestamp"] = date_filter
+
+        if query:
+            filter_dict["$or"] = [
+                {"originalFilename": {"$regex": query, "$options": "i"}},
+            ]
+
+        return filter_dict
+
+    @staticmethod
+    def build_list_projection(fields: Sequence[str] = ()) -> Dict[str, Any]:
+        """Builds the projection of the document list: the summary fields plus the requested LIST_OPTIONAL_FIELDS."""
+        unknown = [field for field in fields if field not in LIST_OPTIONAL_FIELDS]
+        if unknown:
+            raise ValidationException(
+                f"Unknown list fields: {', '.join(unknown)}. Allowed: {', '.join(LIST_OPTIONAL_FIELDS)}."
+            )
+        return {**LIST_SUMMARY_PROJECTION, **{field: 1 for field in fields}}
+
+    def list_cursor(
+        self,
+        filter_dict: Dict[str, Any],
+        skip: int = 0,
+        limit: int = 20,
+        projection: Optional[Dict[str, Any]] = None,
+    ):
+        """Returns the cursor of one page of the document list, newest first."""
+        return (
+            self.collection.find(filter_dict, projection or LIST_SUMMARY_PROJECTION)
+            .sort(LIST_SORT)
+            .skip(skip)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def encode_list_cursor(document: Dict[str, Any]) -> str:
+        """Encodes the sort key (uploadTimestamp, _id) of the last listed document as an opaque cursor."""
+        key = json_util.dumps(
+            {"t": document["uploadTimestamp"], "id": document["_id"]},
+            json_options=CANONICAL_JSON_OPTIONS,
+        )
+        return base64.urlsafe_b64encode(key.encode("utf-8")).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_list_cursor(cursor: str) -> Dict[str, Any]:
+        """
+        Decodes a cursor produced by encode_list_cursor into the filter selecting the documents
+        after it in the list order.
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            key = json_util.loads(
+                base64.urlsafe_b64decode(padded.encode("ascii")),
+                json_options=CANONICAL_JSON_OPTIONS.with_options(tz_aware=True, tzinfo=timezone.utc),
+            )
+            upload_timestamp, document_id = key["t"], key["id"]
+        except Exception as e:
+            raise ValidationException(f"Invalid list cursor: {str(e)}")
+        if not isinstance(upload_timestamp, datetime) or not isinstance(document_id, ObjectId):
+            raise ValidationException("Invalid list cursor.")
+
+        return {
+            "$or": [
+                {"uploadTimestamp": {"$lt": upload_timestamp}},
+                {"uploadTimestamp": upload_timestamp, "_id": {"$lt": document_id}},
+            ]
+        }
+
+    async def count_list(self, filter_dict: Dict[str, Any], count: ListCountMode) -> Tuple[Optional[int], bool]:
+        """
+        Counts the documents matching the list filter. Returns (total, estimated); an estimated
+        total of the filtered list is a lower bound capped at ESTIMATED_COUNT_LIMIT.
+        """
+        if count == ListCountMode.NONE:
+            return None, False
+        if count == ListCountMode.EXACT:
+            return await self.collection.count_documents(filter_dict), False
+        if not filter_dict:
+            # Liczba z metadanych kolekcji, bez skanowania indeksu
+            return await self.collection.estimated_document_count(), True
+        total = await self.collection.count_documents(filter_dict, limit=ESTIMATED_COUNT_LIMIT)
+        return total, total >= ESTIMATED_COUNT_LIMIT
+
     async def get_list(
         self,
         page: int = 1,
@@ -122,59 +486,92 @@ class DocumentRepository:
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
         query: Optional[str] = None,
+        cursor: Optional[str] = None,
+        count: ListCountMode = ListCountMode.EXACT,
+        fields: Sequence[str] = (),
     ) -> Dict[str, Any]:
-        """Gets a list of documents, with filtering and pagination taken into account."""
+        """
+        Gets a list of document summaries, with filtering and pagination taken into account.
+        With a cursor (next_cursor of the previous page) the page is located through the
+        (uploadTimestamp, _id) index instead of skipping, and page is ignored.
+        Large fields are only read when requested in fields (see LIST_OPTIONAL_FIELDS).
+        """
         try:
-            filter_dict = {}
-
-            if conversion_status:
-                try:
-                    filter_dict["conversionStatus"] = ConversionStatus(conversion_status).value
-                except ValueError:
-                    raise ValidationException(f"Invalid conversion status value: {conversion_status}")
-                
-            if original_format:
-                filter_dict["originalFormat"] = original_format
+            filter_dict = self.build_list_filter(conversion_status, original_format, date_from, date_to, query)
+            projection = self.build_list_projection(fields)
 
-            date_filter = {}
+            total, total_estimated = await self.count_list(filter_dict, ListCountMode(count))
 
-            if date_from:
-                date_filter["$gte"] = date_from
+            if cursor:
+                after_cursor = self.decode_list_cursor(cursor)
+                page_filter = {"$and": [filter_dict, after_cursor]} if filter_dict else after_cursor
+                page_cursor = self.list_cursor(page_filter, 0, limit + 1, projection)
+            else:
+                skip = (page - 1) * limit
+                page_cursor = self.list_cursor(filter_dict, skip, limit + 1, projection)
 
-            if date_to:
-                date_filter["$lte"] = date_to
+            # Jeden dodatkowy dokument informuje, czy istnieje następna strona
+            raw_documents = [doc async for doc in page_cursor]
+            next_cursor = self.encode_list_cursor(raw_documents[limit - 1]) if len(raw_documents) > limit else None
+            documents_list = [DocumentSummary.model_validate(doc) for doc in raw_documents[:limit]]
 
-            if date_filter:
-                filter_dict["uploadTimestamp"] = date_filter
+            return {
+                "total": total,
+                "total_estimated": total_estimated,
+                "page": None if cursor else page,
+                "limit": limit,
+                "documents": documents_list,
+                "next_cursor": next_cursor,
+            }
+        except ValidationException as ve:
+            raise ve
+        except Exception as e:
+            print(f"Error listing documents: {e}")
+            raise DatabaseException(f"Failed to list documents: {str(e)}")
 
-            if query:
-                filter_dict["$or"] = [
-                    {"originalFilename": {"$regex": query, "$options": "i"}},
-                ]
+    async def search(
+        self,
+        text: str,
+        page: int = 1,
+        limit: int = 20,
+        conversion_status: Optional[str] = None,
+        original_format: Optional[str] = None,
+        count: ListCountMode = ListCountMode.ESTIMATE,
+        fields: Sequence[str] = (),
+    ) -> Dict[str, Any]:
+        """
+        Full-text search over the normalized text, detected items and filename (TEXT_INDEX_NAME),
+        most relevant first. Words are matched as whole tokens (any of them); quoted phrases must match exactly.
+        """
+        try:
+            filter_dict = self.build_list_filter(conversion_status, original_format)
+            filter_dict["$text"] = {"$search": text}
+            projection = {**self.build_list_projection(fields), "score": {"$meta": "textScore"}}
 
-            total = await self.collection.count_documents(filter_dict)
+            total, total_estimated = await self.count_list(filter_dict, ListCountMode(count))
 
-            skip = (page - 1) * limit
             cursor = (
-                self.collection.find(filter_dict)
-                .sort("uploadTimestamp", -1)
-                .skip(skip)
-                .limit(limit)
+                self.collection.find(filter_dict, projection)
+                .sort([("score", {"$meta": "textScore"}), ("_id", -1)])
+                .skip((page - 1) * limit)
+                .limit(limit + 1)
             )
-
-            documents_list = [DocumentInDB.model_validate(doc) async for doc in cursor]
+            raw_documents = [doc async for doc in cursor]
+            hits = [DocumentSearchHit.model_validate(doc) for doc in raw_documents[:limit]]
 
             return {
                 "total": total,
+                "total_estimated": total_estimated,
                 "page": page,
                 "limit": limit,
-                "documents": documents_list,
+                "documents": hits,
+                "next_page": page + 1 if len(raw_documents) > limit else None,
             }
         except ValidationException as ve:
             raise ve
         except Exception as e:
-            print(f"Error listing documents: {e}")
-            raise DatabaseException(f"Failed to list documents: {str(e)}")
+            print(f"Error searching documents: {e}")
+            raise DatabaseException(f"Failed to search documents: {str(e)}")
 
     async def update(
         self, document_id: str, document_update: DocumentUpdate
@@ -247,7 +644,7 @@ class DocumentRepository:
         try:
             doc_meta = await self.collection.find_one(
                 {"_id": ObjectId(document_id)},
-                {"originalDocumentPath": 1}
+                {"originalDocumentPath": 1, "blobId": 1}
             )
             if not doc_meta: return False
 
@@ -258,6 +655,10 @@ class DocumentRepository:
             delete_result = await self.collection.delete_one({"_id": ObjectId(document_id)})
             deleted_meta = delete_result.deleted_count > 0
 
+            if doc_meta.get("blobId") is not None:
+                # Plik deduplikowany - usuwany z GridFS dopiero po zwolnieniu ostatniego odwołania
+                original_gridfs_file_id = await self._blobs().release(doc_meta["blobId"]) if deleted_meta else None
+
             if original_gridfs_file_id:
                 try:
                     await self.fs.delete(original_gridfs_file_id)
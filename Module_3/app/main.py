@@ -1,12 +1,13 @@
 import asyncio
 import datetime
-from io import BytesIO
 import mimetypes
 
 from bson import ObjectId
+from pymongo.errors import OperationFailure
 from fastapi import FastAPI, HTTPException
 from fastapi.exceptions import RequestValidationError, ValidationException
-from contextlib import asynccontextmanager
+from contextlib import aclosing, asynccontextmanager, nullcontext
+from typing import Callable
 import logging
 
 import httpx
@@ -16,10 +17,19 @@ from fastapi.middleware.cors import CORSMiddleware
 
 
 from app.models.documents import AnalysisResult, AnalysisStatus, ConversionStatus, DocumentMetadata, DocumentUpdate
-from app.db.repositories.documents import DocumentRepository
+from app.db.repositories.documents import DocumentRepository, UNFINISHED_ANALYSIS_STATUSES
+from app.db.repositories.change_streams import ChangeStreamStateRepository
+from app.db.repositories.blobs import BlobRepository
+from app.services.detection_jobs import DetectionJobClient
+from app.services.pipeline_scheduler import PipelineScheduler
+from app.services.leases import LeaseManager, LeaseLost
+from app.services.resume_tokens import ResumeTokenTracker
+from app.services.multipart_stream import MultipartFileStream, prepend_chunk
+from app.services.conversion_stream import read_conversion_stream
 from app.api.endpoints import documents
 from app.core.config import settings
 from app.db.mongodb import db_context, connect_to_mongo, close_mongo_connection
+from app.core.http_client import http_context, start_http_client, close_http_client, pipeline_http_client
 from app.api.errors import (
     conflict_exception_handler,
     http_exception_handler,
@@ -50,9 +60,101 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 change_stream_listener_task: asyncio.Task | None = None
+detection_job_client: DetectionJobClient | None = None
+pipeline_scheduler: PipelineScheduler | None = None
+
+DOCUMENTS_CHANGE_STREAM = "documents"
+# InvalidResumeToken, ChangeStreamFatalError, ChangeStreamHistoryLost
+RESUME_TOKEN_ERROR_CODES = (260, 280, 286)
+
+
+def _stage(scheduler: PipelineScheduler | None, name: str):
+    """Limits a pipeline stage to the scheduler's worker count for it (no limit without a scheduler)."""
+    return scheduler.stage(name) if scheduler is not None else nullcontext()
+
+
+async def _convert_document(document_id: str, full_document: dict, repo: DocumentRepository, conversion_url: str, scheduler: PipelineScheduler | None) -> str | None:
+    """Streams the original file to Module 2 and stores the conversion result; returns the normalized text."""
+    original_doc_path = full_document.get("originalDocumentPath")
+    original_filename = full_document.get("originalFilename", f"document_{document_id}")
+
+    if not original_doc_path or not original_doc_path.startswith("gridfs:"):
+        raise ValueError("Missing or invalid originalDocumentPath.")
+
+    gridfs_id_str = original_doc_path.split(":")[-1]
+    if not ObjectId.is_valid(gridfs_id_str): raise ValueError("Invalid GridFS ObjectId format.")
+    gridfs_id = ObjectId(gridfs_id_str)
+
+    logger.info(f"[DocID: {document_id}] Downloading original file from GridFS: {gridfs_id}")
+    content_stream_gen, file_meta = await repo.download_gridfs_file(gridfs_id)
+    content_type = file_meta.get("contentType")
+    gridfs_filename = file_meta.get("originalFilename", original_filename)
+    
+    if not content_type or content_type == gridfs_filename.rsplit('.', 1)[-1].lower():
+        guessed_type, _ = mimetypes.guess_type(gridfs_filename)
+        content_type = guessed_type if guessed_type else "application/octet-stream"
+        logger.warning(f"[DocID: {document_id}] ContentType from GridFS was missing or invalid. Guessed as: {content_type} for filename '{gridfs_filename}'")
+
+    # Plik jest przesyłany do Modułu 2 strumieniowo, fragmentami GridFS - bez buforowania całości w pamięci
+    async with aclosing(content_stream_gen):
+        first_chunk = b""
+        async for chunk in content_stream_gen:
+            if chunk:
+                first_chunk = chunk
+                break
+        if not first_chunk: raise ValueError("Original file content is empty.")
 
-async def process_document_pipeline(change_event: dict, repo: DocumentRepository, conversion_url: str, detection_url: str, notification_url: str):
-    """Processes a single insert event from the change stream."""
+        # Wywołanie Module 2 (Konwersja)
+        logger.info(f"[DocID: {document_id}] Calling Conversion Service (Module 2): {conversion_url}")
+        logger.info(f"[DocID: {document_id}] Sending to M2 - Filename: {gridfs_filename}, Content-Type: {content_type}")
+        upload_body = MultipartFileStream("file", gridfs_filename, content_type, prepend_chunk(first_chunk, content_stream_gen))
+
+        async with _stage(scheduler, "conversion"), pipeline_http_client() as client:
+            if settings.CONVERSION_STREAM_URL:
+                # Odpowiedź NDJSON czytana stronami, w miarę jak Moduł 2 je wyodrębnia
+                async with client.stream(
+                    "POST", settings.CONVERSION_STREAM_URL, content=upload_body, headers=upload_body.headers, timeout=settings.CONVERSION_TIMEOUT
+                ) as response_m2:
+                    if response_m2.is_error:
+                        await response_m2.aread()
+                    response_m2.raise_for_status()
+                    normalized_text_content, metadata_dict = await read_conversion_stream(response_m2)
+            else:
+                response_m2 = await client.post(conversion_url, content=upload_body, headers=upload_body.headers, timeout=settings.CONVERSION_TIMEOUT)
+                response_m2.raise_for_status()
+                conversion_result = response_m2.json() 
+                normalized_text_content = conversion_result.get("text")
+                metadata_dict = conversion_result.get("metadata")
+            logger.info(f"[DocID: {document_id}] Conversion Service responded OK ({upload_body.bytes_sent} bytes streamed).")
+
+    # Przetwarzanie odpowiedzi z Module 2 i aktualizacja DB
+
+    if metadata_dict is None:
+        raise ValueError("Invalid response structure from Conversion Service (missing 'metadata').")
+
+    try:
+        parsed_metadata = DocumentMetadata(**metadata_dict)
+    except Exception as pydantic_error:
+         raise ValueError(f"Invalid metadata structure from Conversion Service: {pydantic_error}")
+
+    conversion_update = DocumentUpdate(
+        conversionStatus=ConversionStatus.STATUS_COMPLETED,
+        conversionTimestamp=datetime.datetime.now(datetime.timezone.utc),
+        normalizedText=normalized_text_content,    
+        metadata=parsed_metadata             
+    )
+    logger.info(f"[DocID: {document_id}] Updating database after successful conversion.")
+    await repo.update(document_id, conversion_update)
+    logger.info(f"[DocID: {document_id}] Database updated after conversion.")
+    return normalized_text_content
+
+
+async def process_document_pipeline(change_event: dict, repo: DocumentRepository, conversion_url: str, detection_url: str, notification_url: str, detection_jobs: DetectionJobClient | None = None, scheduler: PipelineScheduler | None = None):
+    """Processes a single insert event from the change stream.
+
+    When detection_jobs is given, detection goes through the Module 4 job API instead of a blocking /detect call.
+    When scheduler is given, the conversion, detection and notification calls respect its per-stage worker limits.
+    """
     doc_id_obj = change_event.get('documentKey', {}).get('_id')
     full_document = change_event.get('fullDocument')
 
@@ -70,10 +172,9 @@ async def process_document_pipeline(change_event: dict, repo: DocumentRepository
     if not detection_url:
         logger.error(f"[DocID: {document_id}] Skipping detection step: DETECTION_SERVICE_URL not set.")
 
-    original_doc_path = None
-    original_filename = f"document_{document_id}"
-    gridfs_id = None
     normalized_text_content: str | None = None
+    # Etap, którego dotyczy ewentualny błąd (status konwersji albo wynik analizy)
+    stage = "conversion"
 
     try:
         if not full_document:
@@ -82,63 +183,22 @@ async def process_document_pipeline(change_event: dict, repo: DocumentRepository
             if not doc_data: raise DocumentNotFoundException(f"Document {document_id} disappeared after insert event.")
             full_document = doc_data.model_dump(by_alias=True)
 
-        original_doc_path = full_document.get("originalDocumentPath")
-        original_filename = full_document.get("originalFilename", original_filename)
-
-        if not original_doc_path or not original_doc_path.startswith("gridfs:"):
-            raise ValueError("Missing or invalid originalDocumentPath.")
-
-        gridfs_id_str = original_doc_path.split(":")[-1]
-        if not ObjectId.is_valid(gridfs_id_str): raise ValueError("Invalid GridFS ObjectId format.")
-        gridfs_id = ObjectId(gridfs_id_str)
-
-        logger.info(f"[DocID: {document_id}] Downloading original file from GridFS: {gridfs_id}")
-        content_stream_gen, file_meta = await repo.download_gridfs_file(gridfs_id)
-        content_type = file_meta.get("contentType")
-        gridfs_filename = file_meta.get("originalFilename", original_filename)
-        
-        if not content_type or content_type == gridfs_filename.rsplit('.', 1)[-1].lower():
-            guessed_type, _ = mimetypes.guess_type(gridfs_filename)
-            content_type = guessed_type if guessed_type else "application/octet-stream"
-            logger.warning(f"[DocID: {document_id}] ContentType from GridFS was missing or invalid. Guessed as: {content_type} for filename '{gridfs_filename}'")
-
-        file_content_bytes = b"".join([chunk async for chunk in content_stream_gen])
-        if not file_content_bytes: raise ValueError("Original file content is empty.")
-        file_like_object = BytesIO(file_content_bytes)
-        logger.info(f"[DocID: {document_id}] Original file downloaded ({len(file_content_bytes)} bytes).")
-
-        # Wywołanie Module 2 (Konwersja)
-        logger.info(f"[DocID: {document_id}] Calling Conversion Service (Module 2): {conversion_url}")
-        logger.info(f"[DocID: {document_id}] Sending to M2 - Filename: {gridfs_filename}, Content-Type: {content_type}")
-        files_payload = {'file': (gridfs_filename, file_like_object, content_type)}
-
-        async with httpx.AsyncClient(timeout=180.0) as client:
-            response_m2 = await client.post(conversion_url, files=files_payload) 
-            response_m2.raise_for_status()
-            conversion_result = response_m2.json() 
-            logger.info(f"[DocID: {document_id}] Conversion Service responded OK.")
-
-        # Przetwarzanie odpowiedzi z Module 2 i aktualizacja DB
-        normalized_text_content = conversion_result.get("text")
-        metadata_dict = conversion_result.get("metadata")
-
-        if metadata_dict is None:
-            raise ValueError("Invalid response structure from Conversion Service (missing 'metadata').")
-
-        try:
-            parsed_metadata = DocumentMetadata(**metadata_dict)
-        except Exception as pydantic_error:
-             raise ValueError(f"Invalid metadata structure from Conversion Service: {pydantic_error}")
-
-        conversion_update = DocumentUpdate(
-            conversionStatus=ConversionStatus.STATUS_COMPLETED,
-            conversionTimestamp=datetime.datetime.now(datetime.timezone.utc),
-            normalizedText=normalized_text_content,    
-            metadata=parsed_metadata             
+        conversion_status = full_document.get("conversionStatus")
+        analysis_status = (full_document.get("analysisResult") or {}).get("status")
+        resume_detection = (
+            conversion_status == ConversionStatus.STATUS_COMPLETED.value and analysis_status in UNFINISHED_ANALYSIS_STATUSES
         )
-        logger.info(f"[DocID: {document_id}] Updating database after successful conversion.")
-        await repo.update(document_id, conversion_update)
-        logger.info(f"[DocID: {document_id}] Database updated after conversion.")
+        if conversion_status and conversion_status != ConversionStatus.STATUS_PENDING.value and not resume_detection:
+            logger.info(f"[DocID: {document_id}] Skipping processing: conversion status is already '{conversion_status}'.")
+            return
+
+        if resume_detection:
+            # Konwersja zakończona, a analiza nie (np. replika przerwała pracę w trakcie detekcji)
+            logger.info(f"[DocID: {document_id}] Conversion already completed, resuming at detection.")
+            normalized_text_content = full_document.get("normalizedText")
+        else:
+            normalized_text_content = await _convert_document(document_id, full_document, repo, conversion_url, scheduler)
+        stage = "detection"
 
         # Wywołanie Module 4 (Detekcja)
         if not detection_url:
@@ -152,13 +212,22 @@ async def process_document_pipeline(change_event: dict, repo: DocumentRepository
             logger.info(f"[DocID: {document_id}] Processing finished (conversion OK, detection skipped).")
             return
 
-        logger.info(f"[DocID: {document_id}] Calling Detection Service (Module 4): {detection_url}")
-        detection_payload = {"text": normalized_text_content}
-        async with httpx.AsyncClient(timeout=180.0) as client:
-            response_m4 = await client.post(detection_url, json=detection_payload)
-            response_m4.raise_for_status()
-            detection_results = response_m4.json()
-            logger.info(f"[DocID: {document_id}] Detection Service responded OK.")
+        if detection_jobs is not None:
+            logger.info(f"[DocID: {document_id}] Submitting detection job (Module 4): {detection_jobs.jobs_url}")
+            # Limit etapu dotyczy tylko zlecenia zadania - oczekiwanie na wynik nie zajmuje miejsca,
+            # więc w toku może być wiele zadań detekcji naraz (wspólna pętla odpytywania klienta)
+            async with _stage(scheduler, "detection"):
+                job_id = await detection_jobs.submit(normalized_text_content)
+            detection_results = await detection_jobs.wait(job_id)
+            logger.info(f"[DocID: {document_id}] Detection job completed.")
+        else:
+            logger.info(f"[DocID: {document_id}] Calling Detection Service (Module 4): {detection_url}")
+            detection_payload = {"text": normalized_text_content}
+            async with _stage(scheduler, "detection"), pipeline_http_client() as client:
+                response_m4 = await client.post(detection_url, json=detection_payload, timeout=settings.DETECTION_TIMEOUT)
+                response_m4.raise_for_status()
+                detection_results = response_m4.json()
+                logger.info(f"[DocID: {document_id}] Detection Service responded OK.")
 
         # Przetwarzanie odpowiedzi z Module 4 i aktualizacja DB
         if not isinstance(detection_results, list):
@@ -201,8 +270,8 @@ async def process_document_pipeline(change_event: dict, repo: DocumentRepository
                     )
                 }
                 try:
-                    async with httpx.AsyncClient(timeout=30.0) as client:
-                        response_m5 = await client.post(notification_url, json=notification_payload)
+                    async with _stage(scheduler, "notification"), pipeline_http_client() as client:
+                        response_m5 = await client.post(notification_url, json=notification_payload, timeout=settings.NOTIFICATION_TIMEOUT)
                         response_m5.raise_for_status()
                         logger.info(f"[DocID: {document_id}] Notification Service (Module 5) responded OK. Response: {response_m5.json()}")
                 except httpx.RequestError as exc_notify:
@@ -219,7 +288,7 @@ async def process_document_pipeline(change_event: dict, repo: DocumentRepository
         logger.error(f"[DocID: {document_id}] Processing failed: GridFS file error. {e}")
         await repo.update(document_id, DocumentUpdate(conversionStatus=ConversionStatus.STATUS_FAILED, conversionError=f"GridFS Error: {e}"))
     except httpx.RequestError as exc:
-        target_service = "Conversion(M2)" if detection_url and 'response_m2' not in locals() else "Detection(M4)"
+        target_service = "Conversion(M2)" if stage == "conversion" else "Detection(M4)"
         logger.error(f"[DocID: {document_id}] Processing failed: HTTP request error connecting to {target_service}. {exc}")
         status_update = DocumentUpdate(
             conversionStatus=ConversionStatus.STATUS_FAILED, conversionError=f"Network error calling {target_service}: {exc}"
@@ -228,7 +297,7 @@ async def process_document_pipeline(change_event: dict, repo: DocumentRepository
         )
         await repo.update(document_id, status_update)
     except httpx.HTTPStatusError as exc:
-        target_service = "Conversion(M2)" if exc.request.url == conversion_url else "Detection(M4)"
+        target_service = "Conversion(M2)" if stage == "conversion" else "Detection(M4)"
         logger.error(f"[DocID: {document_id}] Processing failed: HTTP status error from {target_service}. Status: {exc.response.status_code}. Response: {exc.response.text[:200]}")
         error_msg = f"Error from {target_service} ({exc.response.status_code}): {exc.response.text[:150]}"
         status_update = DocumentUpdate(
@@ -239,10 +308,9 @@ async def process_document_pipeline(change_event: dict, repo: DocumentRepository
         await repo.update(document_id, status_update)
     except (ValueError, ValidationException, TypeError) as e:
         logger.error(f"[DocID: {document_id}] Processing failed: Data error or invalid response. {e}")
-        failed_step = "conversion" if 'parsed_metadata' not in locals() else "detection"
         status_update = DocumentUpdate(
             conversionStatus=ConversionStatus.STATUS_FAILED, conversionError=f"Data/Response Error: {e}"
-        ) if failed_step == "conversion" else DocumentUpdate(
+        ) if stage == "conversion" else DocumentUpdate(
             analysisResult=AnalysisResult(status=AnalysisStatus.FAILED, error=f"Data/Response Error: {e}")
         )
         await repo.update(document_id, status_update)
@@ -251,52 +319,171 @@ async def process_document_pipeline(change_event: dict, repo: DocumentRepository
     except Exception as e:
         logger.exception(f"[DocID: {document_id}] Processing failed: Unexpected error.")
         try:
-            failed_step = "conversion" if 'conversion_update' not in locals() else "detection"
             status_update = DocumentUpdate(
                 conversionStatus=ConversionStatus.STATUS_FAILED, conversionError=f"Unexpected error: {e}"
-            ) if failed_step == "conversion" else DocumentUpdate(
+            ) if stage == "conversion" else DocumentUpdate(
                 analysisResult=AnalysisResult(status=AnalysisStatus.FAILED, error=f"Unexpected error: {e}")
             )
             await repo.update(document_id, status_update)
         except Exception as final_error:
              logger.error(f"[DocID: {document_id}] Could not even update status after unexpected error: {final_error}")
 
-async def watch_new_documents(db, fs, conversion_url: str, detection_url: str, notification_url: str):
-    """Nasłuchuje na kolekcji 'documents' i uruchamia pipeline przetwarzania."""
+async def _backfill_pending_documents(repo: DocumentRepository, dispatch) -> int:
+    """Dispatches unfinished documents (e.g. inserted while the listener was down or interrupted during detection)."""
+    count = 0
+    async for doc in repo.find_pending():
+        await dispatch({"operationType": "insert", "documentKey": {"_id": doc["_id"]}, "fullDocument": doc})
+        count += 1
+    return count
+
+
+async def _reclaim_expired_leases(repo: DocumentRepository, dispatch, interval: float):
+    """Periodically dispatches unfinished documents whose lease expired (e.g. their replica crashed)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            count = 0
+            async for doc in repo.find_expired_leases():
+                await dispatch({"operationType": "insert", "documentKey": {"_id": doc["_id"]}, "fullDocument": doc})
+                count += 1
+            if count:
+                logger.info(f"Reclaimed {count} documents with expired leases.")
+        except Exception as e:
+            logger.error(f"Reclaiming expired leases failed: {e}")
+
+
+async def watch_new_documents(db, fs, conversion_url: str, detection_url: str, notification_url: str, detection_jobs: DetectionJobClient | None = None, scheduler: PipelineScheduler | None = None, leases: LeaseManager | None = None):
+    """Nasłuchuje na kolekcji 'documents' i uruchamia pipeline przetwarzania.
+
+    When leases is given, a document is processed only after this replica claims it, so several replicas split the work.
+    """
     repo = DocumentRepository(db, fs)
+    stream_state = ChangeStreamStateRepository(db)
     collection = db.documents
     pipeline = [{'$match': {'operationType': 'insert'}}]
+    # Dokumenty zlecone do przetworzenia - backfill i wznowiony strumień mogą zgłosić ten sam dokument
+    scheduled_ids: set[str] = set()
+
+    async def dispatch(change: dict, settle: Callable[[], None] = lambda: None):
+        """Schedules the processing of the event; settle() is called once its job is accepted or finished."""
+        doc_id = change.get('documentKey', {}).get('_id')
+        key = str(doc_id) if doc_id is not None else None
+        if key is not None:
+            if key in scheduled_ids:
+                logger.info(f"[DocID: {key}] Already scheduled for processing, skipping duplicate event.")
+                settle()
+                return
+            scheduled_ids.add(key)
+
+        async def process_claimed(document: dict):
+            # Dokument zajęty dzierżawą - po awarii repliki przejmie go odzyskiwanie wygasłych dzierżaw
+            settle()
+            await process_document_pipeline(
+                {**change, "fullDocument": document},
+                repo, conversion_url, detection_url, notification_url, detection_jobs, scheduler
+            )
+
+        async def job():
+            try:
+                if leases is None or key is None:
+                    await process_document_pipeline(
+                        change, repo, conversion_url, detection_url, notification_url, detection_jobs, scheduler
+                    )
+                    return
+                try:
+                    claimed = await leases.run(key, process_claimed)
+                except LeaseLost as e:
+                    logger.warning(f"[DocID: {key}] Processing stopped: {e}")
+                    return
+                if not claimed:
+                    logger.info(f"[DocID: {key}] Not claimed (already processed or leased by another replica), skipping.")
+            finally:
+                scheduled_ids.discard(key)
+                settle()
+
+        if scheduler is not None:
+            # Kolejka harmonogramu jest ograniczona - gdy jest pełna, wstrzymujemy odczyt strumienia
+            await scheduler.submit(job)
+        else:
+            # Uruchomiono przetwarzanie jako osobne zadanie asyncio
+            # aby nie blokować odbioru kolejnych zdarzeń
+            asyncio.create_task(job())
 
     logger.info("Starting change stream listener for new documents...")
+    reclaimer = None
+    if leases is not None:
+        logger.info(f"Document leases enabled (owner: {leases.owner}).")
+        reclaimer = asyncio.create_task(_reclaim_expired_leases(repo, dispatch, settings.LEASE_RECLAIM_INTERVAL))
+    # Token zapisywany po przyjęciu lub zakończeniu zadania zdarzenia, a nie po umieszczeniu go w kolejce
+    resume_tokens = ResumeTokenTracker(stream_state, DOCUMENTS_CHANGE_STREAM)
+    token_saver = asyncio.create_task(resume_tokens.run())
+    backfill_needed = True
     while True:
         try:
-            async with collection.watch(pipeline, full_document='updateLookup') as stream:
+            watch_options = {"full_document": "updateLookup"}
+            resume_token = await stream_state.get_resume_token(DOCUMENTS_CHANGE_STREAM)
+            if resume_token:
+                logger.info("Resuming change stream after the last handled event.")
+                watch_options["resume_after"] = resume_token
+            async with collection.watch(pipeline, **watch_options) as stream:
+                # Backfill po otwarciu strumienia, aby nie zgubić wstawień między zapytaniem a startem nasłuchu
+                if backfill_needed:
+                    backfilled = await _backfill_pending_documents(repo, dispatch)
+                    logger.info(f"Backfill dispatched {backfilled} pending documents.")
+                    backfill_needed = False
                 async for change in stream:
-                    # Uruchomiono przetwarzanie jako osobne zadanie asyncio
-                    # aby nie blokować odbioru kolejnych zdarzeń
-                    asyncio.create_task(process_document_pipeline(
-                        change, repo, conversion_url, detection_url, notification_url
-                    ))
+                    if change.get("_id") is not None:
+                        await dispatch(change, resume_tokens.track(change["_id"]))
+                    else:
+                        await dispatch(change)
         except asyncio.CancelledError:
             logger.info("Change stream listener task cancelled.")
             break 
+        except OperationFailure as e:
+            if e.code in RESUME_TOKEN_ERROR_CODES:
+                # Token wypadł z oplogu lub jest nieprawidłowy - start od teraz i ponowny backfill
+                logger.error(f"Change stream cannot be resumed ({e}). Starting from now with a backfill of pending documents.")
+                resume_tokens.reset()
+                await stream_state.clear_resume_token(DOCUMENTS_CHANGE_STREAM)
+                backfill_needed = True
+                continue
+            logger.exception(f"Change stream listener error: {e}. Restarting listener in 5 seconds...")
+            await asyncio.sleep(5)
         except Exception as e:
             logger.exception(f"Change stream listener error: {e}. Restarting listener in 5 seconds...")
             await asyncio.sleep(5)
 
+    for task in (reclaimer, token_saver):
+        if task is None:
+            continue
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    try:
+        await resume_tokens.flush()
+    except Exception as e:
+        logger.warning(f"Could not save the final resume token: {e}")
     logger.info("Change stream listener stopped definitively.")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Zarządzanie cyklem życia aplikacji FastAPI."""
-    global change_stream_listener_task
+    global change_stream_listener_task, detection_job_client, pipeline_scheduler
     logger.info("Application startup...")
     listener_started = False
     try:
         await connect_to_mongo()
+        await start_http_client()
         if db_context.db is not None and db_context.fs is not None:
             logger.info("MongoDB connected.")
+            try:
+                await DocumentRepository(db_context.db, db_context.fs).create_indexes()
+                await BlobRepository(db_context.db).create_indexes()
+            except DatabaseException as e:
+                logger.error(f"Could not create document indexes: {e}")
 
             # Sprawdzenie opcjonalnego adresu URL powiadomień (Moduł 5)
             if not settings.NOTIFICATION_SERVICE_URL:
@@ -305,13 +492,40 @@ async def lifespan(app: FastAPI):
             # Sprawdzenie krytycznych adresów URL do Konwersji (Moduł 3) i Detekcji (Moduł 4)
             if settings.CONVERSION_SERVICE_URL and settings.DETECTION_SERVICE_URL:
                 logger.info("Starting change stream listener with core services (Conversion, Detection) configured.")
+                if settings.DETECTION_JOBS_URL:
+                    logger.info(f"Detection will use the job API: {settings.DETECTION_JOBS_URL}")
+                    detection_job_client = DetectionJobClient(
+                        settings.DETECTION_JOBS_URL,
+                        poll_wait=settings.DETECTION_JOB_POLL_WAIT,
+                        client=http_context.client,
+                        job_timeout=settings.DETECTION_TIMEOUT,
+                    )
+                pipeline_scheduler = PipelineScheduler(
+                    workers=settings.PIPELINE_WORKERS,
+                    max_queue_size=settings.PIPELINE_QUEUE_SIZE,
+                    stage_workers={
+                        "conversion": settings.PIPELINE_CONVERSION_WORKERS,
+                        "detection": settings.PIPELINE_DETECTION_WORKERS,
+                        "notification": settings.PIPELINE_NOTIFICATION_WORKERS,
+                    },
+                )
+                pipeline_scheduler.start()
+                lease_manager = LeaseManager(
+                    DocumentRepository(db_context.db, db_context.fs),
+                    owner=settings.PIPELINE_OWNER_ID,
+                    lease_seconds=settings.LEASE_SECONDS,
+                    heartbeat_interval=settings.LEASE_HEARTBEAT_INTERVAL,
+                )
                 change_stream_listener_task = asyncio.create_task(
                     watch_new_documents(
                         db_context.db,
                         db_context.fs,
                         settings.CONVERSION_SERVICE_URL,
                         settings.DETECTION_SERVICE_URL,
-                        settings.NOTIFICATION_SERVICE_URL
+                        settings.NOTIFICATION_SERVICE_URL,
+                        detection_job_client,
+                        pipeline_scheduler,
+                        lease_manager
                     )
                 )
                 listener_started = True
@@ -342,6 +556,15 @@ async def lifespan(app: FastAPI):
             except Exception as e:
                 logger.error(f"Error during change stream listener task shutdown: {e}", exc_info=True)
 
+        if pipeline_scheduler is not None:
+            await pipeline_scheduler.stop()
+            pipeline_scheduler = None
+
+        if detection_job_client is not None:
+            await detection_job_client.aclose()
+            detection_job_client = None
+
+        await close_http_client()
         await close_mongo_connection()
         logger.info("Application shutdown sequence complete.")
 
@@ -383,3 +606,16 @@ app.include_router(documents.router, prefix=settings.API_V1_STR, tags=["Document
 async def read_root():
     """Returns a simple welcome message indicating the service is running."""
     return {"message": f"Welcome to the {settings.PROJECT_NAME} API"}
+
+
+@app.get(
+    "/pipeline/stats",
+    tags=["Root"],
+    summary="Processing Pipeline Statistics",
+    description="Returns the queue depth and in-flight counts of the document processing pipeline.",
+)
+async def read_pipeline_stats():
+    """Returns the scheduler statistics, or running=False when the pipeline is not started."""
+    if pipeline_scheduler is None:
+        return {"running": False}
+    return pipeline_scheduler.stats()
@@ -191,13 +191,98 @@ class DocumentInDB(DocumentBase):
     )
 
 
+class AnalysisSummary(BaseModel):
+    """Analysis result without the detected items, unless they were requested in the listing."""
+    status: AnalysisStatus = Field(default=AnalysisStatus.PENDING)
+    timestamp: Optional[datetime.datetime] = None
+    error: Optional[str] = None
+    detected_items: Optional[List[Dict[str, Any]]] = Field(
+        None,
+        alias="detectedItems",
+        description="Detected sensitive data items (only with fields=analysisResult.detectedItems)."
+    )
+    analysis_time: Optional[float] = Field(None, alias="analysisTime", description="Analysis duration in seconds.")
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        use_enum_values=True,
+        from_attributes=True,
+        extra='ignore'
+    )
+
+
+# Lekka reprezentacja dokumentu na liście: bez treści znormalizowanej i listy wykrytych elementów,
+# które mogą zajmować megabajty. Pola te można dołączyć parametrem fields= (LIST_OPTIONAL_FIELDS).
+class DocumentSummary(DocumentBase):
+    """Document metadata returned by the list endpoint."""
+
+    id: PyObjectId = Field(..., alias="_id", description="Unique identifier for the document (MongoDB ObjectId).")
+    upload_timestamp: datetime.datetime = Field(..., alias="uploadTimestamp", description="Timestamp when the document entry was created.")
+    content_hash: Optional[str] = Field(None, alias="contentHash", description="SHA-256 hash of the original file content.")
+    conversion_timestamp: Optional[datetime.datetime] = Field(None, alias="conversionTimestamp", description="Timestamp when conversion finished.")
+    conversion_status: ConversionStatus = Field(
+        default=ConversionStatus.STATUS_PENDING, alias="conversionStatus", description="Status of the document conversion."
+    )
+    conversion_error: Optional[str] = Field(None, alias="conversionError", description="Error message if conversion failed.")
+    metadata: Optional[DocumentMetadata] = Field(None, description="Metadata extracted during conversion.")
+    original_document_path: Optional[str] = Field(
+        None, alias="originalDocumentPath", description="Reference to the original file in GridFS (e.g., 'gridfs:ObjectId')."
+    )
+    processing_time_seconds: Optional[float] = Field(
+        None, alias="processingTimeSeconds", description="Processing time for conversion in seconds."
+    )
+    analysis_result: Optional[AnalysisSummary] = Field(
+        None, alias="analysisResult", description="Status of the sensitive data analysis."
+    )
+    detected_items_count: Optional[int] = Field(
+        None, alias="detectedItemsCount", description="Number of detected sensitive data items."
+    )
+    normalized_text: Optional[str] = Field(
+        None, alias="normalizedText", description="Normalized text content (only with fields=normalizedText)."
+    )
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        from_attributes=True,
+        use_enum_values=True
+    )
+
+
+# Sposób liczenia dokumentów pasujących do filtrów listy: dokładnie (count_documents), szacunkowo
+# (stały koszt niezależny od rozmiaru kolekcji) albo wcale - przy przewijaniu kursorem.
+class ListCountMode(str, Enum):
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+    NONE = "none"
+
+
 class DocumentList(BaseModel):
     """Model for the list documents endpoint response, including pagination info."""
 
-    total: int = Field(..., description="Total number of documents matching the query.")
+    total: Optional[int] = Field(None, description="Total number of documents matching the query (None when not counted).")
+    total_estimated: bool = Field(False, description="True when total is an estimate or a lower bound rather than an exact count.")
+    page: Optional[int] = Field(None, description="Current page number (None when paging with a cursor).")
+    limit: int = Field(..., description="Number of documents per page.")
+    documents: List[DocumentSummary] = Field(..., description="List of document metadata on the current page.")
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor of the next page, or None on the last page.")
+
+
+class DocumentSearchHit(DocumentSummary):
+    """Document summary matched by the full-text search, with its relevance score."""
+
+    score: float = Field(..., description="Text search relevance score (higher is more relevant).")
+
+
+class DocumentSearchResult(BaseModel):
+    """Model for the document search endpoint response, ordered by relevance."""
+
+    total: Optional[int] = Field(None, description="Total number of matching documents (None when not counted).")
+    total_estimated: bool = Field(False, description="True when total is an estimate or a lower bound rather than an exact count.")
     page: int = Field(..., description="Current page number.")
     limit: int = Field(..., description="Number of documents per page.")
-    documents: List[DocumentInDB] = Field(..., description="List of document metadata on the current page.")
+    documents: List[DocumentSearchHit] = Field(..., description="Matching documents on the current page, most relevant first.")
+    next_page: Optional[int] = Field(None, description="Number of the next page, or None on the last page.")
 
 
 class UploadResultItem(BaseModel):
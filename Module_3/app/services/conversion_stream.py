@@ -0,0 +1,38 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+# Odczyt strumienia NDJSON z POST /file/stream Modułu 2. Strony tekstu są odbierane i zbierane
+# w miarę ich nadejścia, bez buforowania całej odpowiedzi i bez kopii tekstu w postaci ciągu JSON.
+
+
+async def read_conversion_stream(response: httpx.Response) -> Tuple[str, Dict[str, Any]]:
+    """
+    Reads the NDJSON conversion stream line by line. Returns the normalized text (non-empty pages
+    joined with a space, the same rule as the text of POST /file) and the metadata of the final 'done' record; raises ValueError when the stream
+    reports an error or ends without the 'done' record.
+    """
+    pages: List[str] = []
+    metadata = None
+
+    async for line in response.aiter_lines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid line in conversion stream: {e}")
+
+        record_type = record.get("type")
+        if record_type == "page":
+            if record.get("text"):
+                pages.append(record["text"])
+        elif record_type == "done":
+            metadata = record.get("metadata")
+        elif record_type == "error":
+            raise ValueError(f"Conversion Service failed ({record.get('status')}): {record.get('detail')}")
+
+    if metadata is None:
+        raise ValueError("Conversion stream ended without the 'done' record.")
+    return " ".join(pages), metadata
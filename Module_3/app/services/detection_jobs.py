@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Klient asynchronicznego API zadań detekcji (Moduł 4). Zamiast trzymać otwarte połączenie
+# na każdy dokument, zadania są zgłaszane przez POST /jobs, a statusy wszystkich oczekujących
+# zadań odbiera jedna wspólna pętla long-poll (GET /jobs?ids=...&wait=...).
+
+
+class DetectionJobError(ValueError):
+    """Raised when a detection job finishes with an error."""
+
+
+class DetectionJobClient:
+    def __init__(
+        self,
+        jobs_url: str,
+        poll_wait: float = 20.0,
+        max_ids_per_poll: int = 200,
+        max_poll_failures: int = 5,
+        client: Optional[httpx.AsyncClient] = None,
+        job_timeout: Optional[float] = None,
+    ):
+        """Initializes the client for the given Module 4 jobs URL (e.g. http://detector-api:8000/jobs).
+
+        When client is given (the pipeline's shared HTTP client) it is used and left open on aclose().
+        A job not finished within job_timeout seconds of the first wait() fails with DetectionJobError.
+        """
+        self.jobs_url = jobs_url.rstrip("/")
+        self.poll_wait = poll_wait
+        self.max_ids_per_poll = max_ids_per_poll
+        self.max_poll_failures = max_poll_failures
+        self._client: Optional[httpx.AsyncClient] = client
+        self._owns_client = client is None
+        self.job_timeout = job_timeout
+        self._waiters: Dict[str, asyncio.Future] = {}
+        # Termin (czas pętli zdarzeń) dla każdego zadania - nieznane lub wygasłe zadania Moduł 4
+        # raportuje jako "pending", więc bez terminu zgubione zadanie czekałoby w nieskończoność
+        self._deadlines: Dict[str, float] = {}
+        self._poller: Optional[asyncio.Task] = None
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs currently awaited."""
+        return len(self._waiters)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=30.0)
+        return self._client
+
+    async def detect(self, text: str) -> List[Dict[str, Any]]:
+        """Submits text for detection and waits for the job result."""
+        job_id = await self.submit(text)
+        return await self.wait(job_id)
+
+    async def submit(self, text: str) -> str:
+        """Creates a detection job and returns its id."""
+        response = await self._get_client().post(self.jobs_url, json={"text": text})
+        response.raise_for_status()
+        job_id = response.json().get("job_id")
+        if not job_id:
+            raise DetectionJobError("Invalid response from Detection Service (missing 'job_id').")
+        return job_id
+
+    async def wait(self, job_id: str) -> List[Dict[str, Any]]:
+        """Waits until the job finishes; returns the detected items or raises DetectionJobError."""
+        future = self._waiters.get(job_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._waiters[job_id] = future
+            if self.job_timeout is not None:
+                self._deadlines[job_id] = loop.time() + self.job_timeout
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_loop())
+        return await asyncio.shield(future)
+
+    async def _poll_loop(self) -> None:
+        """Polls Module 4 for all awaited jobs until none is left."""
+        failures = 0
+        batch_start = 0
+        while self._waiters:
+            # Przy większej liczbie zadań niż max_ids_per_poll kolejne zapytania obejmują kolejne paczki
+            all_ids = list(self._waiters)
+            batch_start %= len(all_ids)
+            job_ids = (all_ids[batch_start:] + all_ids[:batch_start])[: self.max_ids_per_poll]
+            batch_start += len(job_ids)
+            try:
+                # Timeout odczytu musi obejmować czas long-poll po stronie Modułu 4
+                response = await self._get_client().get(
+                    self.jobs_url,
+                    params={"ids": job_ids, "wait": self.poll_wait},
+                    timeout=httpx.Timeout(30.0, read=self.poll_wait + 30.0),
+                )
+                response.raise_for_status()
+                jobs = response.json().get("jobs", [])
+                failures = 0
+            except Exception as e:
+                failures += 1
+                logger.warning(f"Polling detection jobs failed ({failures}/{self.max_poll_failures}): {e}")
+                if failures >= self.max_poll_failures:
+                    self._fail_all(e)
+                    return
+                await asyncio.sleep(min(2 ** failures, 30))
+                self._expire_overdue()
+                continue
+
+            for job in jobs:
+                self._resolve(job)
+            self._expire_overdue()
+
+    def _expire_overdue(self) -> None:
+        """Fails and forgets the jobs whose deadline has passed."""
+        if not self._deadlines:
+            return
+        now = asyncio.get_running_loop().time()
+        for job_id in [job_id for job_id, deadline in self._deadlines.items() if deadline <= now]:
+            self._deadlines.pop(job_id, None)
+            future = self._waiters.pop(job_id, None)
+            if future is not None and not future.done():
+                logger.warning(f"Detection job {job_id} did not finish within {self.job_timeout}s.")
+                future.set_exception(DetectionJobError(f"Detection job {job_id} timed out after {self.job_timeout}s."))
+
+    def _resolve(self, job: Dict[str, Any]) -> None:
+        status = job.get("status")
+        if status not in ("completed", "failed"):
+            return
+        self._deadlines.pop(job.get("job_id"), None)
+        future = self._waiters.pop(job.get("job_id"), None)
+        if future is None or future.done():
+            return
+        if status == "completed":
+            result = job.get("result")
+            if isinstance(result, list):
+                future.set_result(result)
+            else:
+                future.set_exception(DetectionJobError("Invalid response structure from Detection Service (expected a list)."))
+        else:
+            future.set_exception(DetectionJobError(f"Detection job failed: {job.get('error')}"))
+
+    def _fail_all(self, error: Exception) -> None:
+        waiters, self._waiters = self._waiters, {}
+        self._deadlines = {}
+        for future in waiters.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def aclose(self) -> None:
+        """Stops polling and closes the HTTP client."""
+        if self._poller is not None and not self._poller.done():
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+        self._fail_all(DetectionJobError("Detection job client closed."))
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+            self._client = None
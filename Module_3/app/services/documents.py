@@ -1,15 +1,18 @@
-from typing import Optional, Tuple, AsyncIterator, Dict, Any
+from typing import Optional, Tuple, AsyncIterator, Dict, Any, Sequence
 from datetime import datetime
 from pydantic import EmailStr
 from bson import ObjectId
 
 from app.db.repositories.documents import DocumentRepository
+from app.core.config import settings
 
 from app.models.documents import (
     DocumentCreate,
     DocumentUpdate,
     DocumentInDB,
     DocumentList,
+    DocumentSearchResult,
+    ListCountMode,
 )
 from app.core.exceptions import DatabaseException, DocumentNotFoundException, ValidationException, FileNotFoundInGridFSException
 
@@ -20,20 +23,16 @@ class DocumentService:
         """Initializes the service from the document repository."""
         self.document_repository: DocumentRepository = document_repository
 
-    async def create_document(
+    async def create_document_from_stream(
         self,
         file_name: str,
         file_format: str,
-        file_content: bytes,
+        chunks: AsyncIterator[bytes],
         uploader_email: EmailStr,
     ) -> str:
-        """Creates a new document. Performs basic validation and uploads data to the repository."""
-        file_size = len(file_content)
-
+        """Creates a new document from a stream of file chunks (the file is not buffered in memory)."""
         if not file_name:
             raise ValidationException("File name is required.")
-        if file_size <= 0:
-            raise ValidationException("File content cannot be empty.")
 
         doc_create = DocumentCreate(
             originalFilename=file_name,
@@ -41,12 +40,10 @@ class DocumentService:
             uploaderEmail=uploader_email,
         )
 
-        document_id = await self.document_repository.create(
-            doc_create, file_content, file_name
+        return await self.document_repository.create_from_stream(
+            doc_create, chunks, file_name, deduplicate=settings.UPLOAD_DEDUPLICATION
         )
 
-        return document_id
-
     async def get_document(self, document_id: str) -> DocumentInDB:
         """Get a single document based on its ID."""
         document = await self.document_repository.get_by_id(document_id)
@@ -64,8 +61,14 @@ class DocumentService:
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
         query: Optional[str] = None,
+        cursor: Optional[str] = None,
+        count: ListCountMode = ListCountMode.EXACT,
+        fields: Sequence[str] = (),
     ) -> DocumentList:
-        """Gets a list of document metadata, including filters and pagination."""
+        """
+        Gets a list of document metadata, including filters and pagination.
+        Pass next_cursor of the previous result as cursor to page through the list at constant cost.
+        """
         if page < 1:
             page = 1
         if limit < 1:
@@ -83,10 +86,45 @@ class DocumentService:
             date_from=date_from,
             date_to=date_to,
             query=query,
+            cursor=cursor,
+            count=count,
+            fields=fields,
         )
         
         return DocumentList(**result_dict)
 
+    async def search_documents(
+        self,
+        text: str,
+        page: int = 1,
+        limit: int = 20,
+        conversion_status: Optional[str] = None,
+        original_format: Optional[str] = None,
+        count: ListCountMode = ListCountMode.ESTIMATE,
+        fields: Sequence[str] = (),
+    ) -> DocumentSearchResult:
+        """Searches document content, detected items and filenames, most relevant first."""
+        text = text.strip()
+        if not text:
+            raise ValidationException("Search text cannot be empty.")
+        if page < 1:
+            page = 1
+        if limit < 1:
+            limit = 1
+        if limit > 100:
+            limit = 100
+
+        result_dict = await self.document_repository.search(
+            text,
+            page=page,
+            limit=limit,
+            conversion_status=conversion_status,
+            original_format=original_format.lower() if original_format else None,
+            count=count,
+            fields=fields,
+        )
+        return DocumentSearchResult(**result_dict)
+
     async def update_document(
         self, document_id: str, document_update: DocumentUpdate
     ) -> DocumentInDB:
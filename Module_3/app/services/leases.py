@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from app.db.repositories.documents import DocumentRepository
+
+logger = logging.getLogger(__name__)
+
+# Dzierżawy (lease) dokumentów pozwalają uruchomić kilka replik usługi: każda replika odbiera te same
+# zdarzenia strumienia zmian, ale dokument przetwarza tylko ta, która atomowo go zajmie. Dzierżawa jest
+# przedłużana w trakcie przetwarzania (heartbeat), a po awarii właściciela wygasa i może zostać przejęta.
+# Czas wygaśnięcia liczony jest zegarem repliki, więc zegary replik powinny być zsynchronizowane.
+
+
+class LeaseLost(Exception):
+    """Raised when the lease of a document was taken over while it was being processed."""
+
+
+def default_owner_id() -> str:
+    """Returns an owner id unique to this process (host, pid and a random suffix)."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class LeaseManager:
+    def __init__(
+        self,
+        repo: DocumentRepository,
+        owner: Optional[str] = None,
+        lease_seconds: float = 120.0,
+        heartbeat_interval: float = 30.0,
+    ):
+        """Initializes lease handling for the given owner (a process-unique id by default)."""
+        if heartbeat_interval >= lease_seconds:
+            raise ValueError("Heartbeat interval must be shorter than the lease duration.")
+        self.repo = repo
+        self.owner = owner or default_owner_id()
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+
+    @asynccontextmanager
+    async def hold(
+        self, document_id: str, on_lost: Optional[Callable[[], None]] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Claims the document and keeps its lease alive for the duration of the block.
+        Yields the claimed document, or None when the document is not pending or another owner holds it.
+        on_lost is called when a heartbeat finds that the lease was lost.
+        """
+        document = await self.repo.claim(document_id, self.owner, self.lease_seconds)
+        if document is None:
+            yield None
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(document_id, on_lost))
+        try:
+            yield document
+        finally:
+            heartbeat.cancel()
+            try:
+                await heartbeat
+            except asyncio.CancelledError:
+                pass
+            try:
+                await self.repo.release_lease(document_id, self.owner)
+            except Exception as e:
+                # Dzierżawa i tak wygaśnie po lease_seconds
+                logger.warning(f"[DocID: {document_id}] Could not release lease: {e}")
+
+    async def run(self, document_id: str, process: Callable[[Dict[str, Any]], Awaitable[Any]]) -> bool:
+        """
+        Claims the document and runs process(document) while holding its lease.
+        Returns False when the document was not claimed. When the lease is lost during processing,
+        process is cancelled (so it cannot race the new owner's writes) and LeaseLost is raised.
+        """
+        processing: Optional[asyncio.Task] = None
+        lost = False
+
+        def cancel_processing() -> None:
+            nonlocal lost
+            lost = True
+            if processing is not None:
+                processing.cancel()
+
+        async with self.hold(document_id, on_lost=cancel_processing) as document:
+            if document is None:
+                return False
+            processing = asyncio.create_task(process(document))
+            try:
+                await processing
+            except asyncio.CancelledError:
+                # Anulowanie przez utratę dzierżawy (a nie anulowanie bieżącego zadania z zewnątrz)
+                if lost and not asyncio.current_task().cancelling():
+                    raise LeaseLost(f"Lease of document {document_id} was lost by {self.owner}.") from None
+                raise
+        return True
+
+    async def _heartbeat(self, document_id: str, on_lost: Optional[Callable[[], None]] = None) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                renewed = await self.repo.renew_lease(document_id, self.owner, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"[DocID: {document_id}] Lease heartbeat failed: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"[DocID: {document_id}] Lease lost by {self.owner}; another replica may process the document.")
+                if on_lost is not None:
+                    on_lost()
+                return
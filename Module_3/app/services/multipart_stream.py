@@ -0,0 +1,70 @@
+import re
+import uuid
+from typing import AsyncIterator, Optional
+
+# Strumieniowe ciało żądania multipart/form-data z jednym polem pliku. Treść pliku jest
+# przekazywana fragment po fragmencie (np. prosto z GridFS), więc dokument nie jest
+# buforowany w całości w pamięci przed wysłaniem do Modułu 2.
+
+
+# Kodowanie nazw pól i plików jak w httpx (_HTML5_FORM_ENCODING_REPLACEMENTS): cudzysłów i ukośnik
+# wsteczny są escapowane, a znaki sterujące (poza ESC) kodowane procentowo - nazwa pliku pochodzi
+# od użytkownika, więc CR/LF nie może trafić do nagłówka Content-Disposition
+_FORM_PARAM_REPLACEMENTS = {'"': "%22", "\\": "\\\\"}
+_FORM_PARAM_REPLACEMENTS.update({chr(c): "%{:02X}".format(c) for c in range(0x1F + 1) if c != 0x1B})
+_FORM_PARAM_RE = re.compile("|".join(re.escape(c) for c in _FORM_PARAM_REPLACEMENTS))
+
+
+def _quote_param(value: str) -> str:
+    return _FORM_PARAM_RE.sub(lambda match: _FORM_PARAM_REPLACEMENTS[match.group(0)], value)
+
+
+class MultipartFileStream:
+    """Async iterable multipart/form-data body for httpx (content=...), with a single file field."""
+
+    def __init__(
+        self,
+        field_name: str,
+        filename: str,
+        content_type: str,
+        chunks: AsyncIterator[bytes],
+        boundary: Optional[str] = None,
+    ):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.field_name = field_name
+        self.filename = filename
+        self.file_content_type = content_type
+        self.chunks = chunks
+        self.bytes_sent = 0
+
+    @property
+    def content_type(self) -> str:
+        """Value of the Content-Type header of the request."""
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    @property
+    def headers(self) -> dict:
+        return {"Content-Type": self.content_type}
+
+    def _part_header(self) -> bytes:
+        return (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_quote_param(self.field_name)}"; '
+            f'filename="{_quote_param(self.filename)}"\r\n'
+            f"Content-Type: {self.file_content_type}\r\n\r\n"
+        ).encode("utf-8")
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self._part_header()
+        async for chunk in self.chunks:
+            if chunk:
+                self.bytes_sent += len(chunk)
+                yield chunk
+        yield f"\r\n--{self.boundary}--\r\n".encode("ascii")
+
+
+async def prepend_chunk(first: bytes, rest: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Yields first and then the remaining chunks (used after peeking at a stream)."""
+    yield first
+    async for chunk in rest:
+        yield chunk
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Harmonogram przetwarzania zdarzeń ze strumienia zmian. Zdarzenia trafiają do ograniczonej kolejki,
+# z której korzysta stała liczba workerów, a każdy etap potoku (konwersja, detekcja, powiadomienie)
+# ma własny limit równoczesnych wywołań. Pełna kolejka wstrzymuje odczyt strumienia zmian (backpressure).
+
+
+class PipelineStage:
+    """Limits the number of concurrent calls of one pipeline stage and counts them."""
+
+    def __init__(self, name: str, workers: int):
+        if workers < 1:
+            raise ValueError(f"Stage '{name}' needs at least one worker.")
+        self.name = name
+        self.workers = workers
+        self._semaphore = asyncio.Semaphore(workers)
+        self.in_flight = 0
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Waits for a free worker slot of the stage for the duration of the block."""
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {"workers": self.workers, "in_flight": self.in_flight, "waiting": self.waiting}
+
+
+class PipelineScheduler:
+    """
+    Runs queued pipeline jobs with bounded concurrency.
+
+    submit() waits while the queue is full, so the change stream is not read faster than
+    the pipeline can process documents.
+    """
+
+    def __init__(
+        self,
+        workers: int = 16,
+        max_queue_size: int = 100,
+        stage_workers: Optional[Dict[str, int]] = None,
+    ):
+        if workers < 1:
+            raise ValueError("Scheduler needs at least one worker.")
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.stages: Dict[str, PipelineStage] = {
+            name: PipelineStage(name, count) for name, count in (stage_workers or {}).items()
+        }
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self._worker_tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._worker_tasks)
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def start(self) -> None:
+        """Starts the worker tasks."""
+        if self.running:
+            return
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i), name=f"pipeline-worker-{i}") for i in range(self.workers)
+        ]
+        logger.info(
+            f"Pipeline scheduler started ({self.workers} workers, queue size {self.queue.maxsize}, "
+            f"stages: {', '.join(f'{s.name}={s.workers}' for s in self.stages.values()) or 'unbounded'})."
+        )
+
+    async def stop(self) -> None:
+        """Cancels the workers. Jobs still in the queue are dropped."""
+        for task in self._worker_tasks:
+            task.cancel()
+        if self._worker_tasks:
+            await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        dropped = 0
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+            dropped += 1
+        if dropped:
+            logger.warning(f"Pipeline scheduler stopped with {dropped} queued jobs not processed.")
+        logger.info("Pipeline scheduler stopped.")
+
+    async def submit(self, job: Callable[[], Awaitable[Any]]) -> None:
+        """Queues a job (e.g. processing of one change event), waiting while the queue is full."""
+        await self.queue.put(job)
+
+    async def join(self) -> None:
+        """Waits until all queued jobs are processed."""
+        await self.queue.join()
+
+    @asynccontextmanager
+    async def stage(self, name: str) -> AsyncIterator[None]:
+        """Runs the block within the worker limit of the given stage (no limit for unknown stages)."""
+        stage = self.stages.get(name)
+        if stage is None:
+            yield
+            return
+        async with stage.slot():
+            yield
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self.queue.get()
+            self.in_flight += 1
+            try:
+                await job()
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+                logger.exception(f"Pipeline worker {index}: job failed.")
+            finally:
+                self.in_flight -= 1
+                self.queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns queue depth, in-flight counts and per-stage usage."""
+        return {
+            "running": self.running,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "queue_capacity": self.queue.maxsize,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "stages": {name: stage.stats() for name, stage in self.stages.items()},
+        }
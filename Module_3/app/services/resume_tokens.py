@@ -0,0 +1,62 @@
+import asyncio
+import collections
+import logging
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from app.db.repositories.change_streams import ChangeStreamStateRepository
+
+logger = logging.getLogger(__name__)
+
+# Zapis tokenu wznowienia strumienia zmian dopiero po rozliczeniu zdarzenia: zadanie przyjęte
+# (dokument zajęty dzierżawą - po awarii przejmie go inna replika) albo zakończone. Zdarzenia są
+# rozliczane w dowolnej kolejności, ale zapisywany jest token najnowszego zdarzenia, przed którym
+# wszystkie zdarzenia są już rozliczone - po awarii strumień wznawia się przed pierwszym zdarzeniem,
+# którego zadanie mogło zostać utracone (np. czekało w kolejce harmonogramu).
+
+
+class ResumeTokenTracker:
+    def __init__(self, stream_state: ChangeStreamStateRepository, stream_name: str):
+        """Initializes tracking of the events of the given stream."""
+        self.stream_state = stream_state
+        self.stream_name = stream_name
+        self._events: Deque[List[Any]] = collections.deque()
+        self._changed = asyncio.Event()
+
+    def track(self, resume_token: Dict[str, Any]) -> Callable[[], None]:
+        """Registers a received event; returns the callback that marks it as settled (idempotent)."""
+        entry = [resume_token, False]
+        self._events.append(entry)
+
+        def settle() -> None:
+            if not entry[1]:
+                entry[1] = True
+                self._changed.set()
+
+        return settle
+
+    def reset(self) -> None:
+        """Forgets the tracked events (e.g. when the stream restarts without a resume token)."""
+        self._events.clear()
+
+    def _settled_token(self) -> Optional[Dict[str, Any]]:
+        token = None
+        while self._events and self._events[0][1]:
+            token = self._events.popleft()[0]
+        return token
+
+    async def flush(self) -> None:
+        """Saves the token of the newest event settled together with all events before it."""
+        token = self._settled_token()
+        if token is not None:
+            await self.stream_state.save_resume_token(self.stream_name, token)
+
+    async def run(self) -> None:
+        """Saves the token whenever events are settled (runs until cancelled)."""
+        while True:
+            await self._changed.wait()
+            self._changed.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Kolejne rozliczone zdarzenie zapisze nowszy token
+                logger.warning(f"Could not save the resume token of stream '{self.stream_name}': {e}")
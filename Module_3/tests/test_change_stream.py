@@ -0,0 +1,292 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from app.main import watch_new_documents
+from app.db.repositories.change_streams import ChangeStreamStateRepository
+from app.db.repositories.documents import DocumentRepository, UNFINISHED_PROCESSING_FILTER
+from app.services.leases import LeaseManager
+from app.services.pipeline_scheduler import PipelineScheduler
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeChangeStream:
+    def __init__(self, events):
+        self.events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for event in self.events:
+            yield event
+        # Strumień pozostaje otwarty, jak w MongoDB
+        await asyncio.Event().wait()
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+def make_db(events=(), pending=(), resume_token=None, watch_side_effect=None):
+    db = MagicMock()
+    if watch_side_effect is not None:
+        db.documents.watch.side_effect = watch_side_effect
+    else:
+        db.documents.watch.return_value = FakeChangeStream(list(events))
+    db.documents.find.return_value = FakeCursor(list(pending))
+    db.changeStreamState = AsyncMock()
+    db.changeStreamState.find_one.return_value = {"resumeToken": resume_token} if resume_token else None
+    return db
+
+
+def insert_event(doc_id, token):
+    return {"_id": {"_data": token}, "operationType": "insert", "documentKey": {"_id": doc_id}}
+
+
+async def run_listener(db, scheduler):
+    listener = asyncio.create_task(watch_new_documents(db, MagicMock(), "conv", "det", "notif", None, scheduler))
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(scheduler.join(), 1)
+    return listener
+
+
+async def stop_listener(listener, scheduler):
+    listener.cancel()
+    await listener
+    await scheduler.stop()
+
+
+@pytest.fixture
+def scheduler():
+    return PipelineScheduler(workers=2, max_queue_size=10)
+
+
+@patch("app.main.process_document_pipeline", new_callable=AsyncMock)
+async def test_watch_new_documents_submits_to_scheduler(mock_pipeline: AsyncMock, scheduler: PipelineScheduler):
+    """Testuje, że zdarzenia strumienia zmian trafiają do harmonogramu."""
+    events = [insert_event(ObjectId(), f"t{i}") for i in range(3)]
+    db = make_db(events)
+    scheduler.start()
+
+    listener = await run_listener(db, scheduler)
+
+    assert mock_pipeline.await_count == 3
+    assert [c.args[0] for c in mock_pipeline.await_args_list] == events
+    assert all(c.args[-1] is scheduler for c in mock_pipeline.await_args_list)
+    await stop_listener(listener, scheduler)
+
+
+@patch("app.main.process_document_pipeline", new_callable=AsyncMock)
+async def test_watch_persists_and_resumes_from_token(mock_pipeline: AsyncMock, scheduler: PipelineScheduler):
+    """Testuje wznowienie od zapisanego tokenu i zapis tokenu po każdym zdarzeniu."""
+    events = [insert_event(ObjectId(), "t1"), insert_event(ObjectId(), "t2")]
+    db = make_db(events, resume_token={"_data": "t0"})
+    scheduler.start()
+
+    listener = await run_listener(db, scheduler)
+    await asyncio.sleep(0.01)
+
+    assert db.documents.watch.call_args.kwargs["resume_after"] == {"_data": "t0"}
+    saved = [c.args[1]["$set"]["resumeToken"] for c in db.changeStreamState.update_one.await_args_list]
+    assert saved[-1] == {"_data": "t2"}
+    assert saved in ([{"_data": "t1"}, {"_data": "t2"}], [{"_data": "t2"}])
+    await stop_listener(listener, scheduler)
+
+
+@patch("app.main.process_document_pipeline", new_callable=AsyncMock)
+async def test_watch_saves_token_only_after_job_finished(mock_pipeline: AsyncMock):
+    """Testuje, że token nie jest zapisywany, dopóki zadanie zdarzenia czeka w kolejce lub trwa."""
+    first, second = ObjectId(), ObjectId()
+    release = {first: asyncio.Event(), second: asyncio.Event()}
+
+    async def slow_pipeline(change, *args):
+        await release[change["documentKey"]["_id"]].wait()
+    mock_pipeline.side_effect = slow_pipeline
+
+    db = make_db(events=[insert_event(first, "t1"), insert_event(second, "t2")])
+    scheduler = PipelineScheduler(workers=2, max_queue_size=10)
+    scheduler.start()
+
+    def saved():
+        return [c.args[1]["$set"]["resumeToken"] for c in db.changeStreamState.update_one.await_args_list]
+
+    listener = asyncio.create_task(watch_new_documents(db, MagicMock(), "conv", "det", "notif", None, scheduler))
+    await asyncio.sleep(0.01)
+    assert saved() == []
+
+    # Zakończone zdarzenie t2 nie przesuwa tokenu, dopóki wcześniejsze t1 nie jest rozliczone
+    release[second].set()
+    await asyncio.sleep(0.01)
+    assert saved() == []
+
+    release[first].set()
+    await asyncio.wait_for(scheduler.join(), 1)
+    await asyncio.sleep(0.01)
+    assert saved() == [{"_data": "t2"}]
+    await stop_listener(listener, scheduler)
+
+
+@patch("app.main.process_document_pipeline", new_callable=AsyncMock)
+async def test_watch_saves_token_once_document_is_claimed(mock_pipeline: AsyncMock, scheduler: PipelineScheduler):
+    """Testuje zapis tokenu po zajęciu dokumentu dzierżawą, jeszcze przed końcem przetwarzania."""
+    doc_id = ObjectId()
+    release = asyncio.Event()
+
+    async def slow_pipeline(change, *args):
+        await release.wait()
+    mock_pipeline.side_effect = slow_pipeline
+
+    db = make_db(events=[insert_event(doc_id, "t1")])
+    repo = AsyncMock(spec=DocumentRepository)
+    repo.claim = AsyncMock(return_value={"_id": doc_id, "conversionStatus": "pending", "processingOwner": "replica-a"})
+    leases = LeaseManager(repo, owner="replica-a")
+    scheduler.start()
+
+    listener = asyncio.create_task(watch_new_documents(db, MagicMock(), "conv", "det", "notif", None, scheduler, leases))
+    await asyncio.sleep(0.02)
+
+    assert mock_pipeline.await_count == 1
+    saved = [c.args[1]["$set"]["resumeToken"] for c in db.changeStreamState.update_one.await_args_list]
+    assert saved == [{"_data": "t1"}]
+    release.set()
+    await asyncio.wait_for(scheduler.join(), 1)
+    await stop_listener(listener, scheduler)
+
+
+@patch("app.main.process_document_pipeline", new_callable=AsyncMock)
+async def test_watch_starts_from_now_without_token(mock_pipeline: AsyncMock, scheduler: PipelineScheduler):
+    db = make_db()
+    scheduler.start()
+
+    listener = await run_listener(db, scheduler)
+
+    assert "resume_after" not in db.documents.watch.call_args.kwargs
+    await stop_listener(listener, scheduler)
+
+
+@patch("app.main.process_document_pipeline", new_callable=AsyncMock)
+async def test_watch_backfills_pending_documents_once(mock_pipeline: AsyncMock, scheduler: PipelineScheduler):
+    """Testuje backfill oczekujących dokumentów i pominięcie zdarzenia dla dokumentu już zleconego."""
+    pending_id, new_id = ObjectId(), ObjectId()
+    pending_doc = {"_id": pending_id, "conversionStatus": "pending"}
+    release = asyncio.Event()
+
+    async def slow_pipeline(change, *args):
+        await release.wait()
+    mock_pipeline.side_effect = slow_pipeline
+
+    db = make_db(events=[insert_event(pending_id, "t1"), insert_event(new_id, "t2")], pending=[pending_doc])
+    scheduler.start()
+
+    listener = asyncio.create_task(watch_new_documents(db, MagicMock(), "conv", "det", "notif", None, scheduler))
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.wait_for(scheduler.join(), 1)
+
+    processed = [c.args[0]["documentKey"]["_id"] for c in mock_pipeline.await_args_list]
+    assert processed == [pending_id, new_id]
+    assert mock_pipeline.await_args_list[0].args[0]["fullDocument"] == pending_doc
+    db.documents.find.assert_called_once_with(UNFINISHED_PROCESSING_FILTER)
+    await stop_listener(listener, scheduler)
+
+
+@patch("app.main.process_document_pipeline", new_callable=AsyncMock)
+async def test_watch_restarts_from_now_when_history_lost(mock_pipeline: AsyncMock, scheduler: PipelineScheduler):
+    """Testuje usunięcie nieaktualnego tokenu i ponowny backfill, gdy strumienia nie da się wznowić."""
+    event = insert_event(ObjectId(), "t1")
+    db = make_db(
+        resume_token={"_data": "expired"},
+        watch_side_effect=[OperationFailure("history lost", code=286), FakeChangeStream([event])],
+    )
+    db.changeStreamState.find_one.side_effect = [{"resumeToken": {"_data": "expired"}}, None]
+    scheduler.start()
+
+    listener = await run_listener(db, scheduler)
+
+    db.changeStreamState.delete_one.assert_awaited_once_with({"_id": "documents"})
+    assert "resume_after" not in db.documents.watch.call_args.kwargs
+    assert mock_pipeline.await_count == 1
+    await stop_listener(listener, scheduler)
+
+
+async def test_change_stream_state_repository():
+    db = MagicMock()
+    db.changeStreamState = AsyncMock()
+    db.changeStreamState.find_one.return_value = {"_id": "documents", "resumeToken": {"_data": "t1"}}
+    repo = ChangeStreamStateRepository(db)
+
+    assert await repo.get_resume_token("documents") == {"_data": "t1"}
+    await repo.save_resume_token("documents", {"_data": "t2"})
+
+    args, kwargs = db.changeStreamState.update_one.await_args
+    assert args[0] == {"_id": "documents"}
+    assert args[1]["$set"]["resumeToken"] == {"_data": "t2"}
+    assert kwargs == {"upsert": True}
+
+    db.changeStreamState.find_one.return_value = None
+    assert await repo.get_resume_token("documents") is None
+
+
+@patch("app.main.process_document_pipeline", new_callable=AsyncMock)
+async def test_watch_processes_only_claimed_documents(mock_pipeline: AsyncMock, scheduler: PipelineScheduler):
+    """Testuje, że przy dzierżawach przetwarzane są tylko dokumenty zajęte przez tę replikę."""
+    mine, theirs = ObjectId(), ObjectId()
+    claimed_doc = {"_id": mine, "conversionStatus": "pending", "processingOwner": "replica-a"}
+    db = make_db(events=[insert_event(mine, "t1"), insert_event(theirs, "t2")])
+    repo = AsyncMock(spec=DocumentRepository)
+    repo.claim = AsyncMock(side_effect=lambda doc_id, owner, lease: claimed_doc if doc_id == str(mine) else None)
+    leases = LeaseManager(repo, owner="replica-a")
+    scheduler.start()
+
+    listener = asyncio.create_task(watch_new_documents(db, MagicMock(), "conv", "det", "notif", None, scheduler, leases))
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(scheduler.join(), 1)
+
+    assert mock_pipeline.await_count == 1
+    assert mock_pipeline.await_args.args[0]["fullDocument"] == claimed_doc
+    repo.release_lease.assert_awaited_once_with(str(mine), "replica-a")
+    await stop_listener(listener, scheduler)
+
+
+@patch("app.main.settings.LEASE_RECLAIM_INTERVAL", 0.01)
+@patch("app.main.process_document_pipeline", new_callable=AsyncMock)
+async def test_watch_reclaims_expired_leases(mock_pipeline: AsyncMock, scheduler: PipelineScheduler):
+    """Testuje przejęcie dokumentów, których dzierżawa wygasła (np. po awarii innej repliki)."""
+    abandoned = {"_id": ObjectId(), "conversionStatus": "pending", "processingOwner": "crashed"}
+    db = make_db()
+    db.documents.find.side_effect = [FakeCursor([]), FakeCursor([abandoned])] + [FakeCursor([]) for _ in range(100)]
+    repo = AsyncMock(spec=DocumentRepository)
+    repo.claim = AsyncMock(return_value={**abandoned, "processingOwner": "replica-a"})
+    leases = LeaseManager(repo, owner="replica-a")
+    scheduler.start()
+
+    listener = asyncio.create_task(watch_new_documents(db, MagicMock(), "conv", "det", "notif", None, scheduler, leases))
+    await asyncio.sleep(0.05)
+    await asyncio.wait_for(scheduler.join(), 1)
+
+    repo.claim.assert_any_await(str(abandoned["_id"]), "replica-a", leases.lease_seconds)
+    assert mock_pipeline.await_args_list[0].args[0]["fullDocument"]["processingOwner"] == "replica-a"
+    await stop_listener(listener, scheduler)
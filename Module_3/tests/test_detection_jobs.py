@@ -0,0 +1,134 @@
+import pytest
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import httpx
+
+from app.services.detection_jobs import DetectionJobClient, DetectionJobError
+
+
+pytestmark = pytest.mark.asyncio
+
+JOBS_URL = "http://fake-detection.com/jobs"
+
+
+class FakeJobService:
+    """Imitates the Module 4 job API; every poll finishes the oldest pending job."""
+
+    def __init__(self, fail_texts=()):
+        self.fail_texts = set(fail_texts)
+        self.texts = {}
+        self.pending = []
+        self.polls = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            text = json.loads(request.content)["text"]
+            job_id = f"job-{len(self.texts)}"
+            self.texts[job_id] = text
+            self.pending.append(job_id)
+            return httpx.Response(202, json={"job_id": job_id, "status": "pending"})
+
+        ids = request.url.params.get_list("ids")
+        self.polls.append(ids)
+        if self.pending:
+            self.pending.pop(0)
+        jobs = []
+        for job_id in ids:
+            if job_id in self.pending:
+                jobs.append({"job_id": job_id, "status": "running"})
+            elif self.texts[job_id] in self.fail_texts:
+                jobs.append({"job_id": job_id, "status": "failed", "error": "boom"})
+            else:
+                jobs.append({"job_id": job_id, "status": "completed", "result": [{"type": "ID", "value": self.texts[job_id], "label": "X"}]})
+        return httpx.Response(200, json={"jobs": jobs})
+
+
+def make_client(service: FakeJobService, **kwargs) -> DetectionJobClient:
+    client = DetectionJobClient(JOBS_URL, **kwargs)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(service.handler))
+    return client
+
+
+async def test_concurrent_jobs_share_one_poll_loop():
+    service = FakeJobService()
+    client = make_client(service)
+
+    results = await asyncio.gather(*(client.detect(f"text {i}") for i in range(20)))
+
+    assert [r[0]["value"] for r in results] == [f"text {i}" for i in range(20)]
+    # One poll request covers all in-flight jobs instead of one connection per document
+    assert len(service.polls) <= 20
+    assert max(len(ids) for ids in service.polls) == 20
+    assert client.in_flight == 0
+    await client.aclose()
+
+
+async def test_poll_batches_are_limited_and_rotated():
+    service = FakeJobService()
+    client = make_client(service, max_ids_per_poll=3)
+
+    results = await asyncio.gather(*(client.detect(f"text {i}") for i in range(7)))
+
+    assert len(results) == 7
+    assert all(len(ids) <= 3 for ids in service.polls)
+    await client.aclose()
+
+
+async def test_failed_job_raises_detection_job_error():
+    service = FakeJobService(fail_texts={"bad"})
+    client = make_client(service)
+
+    good, bad = await asyncio.gather(client.detect("good"), client.detect("bad"), return_exceptions=True)
+
+    assert good == [{"type": "ID", "value": "good", "label": "X"}]
+    assert isinstance(bad, DetectionJobError)
+    assert "boom" in str(bad)
+    await client.aclose()
+
+
+async def test_repeated_poll_failures_fail_waiting_jobs():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            return httpx.Response(202, json={"job_id": "job-1", "status": "pending"})
+        return httpx.Response(503, text="unavailable")
+
+    client = DetectionJobClient(JOBS_URL, max_poll_failures=3)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with patch("app.services.detection_jobs.asyncio.sleep", new=AsyncMock()):
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.detect("text")
+    assert client.in_flight == 0
+    await client.aclose()
+
+
+async def test_submit_requires_job_id():
+    client = DetectionJobClient(JOBS_URL)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(202, json={})))
+
+    with pytest.raises(DetectionJobError):
+        await client.submit("text")
+    await client.aclose()
+
+
+async def test_lost_job_fails_after_deadline():
+    polls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            return httpx.Response(202, json={"job_id": "job-lost", "status": "pending"})
+        polls.append(request.url.params.get_list("ids"))
+        # Moduł 4 raportuje nieznane (np. usunięte z Redis) zadanie jako "pending"
+        return httpx.Response(200, json={"jobs": [{"job_id": "job-lost", "status": "pending"}]})
+
+    client = DetectionJobClient(JOBS_URL, job_timeout=0.05)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with pytest.raises(DetectionJobError, match="timed out"):
+        await asyncio.wait_for(client.detect("text"), timeout=5)
+    assert client.in_flight == 0
+    assert client._deadlines == {}
+    assert polls
+    await client.aclose()
@@ -1,8 +1,9 @@
 import pytest
 import pytest_asyncio
+import asyncio
 from httpx import AsyncClient, ASGITransport 
 from fastapi import status
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, patch
 from typing import  AsyncIterator
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
@@ -14,11 +15,14 @@ from app.services.documents import DocumentService
 from app.models.documents import (
     DocumentInDB,
     DocumentList,
+    DocumentSearchResult,
+    ListCountMode,
     ConversionStatus
 )
 from app.core.exceptions import (
     DocumentNotFoundException,
-    FileNotFoundInGridFSException
+    FileNotFoundInGridFSException,
+    ValidationException
 )
 
 pytestmark = pytest.mark.asyncio
@@ -83,7 +87,12 @@ async def mock_async_file_generator(content: bytes) -> AsyncIterator[bytes]:
 
 async def test_upload_single_document_success(test_client: AsyncClient, mock_document_service: AsyncMock):
     """Testuje pomyślny upload jednego pliku."""
-    mock_document_service.create_document.return_value = FAKE_OBJECT_ID
+    received_content = []
+
+    async def consume_stream(**kwargs):
+        received_content.append(b"".join([chunk async for chunk in kwargs["chunks"]]))
+        return FAKE_OBJECT_ID
+    mock_document_service.create_document_from_stream.side_effect = consume_stream
     file_content = b"This is a test file content."
     files = {'files': ('test_upload.txt', io.BytesIO(file_content), 'text/plain')}
     data = {'uploader_email': TEST_EMAIL}
@@ -99,9 +108,9 @@ async def test_upload_single_document_success(test_client: AsyncClient, mock_doc
     assert result[0]['documentId'] == FAKE_OBJECT_ID
     assert result[0]['error'] is None
 
-    mock_document_service.create_document.assert_awaited_once()
+    mock_document_service.create_document_from_stream.assert_awaited_once()
 
-    call_args_info = mock_document_service.create_document.call_args
+    call_args_info = mock_document_service.create_document_from_stream.call_args
     positional_args = call_args_info[0]
     keyword_args = call_args_info[1]
 
@@ -109,14 +118,14 @@ async def test_upload_single_document_success(test_client: AsyncClient, mock_doc
 
     assert keyword_args['file_name'] == 'test_upload.txt'
     assert keyword_args['file_format'] == 'txt'
-    assert keyword_args['file_content'] == file_content
+    assert received_content == [file_content]
     assert keyword_args['uploader_email'] == TEST_EMAIL     
 
 
 async def test_upload_multiple_documents(test_client: AsyncClient, mock_document_service: AsyncMock):
     """Testuje upload wielu plików, w tym jednego z błędem."""
     # Mockujemy, że pierwszy plik się uda, a drugi rzuci błąd
-    mock_document_service.create_document.side_effect = [
+    mock_document_service.create_document_from_stream.side_effect = [
         FAKE_OBJECT_ID,
     ]
 
@@ -145,7 +154,39 @@ async def test_upload_multiple_documents(test_client: AsyncClient, mock_document
     assert results[1]['documentId'] is None
     assert "Uploaded file cannot be empty." in results[1]['error']
 
-    assert mock_document_service.create_document.await_count == 1
+    assert mock_document_service.create_document_from_stream.await_count == 1
+
+
+async def test_upload_documents_concurrently_in_input_order(test_client: AsyncClient, mock_document_service: AsyncMock):
+    """Testuje równoległy zapis plików z limitem współbieżności i wyniki w kolejności plików."""
+    running = 0
+    max_running = 0
+
+    async def slow_create(**kwargs):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        # Pierwsze pliki kończą się najpóźniej
+        index = int(kwargs["file_name"].split("_")[1].split(".")[0])
+        await asyncio.sleep(0.01 * (6 - index))
+        async for _ in kwargs["chunks"]:
+            pass
+        running -= 1
+        return f"doc-{index}"
+    mock_document_service.create_document_from_stream.side_effect = slow_create
+
+    files_data = [('files', (f'file_{i}.txt', io.BytesIO(b"content"), 'text/plain')) for i in range(6)]
+    files_data.insert(3, ('files', ('no_extension', io.BytesIO(b"content"), 'text/plain')))
+
+    with patch("app.api.endpoints.documents.settings.UPLOAD_CONCURRENCY", 3):
+        response = await test_client.post("/api/documents", files=files_data, data={'uploader_email': TEST_EMAIL})
+
+    assert response.status_code == status.HTTP_207_MULTI_STATUS
+    results = response.json()
+    assert [r['filename'] for r in results] == ['file_0.txt', 'file_1.txt', 'file_2.txt', 'no_extension', 'file_3.txt', 'file_4.txt', 'file_5.txt']
+    assert [r['documentId'] for r in results] == ['doc-0', 'doc-1', 'doc-2', None, 'doc-3', 'doc-4', 'doc-5']
+    assert results[3]['status'] == 'failed'
+    assert max_running == 3
 
 
 async def test_upload_document_missing_email(test_client: AsyncClient):
@@ -190,7 +231,8 @@ async def test_list_documents_success(test_client: AsyncClient, mock_document_se
     assert result["documents"][1]["_id"] == FAKE_OBJECT_ID_2
 
     mock_document_service.list_documents.assert_awaited_once_with(
-        page=1, limit=20, conversion_status=None, original_format=None, date_from=None, date_to=None, query=None
+        page=1, limit=20, conversion_status=None, original_format=None, date_from=None, date_to=None, query=None,
+        cursor=None, count=ListCountMode.EXACT, fields=[]
     )
 
 
@@ -207,10 +249,70 @@ async def test_list_documents_with_filter(test_client: AsyncClient, mock_documen
     })
 
     mock_document_service.list_documents.assert_awaited_once_with(
-        page=2, limit=10, conversion_status="pending", original_format="xlsx", date_from=None, date_to=None, query="raport"
+        page=2, limit=10, conversion_status="pending", original_format="xlsx", date_from=None, date_to=None, query="raport",
+        cursor=None, count=ListCountMode.EXACT, fields=[]
     )
 
 
+async def test_list_documents_with_cursor(test_client: AsyncClient, mock_document_service: AsyncMock):
+    """Testuje przekazanie kursora i trybu liczenia do serwisu."""
+    mock_document_service.list_documents.return_value = DocumentList(limit=20, documents=[], next_cursor="abc").model_dump()
+
+    response = await test_client.get("/api/documents", params={"cursor": "xyz", "count": "none"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["next_cursor"] == "abc"
+    assert response.json()["total"] is None
+    mock_document_service.list_documents.assert_awaited_once_with(
+        page=1, limit=20, conversion_status=None, original_format=None, date_from=None, date_to=None, query=None,
+        cursor="xyz", count=ListCountMode.NONE, fields=[]
+    )
+
+
+async def test_list_documents_with_fields(test_client: AsyncClient, mock_document_service: AsyncMock):
+    """Testuje przekazanie listy dodatkowych pól (fields=) do serwisu."""
+    mock_document_service.list_documents.return_value = DocumentList(total=0, page=1, limit=20, documents=[]).model_dump()
+
+    response = await test_client.get("/api/documents", params={"fields": "normalizedText, analysisResult.detectedItems"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert mock_document_service.list_documents.await_args.kwargs["fields"] == ["normalizedText", "analysisResult.detectedItems"]
+
+
+async def test_list_documents_invalid_cursor(test_client: AsyncClient, mock_document_service: AsyncMock):
+    mock_document_service.list_documents.side_effect = ValidationException("Invalid list cursor.")
+
+    response = await test_client.get("/api/documents", params={"cursor": "broken"})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+async def test_search_documents(test_client: AsyncClient, mock_document_service: AsyncMock):
+    """Testuje wyszukiwanie pełnotekstowe (trasa /documents/search nie jest traktowana jako ID)."""
+    hit = {**create_sample_doc_in_db(FAKE_OBJECT_ID).model_dump(by_alias=True), "score": 1.5}
+    mock_document_service.search_documents.return_value = DocumentSearchResult(
+        total=1, page=1, limit=20, documents=[hit]
+    ).model_dump()
+
+    response = await test_client.get("/api/documents/search", params={"q": "85010212345", "conversion_status": "completed"})
+
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert result["documents"][0]["_id"] == FAKE_OBJECT_ID
+    assert result["documents"][0]["score"] == 1.5
+    mock_document_service.search_documents.assert_awaited_once_with(
+        "85010212345", page=1, limit=20, conversion_status="completed", original_format=None,
+        count=ListCountMode.ESTIMATE, fields=[]
+    )
+
+
+async def test_search_documents_requires_query(test_client: AsyncClient, mock_document_service: AsyncMock):
+    response = await test_client.get("/api/documents/search")
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    mock_document_service.search_documents.assert_not_awaited()
+
+
 async def test_get_document_success(test_client: AsyncClient, mock_document_service: AsyncMock):
     """Testuje pomyślne pobranie jednego dokumentu."""
     expected_doc = create_sample_doc_in_db(FAKE_OBJECT_ID)
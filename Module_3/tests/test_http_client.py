@@ -0,0 +1,92 @@
+import pytest
+from unittest.mock import patch
+
+import httpx
+
+from app.core import http_client
+from app.core.config import settings
+from app.services.detection_jobs import DetectionJobClient
+
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture(autouse=True)
+def reset_http_context():
+    http_client.http_context.client = None
+    yield
+    http_client.http_context.client = None
+
+
+async def test_start_and_close_http_client():
+    """Testuje utworzenie i zamknięcie współdzielonego klienta HTTP."""
+    await http_client.start_http_client()
+    client = http_client.http_context.client
+    assert isinstance(client, httpx.AsyncClient)
+    assert client.timeout == httpx.Timeout(settings.HTTP_DEFAULT_TIMEOUT)
+
+    # Ponowne uruchomienie nie tworzy nowego klienta
+    await http_client.start_http_client()
+    assert http_client.http_context.client is client
+
+    await http_client.close_http_client()
+    assert http_client.http_context.client is None
+    assert client.is_closed
+
+
+async def test_start_http_client_applies_limits():
+    """Testuje przekazanie limitów puli połączeń z ustawień."""
+    with patch.object(http_client.httpx, "AsyncClient") as MockClient, \
+         patch.object(http_client, "_http2_available", return_value=False):
+        await http_client.start_http_client()
+        http_client.http_context.client = None
+
+    kwargs = MockClient.call_args.kwargs
+    assert kwargs["limits"] == httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+    )
+    assert kwargs["http2"] is False
+
+
+async def test_start_http_client_enables_http2_when_available():
+    """Testuje włączenie HTTP/2, gdy pakiet h2 jest dostępny."""
+    with patch.object(http_client.httpx, "AsyncClient") as MockClient, \
+         patch.object(http_client, "_http2_available", return_value=True), \
+         patch.object(settings, "HTTP_HTTP2", True):
+        await http_client.start_http_client()
+        http_client.http_context.client = None
+
+    assert MockClient.call_args.kwargs["http2"] is True
+
+
+async def test_pipeline_http_client_uses_shared_client():
+    """Testuje, że etapy potoku korzystają ze współdzielonego klienta i go nie zamykają."""
+    await http_client.start_http_client()
+    shared = http_client.http_context.client
+
+    async with http_client.pipeline_http_client() as client:
+        assert client is shared
+    assert not shared.is_closed
+    await http_client.close_http_client()
+
+
+async def test_pipeline_http_client_fallback_without_lifespan():
+    """Testuje krótkotrwałego klienta, gdy współdzielony klient nie został uruchomiony."""
+    async with http_client.pipeline_http_client() as client:
+        assert isinstance(client, httpx.AsyncClient)
+        assert client is not http_client.http_context.client
+    assert client.is_closed
+
+
+async def test_detection_job_client_keeps_shared_client_open():
+    """Testuje, że klient zadań detekcji nie zamyka przekazanego klienta współdzielonego."""
+    await http_client.start_http_client()
+    shared = http_client.http_context.client
+
+    jobs = DetectionJobClient("http://fake-detection.com/jobs", client=shared)
+    await jobs.aclose()
+
+    assert not shared.is_closed
+    await http_client.close_http_client()
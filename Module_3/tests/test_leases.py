@@ -0,0 +1,132 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock
+
+from app.db.repositories.documents import DocumentRepository
+from app.services.leases import LeaseManager, LeaseLost
+
+
+pytestmark = pytest.mark.asyncio
+
+DOC_ID = "65f000000000000000000001"
+CLAIMED_DOC = {"_id": DOC_ID, "conversionStatus": "pending", "processingOwner": "replica-a"}
+
+
+@pytest.fixture
+def mock_repo() -> AsyncMock:
+    repo = AsyncMock(spec=DocumentRepository)
+    repo.claim = AsyncMock(return_value=CLAIMED_DOC)
+    repo.renew_lease = AsyncMock(return_value=True)
+    repo.release_lease = AsyncMock(return_value=None)
+    return repo
+
+
+async def test_hold_claims_and_releases(mock_repo: AsyncMock):
+    """Testuje zajęcie dokumentu i zwolnienie dzierżawy po przetworzeniu."""
+    leases = LeaseManager(mock_repo, owner="replica-a", lease_seconds=60, heartbeat_interval=20)
+
+    async with leases.hold(DOC_ID) as document:
+        assert document == CLAIMED_DOC
+
+    mock_repo.claim.assert_awaited_once_with(DOC_ID, "replica-a", 60)
+    mock_repo.release_lease.assert_awaited_once_with(DOC_ID, "replica-a")
+
+
+async def test_hold_yields_none_when_not_claimed(mock_repo: AsyncMock):
+    """Testuje pominięcie dokumentu zajętego przez inną replikę."""
+    mock_repo.claim.return_value = None
+    leases = LeaseManager(mock_repo, owner="replica-b")
+
+    async with leases.hold(DOC_ID) as document:
+        assert document is None
+
+    mock_repo.release_lease.assert_not_awaited()
+
+
+async def test_hold_renews_lease_while_processing(mock_repo: AsyncMock):
+    """Testuje przedłużanie dzierżawy (heartbeat) w trakcie przetwarzania."""
+    leases = LeaseManager(mock_repo, owner="replica-a", lease_seconds=0.2, heartbeat_interval=0.02)
+
+    async with leases.hold(DOC_ID):
+        await asyncio.sleep(0.09)
+
+    assert mock_repo.renew_lease.await_count >= 3
+    renewed = mock_repo.renew_lease.await_count
+    await asyncio.sleep(0.05)
+    assert mock_repo.renew_lease.await_count == renewed
+
+
+async def test_heartbeat_stops_when_lease_lost(mock_repo: AsyncMock):
+    mock_repo.renew_lease.return_value = False
+    leases = LeaseManager(mock_repo, owner="replica-a", lease_seconds=0.2, heartbeat_interval=0.02)
+
+    async with leases.hold(DOC_ID):
+        await asyncio.sleep(0.09)
+
+    mock_repo.renew_lease.assert_awaited_once()
+
+
+async def test_release_failure_does_not_propagate(mock_repo: AsyncMock):
+    mock_repo.release_lease.side_effect = RuntimeError("db down")
+    leases = LeaseManager(mock_repo, owner="replica-a")
+
+    async with leases.hold(DOC_ID):
+        pass
+
+
+async def test_default_owner_is_unique(mock_repo: AsyncMock):
+    assert LeaseManager(mock_repo).owner != LeaseManager(mock_repo).owner
+    with pytest.raises(ValueError):
+        LeaseManager(mock_repo, lease_seconds=10, heartbeat_interval=10)
+
+
+async def test_run_processes_claimed_document(mock_repo: AsyncMock):
+    """Testuje przetworzenie zajętego dokumentu i zwolnienie dzierżawy."""
+    leases = LeaseManager(mock_repo, owner="replica-a")
+    process = AsyncMock()
+
+    assert await leases.run(DOC_ID, process) is True
+
+    process.assert_awaited_once_with(CLAIMED_DOC)
+    mock_repo.release_lease.assert_awaited_once_with(DOC_ID, "replica-a")
+
+
+async def test_run_skips_unclaimed_document(mock_repo: AsyncMock):
+    mock_repo.claim.return_value = None
+    leases = LeaseManager(mock_repo, owner="replica-b")
+    process = AsyncMock()
+
+    assert await leases.run(DOC_ID, process) is False
+    process.assert_not_awaited()
+
+
+async def test_run_cancels_processing_when_lease_lost(mock_repo: AsyncMock):
+    """Testuje przerwanie przetwarzania po utracie dzierżawy (dokument przejęty przez inną replikę)."""
+    mock_repo.renew_lease.return_value = False
+    leases = LeaseManager(mock_repo, owner="replica-a", lease_seconds=0.2, heartbeat_interval=0.02)
+    finished = asyncio.Event()
+
+    async def process(document):
+        await asyncio.sleep(10)
+        finished.set()
+
+    with pytest.raises(LeaseLost):
+        await asyncio.wait_for(leases.run(DOC_ID, process), timeout=5)
+    assert not finished.is_set()
+    assert asyncio.current_task().cancelling() == 0
+
+
+async def test_run_propagates_external_cancellation(mock_repo: AsyncMock):
+    leases = LeaseManager(mock_repo, owner="replica-a")
+    started = asyncio.Event()
+
+    async def process(document):
+        started.set()
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(leases.run(DOC_ID, process))
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    mock_repo.release_lease.assert_awaited_once_with(DOC_ID, "replica-a")
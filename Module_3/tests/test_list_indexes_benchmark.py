@@ -0,0 +1,113 @@
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.db.repositories.documents import DocumentRepository
+
+# Benchmark planów zapytań listy dokumentów na prawdziwym MongoDB. Uruchamiany tylko, gdy
+# ustawiono MONGODB_BENCHMARK_URL, np.:
+#   MONGODB_BENCHMARK_URL=mongodb://localhost:27017 BENCHMARK_DOCUMENTS=1000000 pytest -s tests/test_list_indexes_benchmark.py
+# Dane są zapisywane do osobnej bazy, usuwanej po teście.
+
+BENCHMARK_URL = os.getenv("MONGODB_BENCHMARK_URL")
+BENCHMARK_DOCUMENTS = int(os.getenv("BENCHMARK_DOCUMENTS", "1000000"))
+BENCHMARK_DATABASE = "tioch_list_benchmark"
+BATCH_SIZE = 10000
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.skipif(not BENCHMARK_URL, reason="MONGODB_BENCHMARK_URL not set"),
+]
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+FORMATS = ["pdf", "docx", "txt", "csv", "xlsx", "html"]
+STATUSES = ["pending", "completed", "failed"]
+
+# Kombinacje filtrów obsługiwane przez GET /documents
+LIST_QUERIES = {
+    "no filter": {},
+    "status": {"conversion_status": "completed"},
+    "format": {"original_format": "pdf"},
+    "status + format": {"conversion_status": "completed", "original_format": "pdf"},
+    "date range": {"date_from": START + timedelta(days=100), "date_to": START + timedelta(days=200)},
+    "status + date range": {"conversion_status": "failed", "date_from": START + timedelta(days=100)},
+    "format + date range": {"original_format": "csv", "date_to": START + timedelta(days=50)},
+    "status + format + date range": {
+        "conversion_status": "completed", "original_format": "docx",
+        "date_from": START + timedelta(days=10), "date_to": START + timedelta(days=300),
+    },
+    "filename query": {"query": "raport"},
+}
+
+
+def synthetic_document(i: int, rng: random.Random) -> dict:
+    fmt = rng.choice(FORMATS)
+    return {
+        "_id": ObjectId(),
+        "originalFilename": f"{rng.choice(['raport', 'umowa', 'faktura', 'cv'])}_{i}.{fmt}",
+        "originalFormat": fmt,
+        "uploaderEmail": f"user{i % 500}@example.com",
+        "uploadTimestamp": START + timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+        "contentHash": f"sha256:{i:064x}",
+        "originalDocumentPath": f"gridfs:{ObjectId()}",
+        "conversionStatus": rng.choices(STATUSES, weights=[1, 8, 1])[0],
+        "analysisResult": None,
+        "normalizedText": None,
+    }
+
+
+def plan_stages(plan: dict) -> list:
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return [stage for stage in stages if stage]
+
+
+@pytest_asyncio.fixture(scope="module")
+async def seeded_repository():
+    client = AsyncIOMotorClient(BENCHMARK_URL)
+    db = client[BENCHMARK_DATABASE]
+    await db.documents.drop()
+    repo = DocumentRepository(db, None)
+
+    rng = random.Random(42)
+    started = time.perf_counter()
+    for offset in range(0, BENCHMARK_DOCUMENTS, BATCH_SIZE):
+        batch = [synthetic_document(i, rng) for i in range(offset, min(offset + BATCH_SIZE, BENCHMARK_DOCUMENTS))]
+        await db.documents.insert_many(batch, ordered=False)
+    print(f"\nSeeded {BENCHMARK_DOCUMENTS} documents in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    await repo.create_indexes()
+    print(f"Created indexes in {time.perf_counter() - started:.1f}s")
+
+    yield repo
+
+    await client.drop_database(BENCHMARK_DATABASE)
+    client.close()
+
+
+@pytest.mark.parametrize("name", LIST_QUERIES)
+async def test_list_query_uses_index_scan(seeded_repository: DocumentRepository, name: str):
+    """Sprawdza, że każda kombinacja filtrów listy jest obsługiwana przez IXSCAN bez sortowania w pamięci."""
+    filter_dict = DocumentRepository.build_list_filter(**LIST_QUERIES[name])
+    explain = await seeded_repository.list_cursor(filter_dict, skip=0, limit=20).explain()
+
+    stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+    stats = explain.get("executionStats", {})
+    print(
+        f"{name:30} stages={'>'.join(stages):40} keys={stats.get('totalKeysExamined')} "
+        f"docs={stats.get('totalDocsExamined')} time={stats.get('executionTimeMillis')}ms"
+    )
+    assert "IXSCAN" in stages
+    assert "COLLSCAN" not in stages
+    assert "SORT" not in stages
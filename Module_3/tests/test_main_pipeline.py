@@ -3,6 +3,7 @@ from unittest.mock import AsyncMock, MagicMock, patch, ANY
 from bson import ObjectId
 import datetime
 import httpx
+import json
 from copy import deepcopy
 
 from app.main import process_document_pipeline
@@ -13,6 +14,9 @@ from app.models.documents import (
     AnalysisStatus
 )
 from app.core.exceptions import FileNotFoundInGridFSException
+from app.services.detection_jobs import DetectionJobClient, DetectionJobError
+from app.services.pipeline_scheduler import PipelineScheduler
+from app.core import http_client
 
 
 pytestmark = pytest.mark.asyncio
@@ -88,7 +92,8 @@ async def test_pipeline_happy_path(mock_repo: AsyncMock, mock_http_response: Mag
     mock_repo.download_gridfs_file.assert_awaited_once_with(GRIDFS_ORIG_ID_OBJ)
     assert mock_client_instance.post.await_count == 2
     m2_call = mock_client_instance.post.await_args_list[0]
-    assert m2_call.args[0] == TEST_CONVERSION_URL; assert 'files' in m2_call.kwargs
+    assert m2_call.args[0] == TEST_CONVERSION_URL; assert 'content' in m2_call.kwargs
+    assert m2_call.kwargs['headers']['Content-Type'].startswith("multipart/form-data; boundary=")
     m4_call = mock_client_instance.post.await_args_list[1]
     assert m4_call.args[0] == TEST_DETECTION_URL; assert m4_call.kwargs.get('json') == {"text": NORMALIZED_TEXT_CONTENT}
 
@@ -116,7 +121,7 @@ async def test_pipeline_m2_http_error(mock_repo: AsyncMock, mock_http_response:
         await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, TEST_NOTIFICATION_SERVICE_URL)
 
     mock_repo.download_gridfs_file.assert_awaited_once()
-    mock_client_instance.post.assert_awaited_once_with(TEST_CONVERSION_URL, files=ANY)
+    mock_client_instance.post.assert_awaited_once_with(TEST_CONVERSION_URL, content=ANY, headers=ANY, timeout=ANY)
     m2_response.raise_for_status.assert_called_once()
     mock_repo.update.assert_awaited_once()
     update_payload: DocumentUpdate = mock_repo.update.await_args_list[0].args[1]
@@ -124,6 +129,20 @@ async def test_pipeline_m2_http_error(mock_repo: AsyncMock, mock_http_response:
     assert "Error from Conversion(M2) (500)" in update_payload.conversion_error
     assert "Internal Server Error" in update_payload.conversion_error
 
+async def test_pipeline_m2_http_error_after_redirect(mock_repo: AsyncMock, mock_http_response: MagicMock):
+    """Testuje przypisanie błędu HTTP do konwersji na podstawie etapu, a nie adresu żądania (np. po przekierowaniu)."""
+    change_event = deepcopy(BASE_CHANGE_EVENT)
+    m2_response = mock_http_response(status_code=502, text_data="Bad Gateway", request_url="http://extractor-v2:8000/file")
+    with patch('app.main.httpx.AsyncClient') as MockClient:
+        mock_client_instance = AsyncMock(); mock_client_instance.post = AsyncMock(return_value=m2_response)
+        MockClient.return_value.__aenter__.return_value = mock_client_instance
+        await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, TEST_NOTIFICATION_SERVICE_URL)
+
+    update_payload: DocumentUpdate = mock_repo.update.await_args_list[0].args[1]
+    assert update_payload.conversion_status == ConversionStatus.STATUS_FAILED
+    assert "Error from Conversion(M2) (502)" in update_payload.conversion_error
+    assert update_payload.analysis_result is None
+
 async def test_pipeline_m2_network_error(mock_repo: AsyncMock, mock_http_response: MagicMock):
     change_event = deepcopy(BASE_CHANGE_EVENT)
     with patch('app.main.httpx.AsyncClient') as MockClient:
@@ -132,7 +151,7 @@ async def test_pipeline_m2_network_error(mock_repo: AsyncMock, mock_http_respons
         await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, TEST_NOTIFICATION_SERVICE_URL)
 
     mock_repo.download_gridfs_file.assert_awaited_once()
-    mock_client_instance.post.assert_awaited_once_with(TEST_CONVERSION_URL, files=ANY)
+    mock_client_instance.post.assert_awaited_once_with(TEST_CONVERSION_URL, content=ANY, headers=ANY, timeout=ANY)
     mock_repo.update.assert_awaited_once()
     update_payload: DocumentUpdate = mock_repo.update.await_args_list[0].args[1]
     assert update_payload.conversion_status == ConversionStatus.STATUS_FAILED
@@ -245,8 +264,248 @@ async def test_pipeline_missing_detection_url(mock_repo: AsyncMock, mock_http_re
         await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, None, TEST_NOTIFICATION_SERVICE_URL)
 
     mock_repo.download_gridfs_file.assert_awaited_once()
-    mock_client_instance.post.assert_awaited_once_with(TEST_CONVERSION_URL, files=ANY)
+    mock_client_instance.post.assert_awaited_once_with(TEST_CONVERSION_URL, content=ANY, headers=ANY, timeout=ANY)
     mock_repo.update.assert_awaited_once()
     update1_payload: DocumentUpdate = mock_repo.update.await_args_list[0].args[1]
     assert update1_payload.conversion_status == ConversionStatus.STATUS_COMPLETED
-    assert update1_payload.analysis_result is None
\ No newline at end of file
+    assert update1_payload.analysis_result is None
+async def test_pipeline_uses_detection_job_client(mock_repo: AsyncMock, mock_http_response: MagicMock):
+    change_event = deepcopy(BASE_CHANGE_EVENT)
+    m2_response = mock_http_response(200, {"text": NORMALIZED_TEXT_CONTENT, "metadata": MOCK_METADATA_DICT}, request_url=TEST_CONVERSION_URL)
+    detection_jobs = AsyncMock(spec=DetectionJobClient)
+    detection_jobs.jobs_url = "http://fake-detection.com/jobs"
+    detection_jobs.submit = AsyncMock(return_value="job-1")
+    detection_jobs.wait = AsyncMock(return_value=MOCK_DETECTION_RESULTS)
+    with patch('app.main.httpx.AsyncClient') as MockClient:
+        mock_client_instance = AsyncMock(); mock_client_instance.post = AsyncMock(return_value=m2_response)
+        MockClient.return_value.__aenter__.return_value = mock_client_instance
+        await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, TEST_NOTIFICATION_SERVICE_URL, detection_jobs)
+
+    mock_client_instance.post.assert_awaited_once_with(TEST_CONVERSION_URL, content=ANY, headers=ANY, timeout=ANY)
+    detection_jobs.submit.assert_awaited_once_with(NORMALIZED_TEXT_CONTENT)
+    detection_jobs.wait.assert_awaited_once_with("job-1")
+    update2_payload: DocumentUpdate = mock_repo.update.await_args_list[1].args[1]
+    assert update2_payload.analysis_result.status == AnalysisStatus.COMPLETED
+    assert update2_payload.analysis_result.detected_items == MOCK_DETECTION_RESULTS
+
+async def test_pipeline_detection_job_failure_marks_analysis_failed(mock_repo: AsyncMock, mock_http_response: MagicMock):
+    change_event = deepcopy(BASE_CHANGE_EVENT)
+    m2_response = mock_http_response(200, {"text": NORMALIZED_TEXT_CONTENT, "metadata": MOCK_METADATA_DICT}, request_url=TEST_CONVERSION_URL)
+    detection_jobs = AsyncMock(spec=DetectionJobClient)
+    detection_jobs.jobs_url = "http://fake-detection.com/jobs"
+    detection_jobs.submit = AsyncMock(return_value="job-1")
+    detection_jobs.wait = AsyncMock(side_effect=DetectionJobError("Detection job failed: boom"))
+    with patch('app.main.httpx.AsyncClient') as MockClient:
+        mock_client_instance = AsyncMock(); mock_client_instance.post = AsyncMock(return_value=m2_response)
+        MockClient.return_value.__aenter__.return_value = mock_client_instance
+        await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, TEST_NOTIFICATION_SERVICE_URL, detection_jobs)
+
+    update2_payload: DocumentUpdate = mock_repo.update.await_args_list[1].args[1]
+    assert update2_payload.analysis_result.status == AnalysisStatus.FAILED
+    assert "Detection job failed: boom" in update2_payload.analysis_result.error
+
+
+async def test_pipeline_releases_detection_slot_while_waiting_for_job(mock_repo: AsyncMock):
+    """Testuje, że limit etapu detekcji obejmuje tylko zlecenie zadania, a nie oczekiwanie na jego wynik."""
+    change_event = deepcopy(BASE_CHANGE_EVENT)
+    change_event["fullDocument"]["conversionStatus"] = ConversionStatus.STATUS_COMPLETED.value
+    change_event["fullDocument"]["normalizedText"] = NORMALIZED_TEXT_CONTENT
+    scheduler = PipelineScheduler(workers=1, stage_workers={"detection": 1})
+    detection_stage = scheduler.stages["detection"]
+    detection_jobs = AsyncMock(spec=DetectionJobClient)
+    detection_jobs.jobs_url = "http://fake-detection.com/jobs"
+    in_flight = {}
+
+    async def submit(text):
+        in_flight["submit"] = detection_stage.in_flight
+        return "job-1"
+
+    async def wait(job_id):
+        in_flight["wait"] = detection_stage.in_flight
+        return MOCK_DETECTION_RESULTS
+
+    detection_jobs.submit = AsyncMock(side_effect=submit)
+    detection_jobs.wait = AsyncMock(side_effect=wait)
+
+    await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, "", detection_jobs, scheduler)
+
+    assert in_flight == {"submit": 1, "wait": 0}
+    update_payload: DocumentUpdate = mock_repo.update.await_args.args[1]
+    assert update_payload.analysis_result.status == AnalysisStatus.COMPLETED
+
+
+async def test_pipeline_skips_already_processed_document(mock_repo: AsyncMock):
+    """Testuje pominięcie dokumentu, który nie oczekuje już na konwersję (np. zdarzenie powtórzone po wznowieniu)."""
+    change_event = deepcopy(BASE_CHANGE_EVENT)
+    change_event["fullDocument"]["conversionStatus"] = ConversionStatus.STATUS_COMPLETED.value
+    change_event["fullDocument"]["analysisResult"] = {"status": AnalysisStatus.COMPLETED.value}
+
+    with patch('app.main.httpx.AsyncClient') as MockClient:
+        await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, TEST_NOTIFICATION_SERVICE_URL)
+
+    mock_repo.download_gridfs_file.assert_not_awaited()
+    mock_repo.update.assert_not_awaited()
+    MockClient.assert_not_called()
+
+
+async def test_pipeline_resumes_detection_after_completed_conversion(mock_repo: AsyncMock):
+    """Testuje wznowienie od detekcji dokumentu, którego konwersja się zakończyła, a analiza nie (awaria repliki)."""
+    change_event = deepcopy(BASE_CHANGE_EVENT)
+    change_event["fullDocument"]["conversionStatus"] = ConversionStatus.STATUS_COMPLETED.value
+    change_event["fullDocument"]["normalizedText"] = NORMALIZED_TEXT_CONTENT
+    detection_jobs = AsyncMock(spec=DetectionJobClient)
+    detection_jobs.jobs_url = "http://fake-detection.com/jobs"
+    detection_jobs.submit = AsyncMock(return_value="job-1")
+    detection_jobs.wait = AsyncMock(return_value=MOCK_DETECTION_RESULTS)
+
+    await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, "", detection_jobs)
+
+    mock_repo.download_gridfs_file.assert_not_awaited()
+    detection_jobs.submit.assert_awaited_once_with(NORMALIZED_TEXT_CONTENT)
+    detection_jobs.wait.assert_awaited_once_with("job-1")
+    mock_repo.update.assert_awaited_once()
+    update_payload: DocumentUpdate = mock_repo.update.await_args.args[1]
+    assert update_payload.conversion_status is None
+    assert update_payload.analysis_result.status == AnalysisStatus.COMPLETED
+
+
+async def test_pipeline_resumed_detection_failure_keeps_conversion(mock_repo: AsyncMock):
+    change_event = deepcopy(BASE_CHANGE_EVENT)
+    change_event["fullDocument"]["conversionStatus"] = ConversionStatus.STATUS_COMPLETED.value
+    change_event["fullDocument"]["normalizedText"] = NORMALIZED_TEXT_CONTENT
+    detection_jobs = AsyncMock(spec=DetectionJobClient)
+    detection_jobs.jobs_url = "http://fake-detection.com/jobs"
+    detection_jobs.submit = AsyncMock(return_value="job-1")
+    detection_jobs.wait = AsyncMock(side_effect=DetectionJobError("Detection job failed: boom"))
+
+    await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, "", detection_jobs)
+
+    update_payload: DocumentUpdate = mock_repo.update.await_args.args[1]
+    assert update_payload.conversion_status is None
+    assert update_payload.analysis_result.status == AnalysisStatus.FAILED
+
+
+async def test_pipeline_streams_gridfs_chunks_to_conversion(mock_repo: AsyncMock):
+    """Testuje przesłanie pliku do Modułu 2 strumieniowo, fragment po fragmencie z GridFS."""
+    change_event = deepcopy(BASE_CHANGE_EVENT)
+    chunks = [b"chunk-1|", b"", b"chunk-2|", b"chunk-3"]
+
+    async def download(*args, **kwargs):
+        async def generator():
+            for chunk in chunks:
+                yield chunk
+        return generator(), {"contentType": "application/pdf", "originalFilename": "test_pipeline.pdf"}
+    mock_repo.download_gridfs_file = AsyncMock(side_effect=download)
+
+    received = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if str(request.url) == TEST_CONVERSION_URL:
+            received["request"] = httpx.Request(request.method, request.url, headers=request.headers, content=await request.aread())
+            return httpx.Response(200, json={"text": NORMALIZED_TEXT_CONTENT, "metadata": MOCK_METADATA_DICT})
+        return httpx.Response(200, json=MOCK_DETECTION_RESULTS)
+
+    http_client.http_context.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, "")
+    finally:
+        await http_client.close_http_client()
+
+    request = received["request"]
+    boundary = request.headers["Content-Type"].split("boundary=")[1]
+    expected = httpx.Request(
+        "POST", TEST_CONVERSION_URL,
+        files={"file": ("test_pipeline.pdf", b"".join(chunks), "application/pdf")},
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    assert request.content == expected.read()
+    assert mock_repo.update.await_args_list[0].args[1].conversion_status == ConversionStatus.STATUS_COMPLETED
+
+
+async def test_pipeline_empty_gridfs_file_marks_conversion_failed(mock_repo: AsyncMock):
+    change_event = deepcopy(BASE_CHANGE_EVENT)
+
+    async def download(*args, **kwargs):
+        async def generator():
+            yield b""
+        return generator(), {"contentType": "application/pdf", "originalFilename": "test_pipeline.pdf"}
+    mock_repo.download_gridfs_file = AsyncMock(side_effect=download)
+
+    with patch('app.main.httpx.AsyncClient') as MockClient:
+        await process_document_pipeline(change_event, mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, TEST_NOTIFICATION_SERVICE_URL)
+
+    MockClient.assert_not_called()
+    update_payload: DocumentUpdate = mock_repo.update.await_args.args[1]
+    assert update_payload.conversion_status == ConversionStatus.STATUS_FAILED
+    assert "empty" in update_payload.conversion_error
+
+
+TEST_CONVERSION_STREAM_URL = "http://fake-conversion.com/file/stream"
+
+
+def ndjson(*records) -> bytes:
+    return b"".join(json.dumps(record).encode() + b"\n" for record in records)
+
+
+async def run_streaming_pipeline(mock_repo: AsyncMock, conversion_handler):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if str(request.url) == TEST_CONVERSION_STREAM_URL:
+            return conversion_handler(request)
+        return httpx.Response(200, json=MOCK_DETECTION_RESULTS)
+
+    http_client.http_context.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        with patch("app.main.settings.CONVERSION_STREAM_URL", TEST_CONVERSION_STREAM_URL):
+            await process_document_pipeline(deepcopy(BASE_CHANGE_EVENT), mock_repo, TEST_CONVERSION_URL, TEST_DETECTION_URL, "")
+    finally:
+        await http_client.close_http_client()
+
+
+async def test_pipeline_reads_conversion_stream(mock_repo: AsyncMock):
+    """Testuje odczyt strumienia NDJSON z Modułu 2 (strony łączone w tekst znormalizowany)."""
+    async def pages():
+        yield ndjson({"type": "page", "page": 1, "text": "First page."})
+        yield ndjson({"type": "page", "page": 2, "text": "Second page."})
+        yield ndjson({"type": "done", "pages": 2, "metadata": MOCK_METADATA_DICT})
+
+    await run_streaming_pipeline(mock_repo, lambda request: httpx.Response(200, content=pages()))
+
+    conversion_update: DocumentUpdate = mock_repo.update.await_args_list[0].args[1]
+    assert conversion_update.conversion_status == ConversionStatus.STATUS_COMPLETED
+    assert conversion_update.normalized_text == "First page. Second page."
+    assert conversion_update.metadata.filename == MOCK_METADATA_DICT["filename"]
+    analysis_update: DocumentUpdate = mock_repo.update.await_args_list[1].args[1]
+    assert analysis_update.analysis_result.status == AnalysisStatus.COMPLETED
+
+
+async def test_pipeline_conversion_stream_error_record(mock_repo: AsyncMock):
+    """Testuje oznaczenie konwersji jako nieudanej, gdy strumień kończy się rekordem błędu."""
+    body = ndjson(
+        {"type": "page", "page": 1, "text": "First page."},
+        {"type": "error", "status": 422, "detail": "CPU time limit exceeded."},
+    )
+
+    await run_streaming_pipeline(mock_repo, lambda request: httpx.Response(200, content=body))
+
+    update_payload: DocumentUpdate = mock_repo.update.await_args.args[1]
+    assert update_payload.conversion_status == ConversionStatus.STATUS_FAILED
+    assert "CPU time limit exceeded" in update_payload.conversion_error
+
+
+async def test_pipeline_conversion_stream_http_error(mock_repo: AsyncMock):
+    await run_streaming_pipeline(mock_repo, lambda request: httpx.Response(400, json={"detail": "File type not allowed"}))
+
+    update_payload: DocumentUpdate = mock_repo.update.await_args.args[1]
+    assert update_payload.conversion_status == ConversionStatus.STATUS_FAILED
+    assert "Error from Conversion(M2) (400)" in update_payload.conversion_error
+    assert "File type not allowed" in update_payload.conversion_error
+
+
+async def test_pipeline_conversion_stream_without_done_record(mock_repo: AsyncMock):
+    await run_streaming_pipeline(
+        mock_repo, lambda request: httpx.Response(200, content=ndjson({"type": "page", "page": 1, "text": "Cut"}))
+    )
+
+    update_payload: DocumentUpdate = mock_repo.update.await_args.args[1]
+    assert update_payload.conversion_status == ConversionStatus.STATUS_FAILED
+    assert "'done'" in update_payload.conversion_error
@@ -0,0 +1,83 @@
+import pytest
+
+import httpx
+
+from app.services.multipart_stream import MultipartFileStream, prepend_chunk
+
+
+pytestmark = pytest.mark.asyncio
+
+
+async def chunk_source(chunks, pulled):
+    for chunk in chunks:
+        pulled.append(chunk)
+        yield chunk
+
+
+async def test_body_matches_httpx_multipart_encoding():
+    """Testuje, że ciało żądania jest identyczne z kodowaniem multipart httpx."""
+    chunks = [b"part-1", b"", b"part-2"]
+    body = MultipartFileStream("file", 'raport "Q1" zażółć.pdf', "application/pdf", chunk_source(chunks, []), boundary="b0und")
+
+    encoded = b"".join([part async for part in body])
+
+    expected = httpx.Request(
+        "POST", "http://fake-conversion.com/file",
+        files={"file": ('raport "Q1" zażółć.pdf', b"part-1part-2", "application/pdf")},
+        headers={"Content-Type": "multipart/form-data; boundary=b0und"},
+    )
+    assert encoded == expected.read()
+    assert body.bytes_sent == 12
+    assert body.headers == {"Content-Type": "multipart/form-data; boundary=b0und"}
+
+
+async def test_filename_control_characters_are_percent_encoded():
+    """Testuje kodowanie znaków sterujących w nazwie pliku (CR/LF nie może wstrzyknąć nagłówka)."""
+    filename = 'x.pdf"\r\nX-Injected: 1\r\n\tback\\slash\x1b.pdf'
+    body = MultipartFileStream("file", filename, "application/pdf", chunk_source([b"data"], []), boundary="b0und")
+
+    encoded = b"".join([part async for part in body])
+
+    expected = httpx.Request(
+        "POST", "http://fake-conversion.com/file",
+        files={"file": (filename, b"data", "application/pdf")},
+        headers={"Content-Type": "multipart/form-data; boundary=b0und"},
+    )
+    assert encoded == expected.read()
+    headers = encoded.split(b"\r\n\r\n", 1)[0]
+    assert b"\r\nX-Injected" not in headers
+    assert b'filename="x.pdf%22%0D%0AX-Injected: 1%0D%0A%09back\\\\slash\x1b.pdf"' in headers
+
+
+async def test_body_pulls_chunks_lazily():
+    """Testuje, że fragmenty pliku są pobierane dopiero przy wysyłaniu (bez buforowania całości)."""
+    pulled = []
+    body = MultipartFileStream("file", "a.txt", "text/plain", chunk_source([b"1", b"2", b"3"], pulled))
+    iterator = body.__aiter__()
+
+    await iterator.__anext__()
+    assert pulled == []
+    assert await iterator.__anext__() == b"1"
+    assert pulled == [b"1"]
+
+
+async def test_prepend_chunk():
+    pulled = []
+    rest = chunk_source([b"b", b"c"], pulled)
+    assert [c async for c in prepend_chunk(b"a", rest)] == [b"a", b"b", b"c"]
+
+
+async def test_body_streams_through_httpx_client():
+    received = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        received["body"] = await request.aread()
+        received["content_type"] = request.headers["Content-Type"]
+        return httpx.Response(200)
+
+    body = MultipartFileStream("file", "a.txt", "text/plain", chunk_source([b"x" * 1000] * 5, []), boundary="b0und")
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        await client.post("http://fake-conversion.com/file", content=body, headers=body.headers)
+
+    assert received["content_type"] == "multipart/form-data; boundary=b0und"
+    assert b"x" * 5000 + b"\r\n--b0und--\r\n" in received["body"]
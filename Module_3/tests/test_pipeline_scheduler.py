@@ -0,0 +1,130 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock
+
+from app.services.pipeline_scheduler import PipelineScheduler
+
+
+pytestmark = pytest.mark.asyncio
+
+
+class ConcurrencyProbe:
+    """Counts concurrently running jobs; each job waits until released."""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.release = asyncio.Event()
+
+    async def job(self):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await self.release.wait()
+        finally:
+            self.running -= 1
+
+
+async def test_scheduler_limits_concurrent_jobs():
+    """Testuje, że równolegle działa co najwyżej tyle zadań, ilu jest workerów."""
+    probe = ConcurrencyProbe()
+    scheduler = PipelineScheduler(workers=3, max_queue_size=10)
+    scheduler.start()
+
+    for _ in range(8):
+        await scheduler.submit(probe.job)
+    await asyncio.sleep(0.01)
+
+    stats = scheduler.stats()
+    assert probe.max_running == 3
+    assert stats["in_flight"] == 3
+    assert stats["queue_depth"] == 5
+
+    probe.release.set()
+    await asyncio.wait_for(scheduler.join(), 1)
+    assert scheduler.stats()["processed"] == 8
+    assert scheduler.stats()["in_flight"] == 0
+    await scheduler.stop()
+
+
+async def test_scheduler_submit_blocks_when_queue_full():
+    """Testuje backpressure: submit czeka, gdy kolejka jest pełna."""
+    probe = ConcurrencyProbe()
+    scheduler = PipelineScheduler(workers=1, max_queue_size=2)
+    scheduler.start()
+
+    await scheduler.submit(probe.job)
+    await asyncio.sleep(0)
+    await scheduler.submit(probe.job)
+    await scheduler.submit(probe.job)
+
+    blocked = asyncio.create_task(scheduler.submit(probe.job))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    assert scheduler.queue_depth == 2
+
+    probe.release.set()
+    await asyncio.wait_for(blocked, 1)
+    await asyncio.wait_for(scheduler.join(), 1)
+    await scheduler.stop()
+
+
+async def test_scheduler_stage_limits():
+    """Testuje limit workerów etapu niezależny od liczby workerów harmonogramu."""
+    probe = ConcurrencyProbe()
+    scheduler = PipelineScheduler(workers=6, max_queue_size=10, stage_workers={"detection": 2})
+    scheduler.start()
+
+    async def job():
+        async with scheduler.stage("detection"):
+            await probe.job()
+
+    for _ in range(6):
+        await scheduler.submit(job)
+    await asyncio.sleep(0.01)
+
+    assert probe.max_running == 2
+    assert scheduler.stats()["stages"]["detection"] == {"workers": 2, "in_flight": 2, "waiting": 4}
+
+    probe.release.set()
+    await asyncio.wait_for(scheduler.join(), 1)
+    assert scheduler.stats()["stages"]["detection"] == {"workers": 2, "in_flight": 0, "waiting": 0}
+    await scheduler.stop()
+
+
+async def test_scheduler_worker_survives_failed_job():
+    """Testuje, że błąd zadania nie zatrzymuje workera."""
+    scheduler = PipelineScheduler(workers=1, max_queue_size=10)
+    scheduler.start()
+    done = AsyncMock()
+
+    await scheduler.submit(AsyncMock(side_effect=RuntimeError("boom")))
+    await scheduler.submit(done)
+    await asyncio.wait_for(scheduler.join(), 1)
+
+    done.assert_awaited_once()
+    assert scheduler.stats()["failed"] == 1
+    assert scheduler.stats()["processed"] == 1
+    await scheduler.stop()
+    assert not scheduler.running
+
+
+async def test_scheduler_stop_drops_queued_jobs():
+    """Testuje, że zatrzymanie harmonogramu anuluje workery i czyści kolejkę."""
+    probe = ConcurrencyProbe()
+    scheduler = PipelineScheduler(workers=1, max_queue_size=10)
+    scheduler.start()
+    for _ in range(3):
+        await scheduler.submit(probe.job)
+    await asyncio.sleep(0.01)
+
+    await scheduler.stop()
+    assert scheduler.queue_depth == 0
+    assert not scheduler.running
+
+
+async def test_scheduler_requires_workers():
+    with pytest.raises(ValueError):
+        PipelineScheduler(workers=0)
+    with pytest.raises(ValueError):
+        PipelineScheduler(stage_workers={"conversion": 0})
@@ -0,0 +1,84 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.db.repositories.blobs import BlobRepository
+from app.core.exceptions import DatabaseException
+
+pytestmark = pytest.mark.asyncio
+
+CONTENT_HASH = "sha256:abc"
+
+
+@pytest.fixture
+def blobs_collection() -> MagicMock:
+    collection = MagicMock()
+    collection.find_one_and_update = AsyncMock()
+    collection.delete_one = AsyncMock(return_value=MagicMock(deleted_count=1))
+    collection.create_index = AsyncMock()
+    return collection
+
+
+@pytest.fixture
+def blob_repository(blobs_collection: MagicMock) -> BlobRepository:
+    db = MagicMock()
+    db.blobs = blobs_collection
+    return BlobRepository(db)
+
+
+async def test_create_indexes_unique_hash(blob_repository: BlobRepository, blobs_collection: MagicMock):
+    await blob_repository.create_indexes()
+    blobs_collection.create_index.assert_awaited_once_with("contentHash", name="contentHash_unique", unique=True)
+
+
+async def test_acquire_upserts_and_counts_reference(blob_repository: BlobRepository, blobs_collection: MagicMock):
+    gridfs_id = ObjectId()
+    blob = {"_id": ObjectId(), "contentHash": CONTENT_HASH, "gridfsId": gridfs_id, "refCount": 1}
+    blobs_collection.find_one_and_update.return_value = blob
+
+    assert await blob_repository.acquire(CONTENT_HASH, gridfs_id, 10) == blob
+
+    query, update = blobs_collection.find_one_and_update.await_args.args
+    assert query == {"contentHash": CONTENT_HASH}
+    assert update["$inc"] == {"refCount": 1}
+    assert update["$setOnInsert"]["gridfsId"] == gridfs_id
+    assert blobs_collection.find_one_and_update.await_args.kwargs["upsert"] is True
+
+
+async def test_acquire_retries_concurrent_insert(blob_repository: BlobRepository, blobs_collection: MagicMock):
+    """Testuje ponowienie, gdy równoległy upload utworzył blob o tym samym skrócie."""
+    blob = {"_id": ObjectId(), "gridfsId": ObjectId(), "refCount": 2}
+    blobs_collection.find_one_and_update.side_effect = [DuplicateKeyError("dup"), blob]
+
+    assert await blob_repository.acquire(CONTENT_HASH, ObjectId(), 10) == blob
+    assert blobs_collection.find_one_and_update.await_count == 2
+
+
+async def test_acquire_raises_on_repeated_conflict(blob_repository: BlobRepository, blobs_collection: MagicMock):
+    blobs_collection.find_one_and_update.side_effect = DuplicateKeyError("dup")
+    with pytest.raises(DatabaseException):
+        await blob_repository.acquire(CONTENT_HASH, ObjectId(), 10)
+
+
+async def test_release_keeps_referenced_blob(blob_repository: BlobRepository, blobs_collection: MagicMock):
+    blobs_collection.find_one_and_update.return_value = {"_id": ObjectId(), "gridfsId": ObjectId(), "refCount": 1}
+
+    assert await blob_repository.release(ObjectId()) is None
+    blobs_collection.delete_one.assert_not_awaited()
+
+
+async def test_release_last_reference_returns_file(blob_repository: BlobRepository, blobs_collection: MagicMock):
+    blob_id, gridfs_id = ObjectId(), ObjectId()
+    blobs_collection.find_one_and_update.return_value = {"_id": blob_id, "gridfsId": gridfs_id, "refCount": 0}
+
+    assert await blob_repository.release(blob_id) == gridfs_id
+    blobs_collection.delete_one.assert_awaited_once_with({"_id": blob_id, "refCount": {"$lte": 0}})
+
+
+async def test_release_reacquired_blob_is_kept(blob_repository: BlobRepository, blobs_collection: MagicMock):
+    """Testuje, że blob, do którego w międzyczasie dodano odwołanie, nie jest usuwany."""
+    blobs_collection.find_one_and_update.return_value = {"_id": ObjectId(), "gridfsId": ObjectId(), "refCount": 0}
+    blobs_collection.delete_one.return_value = MagicMock(deleted_count=0)
+
+    assert await blob_repository.release(ObjectId()) is None
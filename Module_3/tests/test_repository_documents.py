@@ -3,12 +3,13 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock
 from bson import ObjectId
 from datetime import datetime, timedelta, timezone
-import io
+import hashlib
 from gridfs.errors import NoFile as GridFSFileNotFound
+from pymongo.errors import OperationFailure
 
-from app.db.repositories.documents import DocumentRepository
-from app.models.documents import DocumentCreate, DocumentInDB
-from app.core.exceptions import DatabaseException, FileNotFoundInGridFSException
+from app.db.repositories.documents import DocumentRepository, ESTIMATED_COUNT_LIMIT, LIST_SUMMARY_PROJECTION, UNFINISHED_PROCESSING_FILTER
+from app.models.documents import DocumentCreate, DocumentInDB, DocumentSummary, ListCountMode
+from app.core.exceptions import DatabaseException, FileNotFoundInGridFSException, ValidationException
 
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection, AsyncIOMotorGridFSBucket, AsyncIOMotorGridOut, AsyncIOMotorCursor
 
@@ -40,10 +41,6 @@ def document_repository(mock_db: AsyncMock, mock_collection: AsyncMock, mock_fs:
     mock_db.__getitem__.return_value = mock_collection
     return DocumentRepository(database=mock_db, file_system=mock_fs)
 
-async def mock_upload_from_stream(*args, **kwargs):
-    await asyncio.sleep(0)
-    return FAKE_OBJECT_ID
-
 async def mock_insert_one(*args, **kwargs):
     await asyncio.sleep(0)
     mock_result = MagicMock()
@@ -70,61 +67,6 @@ async def mock_fs_delete(*args, **kwargs):
 
 
 
-async def test_create_repo_success(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
-
-    doc_create = DocumentCreate(originalFilename="repo_create.txt", originalFormat="txt", uploaderEmail=TEST_EMAIL)
-    file_size = 150; file_content = b"repo content" * 10; file_name_for_gridfs = "repo_create.txt"
-    mock_fs.upload_from_stream.side_effect = mock_upload_from_stream
-    mock_collection.insert_one.side_effect = mock_insert_one
- 
-    result_id_str = await document_repository.create(doc_create, file_content, file_name_for_gridfs)
- 
-    assert result_id_str == FAKE_OBJECT_ID_STR
-    mock_fs.upload_from_stream.assert_called_once()
-    fs_call_kwargs = mock_fs.upload_from_stream.call_args.kwargs
-    assert fs_call_kwargs['filename'] == file_name_for_gridfs
-    assert isinstance(fs_call_kwargs['source'], io.BytesIO)
-    assert fs_call_kwargs['metadata']['originalFilename'] == doc_create.original_filename
-    mock_collection.insert_one.assert_called_once()
-    inserted_data = mock_collection.insert_one.call_args[0][0]
-    assert inserted_data['originalFilename'] == doc_create.original_filename
-
-    assert inserted_data['originalDocumentPath'] == f"gridfs:{FAKE_OBJECT_ID_STR}"
-    assert "contentHash" in inserted_data
-
-
-async def test_create_repo_gridfs_failure(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
-
-    doc_create = DocumentCreate(originalFilename="fail.txt", originalFormat="txt", uploaderEmail=TEST_EMAIL)
-    # Symuluj błąd w coroutine
-    async def gridfs_boom(*args, **kwargs): raise Exception("GridFS Boom!")
-    mock_fs.upload_from_stream.side_effect = gridfs_boom
-
-    with pytest.raises(DatabaseException, match="Failed to create document with GridFS: GridFS Boom!"):
-        await document_repository.create(doc_create, b"fail", "fail.txt")
-
-    mock_collection.insert_one.assert_not_called()
-    mock_fs.delete.assert_not_called()
-
-
-async def test_create_repo_insert_failure(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
-
-    doc_create = DocumentCreate(originalFilename="insert_fail.txt", originalFormat="txt", uploaderEmail=TEST_EMAIL)
-
-    mock_fs.upload_from_stream.side_effect = mock_upload_from_stream
-    # Symuluj błąd w coroutine insert_one
-    async def insert_boom(*args, **kwargs): raise Exception("Mongo Insert Boom!")
-    mock_collection.insert_one.side_effect = insert_boom
-
-    mock_fs.delete.side_effect = mock_fs_delete
-
-    with pytest.raises(DatabaseException, match="Failed to create document with GridFS: Mongo Insert Boom!"):
-        await document_repository.create(doc_create, b"insert fail", "insert_fail.txt")
-
-    mock_fs.upload_from_stream.assert_called_once()
-    mock_fs.delete.assert_called_once_with(FAKE_OBJECT_ID)
-
-
 async def test_get_by_id_repo_success(document_repository: DocumentRepository, mock_collection: AsyncMock):
 
     db_data = {
@@ -182,7 +124,7 @@ async def test_delete_repo_success(document_repository: DocumentRepository, mock
 
     mock_collection.find_one.assert_called_once_with(
         {"_id": FAKE_OBJECT_ID},
-        {"originalDocumentPath": 1}
+        {"originalDocumentPath": 1, "blobId": 1}
     )
     mock_collection.delete_one.assert_called_once_with({"_id": FAKE_OBJECT_ID})
     
@@ -217,18 +159,20 @@ async def test_get_list_repo_success(document_repository: DocumentRepository, mo
     expected_skip = (page - 1) * limit
 
     mock_collection.count_documents.assert_called_once_with(expected_filter)
-    mock_collection.find.assert_called_once_with(expected_filter)
-    mock_cursor.sort.assert_called_once_with("uploadTimestamp", -1)
+    mock_collection.find.assert_called_once_with(expected_filter, LIST_SUMMARY_PROJECTION)
+    mock_cursor.sort.assert_called_once_with([("uploadTimestamp", -1), ("_id", -1)])
     mock_cursor.skip.assert_called_once_with(expected_skip)
-    mock_cursor.limit.assert_called_once_with(limit)
+    mock_cursor.limit.assert_called_once_with(limit + 1)
 
     assert result_dict["total"] == 12
+    assert result_dict["total_estimated"] is False
     assert result_dict["page"] == page
+    assert result_dict["next_cursor"] is None
     assert result_dict["limit"] == limit
     assert len(result_dict["documents"]) == 2
 
-    assert isinstance(result_dict["documents"][0], DocumentInDB)
-    assert isinstance(result_dict["documents"][1], DocumentInDB)
+    assert isinstance(result_dict["documents"][0], DocumentSummary)
+    assert isinstance(result_dict["documents"][1], DocumentSummary)
     assert result_dict["documents"][0].id == FAKE_OBJECT_ID
     assert result_dict["documents"][1].id == FAKE_OBJECT_ID_2
     assert result_dict["documents"][0].original_format == "pdf"
@@ -253,14 +197,136 @@ async def test_get_list_repo_no_results(document_repository: DocumentRepository,
     result_dict = await document_repository.get_list(page=page, limit=limit)
 
     mock_collection.count_documents.assert_called_once_with({})
-    mock_collection.find.assert_called_once_with({})
+    mock_collection.find.assert_called_once_with({}, LIST_SUMMARY_PROJECTION)
     mock_cursor.skip.assert_called_once_with(0)
-    mock_cursor.limit.assert_called_once_with(limit)
+    mock_cursor.limit.assert_called_once_with(limit + 1)
 
     assert result_dict["total"] == 0
     assert result_dict["documents"] == []
 
 
+def list_mock_cursor(mock_collection: AsyncMock, documents) -> AsyncMock:
+    mock_cursor = AsyncMock(spec=AsyncIOMotorCursor)
+    mock_cursor.__aiter__.return_value = documents
+    mock_cursor.sort.return_value = mock_cursor
+    mock_cursor.skip.return_value = mock_cursor
+    mock_cursor.limit.return_value = mock_cursor
+    mock_collection.find.return_value = mock_cursor
+    return mock_cursor
+
+
+def listed_doc(doc_id: ObjectId, uploaded: datetime) -> dict:
+    return {"_id": doc_id, "originalFilename": "doc.pdf", "originalFormat": "pdf", "uploaderEmail": TEST_EMAIL, "uploadTimestamp": uploaded}
+
+
+async def test_get_list_repo_returns_next_cursor(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    """Testuje, że przy kolejnej stronie zwracany jest kursor ostatniego dokumentu strony."""
+    docs = [listed_doc(ObjectId(), NOW.replace(microsecond=0) - timedelta(minutes=i)) for i in range(3)]
+    list_mock_cursor(mock_collection, docs)
+    mock_collection.count_documents = AsyncMock(return_value=30)
+
+    result_dict = await document_repository.get_list(limit=2)
+
+    assert [d.id for d in result_dict["documents"]] == [docs[0]["_id"], docs[1]["_id"]]
+    after = DocumentRepository.decode_list_cursor(result_dict["next_cursor"])
+    assert after["$or"][1]["_id"] == {"$lt": docs[1]["_id"]}
+    assert after["$or"][0]["uploadTimestamp"] == {"$lt": docs[1]["uploadTimestamp"]}
+
+
+async def test_get_list_repo_with_cursor(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    """Testuje stronicowanie kursorem: warunek (uploadTimestamp, _id) zamiast skip i brak liczenia."""
+    last = listed_doc(FAKE_OBJECT_ID, NOW.replace(microsecond=0))
+    mock_cursor = list_mock_cursor(mock_collection, [])
+    mock_collection.count_documents = AsyncMock()
+    cursor = DocumentRepository.encode_list_cursor(last)
+
+    result_dict = await document_repository.get_list(limit=10, original_format="pdf", cursor=cursor, count=ListCountMode.NONE)
+
+    expected_filter = {"$and": [
+        {"originalFormat": "pdf"},
+        {"$or": [
+            {"uploadTimestamp": {"$lt": last["uploadTimestamp"]}},
+            {"uploadTimestamp": last["uploadTimestamp"], "_id": {"$lt": FAKE_OBJECT_ID}},
+        ]},
+    ]}
+    mock_collection.find.assert_called_once_with(expected_filter, LIST_SUMMARY_PROJECTION)
+    mock_cursor.skip.assert_called_once_with(0)
+    mock_collection.count_documents.assert_not_called()
+    assert result_dict["total"] is None
+    assert result_dict["page"] is None
+    assert result_dict["next_cursor"] is None
+
+
+async def test_get_list_repo_invalid_cursor(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    list_mock_cursor(mock_collection, [])
+    mock_collection.count_documents = AsyncMock(return_value=0)
+
+    with pytest.raises(ValidationException):
+        await document_repository.get_list(cursor="not-a-cursor")
+
+
+async def test_get_list_repo_estimated_count(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    """Testuje szacowaną liczbę dokumentów: metadane kolekcji bez filtrów, ograniczone liczenie z filtrami."""
+    list_mock_cursor(mock_collection, [])
+    mock_collection.estimated_document_count = AsyncMock(return_value=1_000_000)
+    mock_collection.count_documents = AsyncMock(return_value=ESTIMATED_COUNT_LIMIT)
+
+    result_dict = await document_repository.get_list(count=ListCountMode.ESTIMATE)
+    assert (result_dict["total"], result_dict["total_estimated"]) == (1_000_000, True)
+
+    result_dict = await document_repository.get_list(conversion_status="pending", count=ListCountMode.ESTIMATE)
+    mock_collection.count_documents.assert_awaited_once_with({"conversionStatus": "pending"}, limit=ESTIMATED_COUNT_LIMIT)
+    assert (result_dict["total"], result_dict["total_estimated"]) == (ESTIMATED_COUNT_LIMIT, True)
+
+
+async def test_get_list_repo_with_fields(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    """Testuje dołączenie dużych pól do projekcji listy parametrem fields."""
+    doc = {**listed_doc(FAKE_OBJECT_ID, NOW), "normalizedText": "tekst", "analysisResult": {"status": "completed", "detectedItems": [{"type": "PESEL"}]}}
+    list_mock_cursor(mock_collection, [doc])
+    mock_collection.count_documents = AsyncMock(return_value=1)
+
+    result_dict = await document_repository.get_list(fields=["normalizedText", "analysisResult.detectedItems"])
+
+    projection = mock_collection.find.call_args.args[1]
+    assert projection["normalizedText"] == 1
+    assert projection["analysisResult.detectedItems"] == 1
+    summary = result_dict["documents"][0]
+    assert summary.normalized_text == "tekst"
+    assert summary.analysis_result.detected_items == [{"type": "PESEL"}]
+
+
+async def test_build_list_projection_excludes_large_fields():
+    projection = DocumentRepository.build_list_projection()
+
+    assert "normalizedText" not in projection
+    assert "analysisResult.detectedItems" not in projection
+    assert "detectedItemsCount" in projection
+    with pytest.raises(ValidationException):
+        DocumentRepository.build_list_projection(["analysisResult"])
+
+
+async def test_search_repo(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    """Testuje wyszukiwanie pełnotekstowe: filtr $text, projekcja z wynikiem trafności i sortowanie po nim."""
+    docs = [{**listed_doc(ObjectId(), NOW), "score": 3.5 - i} for i in range(3)]
+    mock_cursor = list_mock_cursor(mock_collection, docs)
+    mock_collection.count_documents = AsyncMock(return_value=3)
+
+    result_dict = await document_repository.search("85010212345", limit=2, conversion_status="completed")
+
+    filter_dict, projection = mock_collection.find.call_args.args
+    assert filter_dict == {"conversionStatus": "completed", "$text": {"$search": "85010212345"}}
+    assert projection["score"] == {"$meta": "textScore"}
+    assert "normalizedText" not in projection
+    mock_cursor.sort.assert_called_once_with([("score", {"$meta": "textScore"}), ("_id", -1)])
+    mock_cursor.skip.assert_called_once_with(0)
+    mock_cursor.limit.assert_called_once_with(3)
+    mock_collection.count_documents.assert_awaited_once_with(filter_dict, limit=ESTIMATED_COUNT_LIMIT)
+
+    assert [hit.score for hit in result_dict["documents"]] == [3.5, 2.5]
+    assert result_dict["next_page"] == 2
+    assert result_dict["total"] == 3
+
+
 async def test_download_gridfs_file_repo_success(document_repository: DocumentRepository, mock_fs: AsyncMock):
     """Testuje pomyślne pobranie pliku z GridFS."""
 
@@ -327,4 +393,302 @@ async def test_download_gridfs_file_repo_other_error(document_repository: Docume
     with pytest.raises(DatabaseException, match=f"Failed to download GridFS file {gridfs_file_id}: Some download error"):
         await document_repository.download_gridfs_file(gridfs_file_id)
 
-    mock_fs.open_download_stream.assert_called_once_with(gridfs_file_id)
\ No newline at end of file
+    mock_fs.open_download_stream.assert_called_once_with(gridfs_file_id)
+
+async def test_create_indexes_repo(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    mock_collection.index_information = AsyncMock(return_value={"_id_": {}})
+    mock_collection.drop_index = AsyncMock()
+    mock_collection.create_indexes = AsyncMock(return_value=[])
+    await document_repository.create_indexes()
+
+    # Każdy indeks tworzony osobnym wywołaniem
+    assert all(len(call.args[0]) == 1 for call in mock_collection.create_indexes.await_args_list)
+    mock_collection.drop_index.assert_not_awaited()
+    indexes = {
+        call.args[0][0].document["name"]: list(call.args[0][0].document["key"].items())
+        for call in mock_collection.create_indexes.await_args_list
+    }
+    assert indexes["uploadTimestamp_id"] == [("uploadTimestamp", -1), ("_id", -1)]
+    assert indexes["conversionStatus_uploadTimestamp_id"] == [("conversionStatus", 1), ("uploadTimestamp", -1), ("_id", -1)]
+    assert indexes["originalFormat_uploadTimestamp_id"] == [("originalFormat", 1), ("uploadTimestamp", -1), ("_id", -1)]
+    assert indexes["conversionStatus_originalFormat_uploadTimestamp_id"] == [
+        ("conversionStatus", 1), ("originalFormat", 1), ("uploadTimestamp", -1), ("_id", -1)
+    ]
+    assert indexes["conversionStatus_leaseExpiresAt"] == [("conversionStatus", 1), ("leaseExpiresAt", 1)]
+    assert indexes["contentHash"] == [("contentHash", 1)]
+    assert set(indexes["documents_text"]) == {
+        ("analysisResult.detectedItems.value", "text"), ("analysisResult.detectedItems.label", "text"),
+        ("originalFilename", "text"), ("normalizedText", "text"),
+    }
+
+
+async def test_create_indexes_repo_conflict_does_not_block_others(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    """Testuje, że konflikt jednego indeksu nie blokuje pozostałych, a zastąpiony indeks jest usuwany."""
+    mock_collection.index_information = AsyncMock(return_value={"_id_": {}, "conversionStatus_uploadTimestamp": {}})
+    mock_collection.drop_index = AsyncMock()
+
+    async def create_indexes(indexes):
+        if indexes[0].document["name"] == "documents_text":
+            raise OperationFailure("An equivalent index already exists with a different name")
+        return [indexes[0].document["name"]]
+
+    mock_collection.create_indexes = AsyncMock(side_effect=create_indexes)
+
+    with pytest.raises(DatabaseException, match="documents_text"):
+        await document_repository.create_indexes()
+
+    mock_collection.drop_index.assert_awaited_once_with("conversionStatus_uploadTimestamp")
+    created = [call.args[0][0].document["name"] for call in mock_collection.create_indexes.await_args_list]
+    assert "contentHash" in created and "conversionStatus_uploadTimestamp_id" in created
+    assert len(created) == 7
+
+async def test_build_list_filter_repo():
+    date_from = NOW - timedelta(days=1)
+    assert DocumentRepository.build_list_filter() == {}
+    assert DocumentRepository.build_list_filter("completed", "pdf", date_from, NOW, "raport") == {
+        "conversionStatus": "completed",
+        "originalFormat": "pdf",
+        "uploadTimestamp": {"$gte": date_from, "$lte": NOW},
+        "$or": [{"originalFilename": {"$regex": "raport", "$options": "i"}}],
+    }
+    with pytest.raises(ValidationException):
+        DocumentRepository.build_list_filter("unknown")
+
+
+async def test_find_pending_repo_does_not_force_index(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    mock_cursor = MagicMock()
+    mock_cursor.sort.return_value = mock_cursor
+    mock_collection.find = MagicMock(return_value=mock_cursor)
+
+    assert document_repository.find_pending() is mock_cursor
+    mock_collection.find.assert_called_once_with(UNFINISHED_PROCESSING_FILTER)
+    mock_cursor.sort.assert_called_once_with("uploadTimestamp", 1)
+    # Bez hint() - brak indeksu nie może zatrzymać backfillu
+    mock_cursor.hint.assert_not_called()
+
+
+async def test_claim_repo_success(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    claimed = {"_id": FAKE_OBJECT_ID, "conversionStatus": "pending", "processingOwner": "replica-a"}
+    mock_collection.find_one_and_update = AsyncMock(return_value=claimed)
+
+    result = await document_repository.claim(FAKE_OBJECT_ID_STR, "replica-a", 60)
+
+    assert result == claimed
+    query, update = mock_collection.find_one_and_update.await_args.args
+    assert query["_id"] == FAKE_OBJECT_ID
+    processing_filter, lease_filter = query["$and"]
+    # Oczekujące na konwersję albo z niedokończoną analizą (awaria w trakcie detekcji)
+    assert {"conversionStatus": "pending"} in processing_filter["$or"]
+    assert {
+        "conversionStatus": "completed",
+        "analysisResult.status": {"$in": [None, "pending", "not_started"]},
+    } in processing_filter["$or"]
+    assert {"leaseExpiresAt": None} in lease_filter["$or"]
+    assert update["$set"]["processingOwner"] == "replica-a"
+    assert update["$set"]["leaseExpiresAt"] > NOW
+
+
+async def test_find_expired_leases_repo_includes_unfinished_analysis(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    mock_collection.find = MagicMock(return_value="cursor")
+
+    assert document_repository.find_expired_leases() == "cursor"
+    query = mock_collection.find.call_args.args[0]
+    assert {"conversionStatus": "pending"} in query["$or"]
+    assert any(branch.get("conversionStatus") == "completed" for branch in query["$or"])
+    assert query["leaseExpiresAt"]["$lt"] > NOW - timedelta(minutes=1)
+
+
+async def test_claim_repo_held_by_other_owner(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    mock_collection.find_one_and_update = AsyncMock(return_value=None)
+    assert await document_repository.claim(FAKE_OBJECT_ID_STR, "replica-b", 60) is None
+    assert await document_repository.claim("invalid-id", "replica-b", 60) is None
+    mock_collection.find_one_and_update.assert_awaited_once()
+
+
+async def test_renew_and_release_lease_repo(document_repository: DocumentRepository, mock_collection: AsyncMock):
+    mock_collection.update_one = AsyncMock(return_value=MagicMock(matched_count=1))
+    assert await document_repository.renew_lease(FAKE_OBJECT_ID_STR, "replica-a", 60) is True
+
+    await document_repository.release_lease(FAKE_OBJECT_ID_STR, "replica-a")
+    query, update = mock_collection.update_one.await_args.args
+    assert query == {"_id": FAKE_OBJECT_ID, "processingOwner": "replica-a"}
+    assert update == {"$unset": {"processingOwner": "", "leaseExpiresAt": ""}}
+
+    mock_collection.update_one = AsyncMock(return_value=MagicMock(matched_count=0))
+    assert await document_repository.renew_lease(FAKE_OBJECT_ID_STR, "replica-a", 60) is False
+
+
+def make_grid_in(mock_collection=None, mock_fs=None):
+    grid_in = MagicMock()
+    grid_in.write = AsyncMock()
+    grid_in.close = AsyncMock()
+    grid_in.abort = AsyncMock()
+    grid_in._id = FAKE_OBJECT_ID_2
+    if mock_collection is not None:
+        mock_collection.insert_one = AsyncMock(side_effect=mock_insert_one)
+    if mock_fs is not None:
+        mock_fs.open_upload_stream = MagicMock(return_value=grid_in)
+        mock_fs.delete = AsyncMock(return_value=None)
+    return grid_in
+
+
+async def stream_chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def test_create_from_stream_repo_success(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
+    """Testuje zapis pliku do GridFS fragmentami z przyrostowym liczeniem SHA-256."""
+    grid_in = make_grid_in(mock_collection, mock_fs)
+    doc_create = DocumentCreate(originalFilename="stream.pdf", originalFormat="pdf", uploaderEmail=TEST_EMAIL)
+
+    result_id = await document_repository.create_from_stream(doc_create, stream_chunks(b"part-1", b"", b"part-2"), "stream.pdf")
+
+    assert result_id == FAKE_OBJECT_ID_STR
+    assert [c.args[0] for c in grid_in.write.await_args_list] == [b"part-1", b"part-2"]
+    grid_in.close.assert_awaited_once()
+    assert mock_fs.open_upload_stream.call_args.kwargs["metadata"]["contentType"] == "application/pdf"
+
+    inserted = mock_collection.insert_one.call_args[0][0]
+    assert inserted["contentHash"] == f"sha256:{hashlib.sha256(b'part-1part-2').hexdigest()}"
+    assert inserted["originalDocumentPath"] == f"gridfs:{FAKE_OBJECT_ID_2_STR}"
+    assert inserted["conversionStatus"] == "pending"
+
+
+async def test_create_from_stream_repo_empty_file(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
+    grid_in = make_grid_in(mock_collection, mock_fs)
+    doc_create = DocumentCreate(originalFilename="empty.txt", originalFormat="txt", uploaderEmail=TEST_EMAIL)
+
+    with pytest.raises(ValidationException):
+        await document_repository.create_from_stream(doc_create, stream_chunks(b""), "empty.txt")
+
+    grid_in.abort.assert_awaited_once()
+    grid_in.close.assert_not_awaited()
+    mock_collection.insert_one.assert_not_awaited()
+
+
+async def test_create_from_stream_repo_insert_fails(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
+    """Testuje usunięcie pliku z GridFS, gdy zapis metadanych się nie powiedzie."""
+    grid_in = make_grid_in(mock_collection, mock_fs)
+    mock_collection.insert_one.side_effect = Exception("insert failed")
+    doc_create = DocumentCreate(originalFilename="a.txt", originalFormat="txt", uploaderEmail=TEST_EMAIL)
+
+    with pytest.raises(DatabaseException):
+        await document_repository.create_from_stream(doc_create, stream_chunks(b"data"), "a.txt")
+
+    mock_fs.delete.assert_awaited_once_with(FAKE_OBJECT_ID_2)
+
+
+async def test_create_from_stream_repo_stream_error_aborts_upload(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
+    grid_in = make_grid_in(mock_collection, mock_fs)
+    doc_create = DocumentCreate(originalFilename="a.txt", originalFormat="txt", uploaderEmail=TEST_EMAIL)
+
+    async def broken_stream():
+        yield b"data"
+        raise IOError("client disconnected")
+
+    with pytest.raises(DatabaseException):
+        await document_repository.create_from_stream(doc_create, broken_stream(), "a.txt")
+
+    grid_in.abort.assert_awaited_once()
+    mock_fs.delete.assert_not_awaited()
+
+
+def make_dedup_db(document_repository: DocumentRepository, blob: dict):
+    blobs = MagicMock()
+    blobs.find_one_and_update = AsyncMock(return_value=blob)
+    blobs.delete_one = AsyncMock(return_value=MagicMock(deleted_count=1))
+    document_repository.db.blobs = blobs
+    return blobs
+
+
+async def test_create_from_stream_repo_dedup_new_content(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
+    """Testuje rejestrację nowej treści w kolekcji blobs."""
+    grid_in = make_grid_in(mock_collection, mock_fs)
+    blob_id = ObjectId()
+    blobs = make_dedup_db(document_repository, {"_id": blob_id, "gridfsId": FAKE_OBJECT_ID_2, "refCount": 1})
+    doc_create = DocumentCreate(originalFilename="a.txt", originalFormat="txt", uploaderEmail=TEST_EMAIL)
+
+    await document_repository.create_from_stream(doc_create, stream_chunks(b"data"), "a.txt", deduplicate=True)
+
+    query, update = blobs.find_one_and_update.await_args.args
+    assert query == {"contentHash": f"sha256:{hashlib.sha256(b'data').hexdigest()}"}
+    assert update["$inc"] == {"refCount": 1}
+    assert update["$setOnInsert"]["gridfsId"] == FAKE_OBJECT_ID_2
+    inserted = mock_collection.insert_one.call_args[0][0]
+    assert inserted["blobId"] == blob_id
+    assert inserted["originalDocumentPath"] == f"gridfs:{FAKE_OBJECT_ID_2_STR}"
+    assert inserted["conversionStatus"] == "pending"
+    mock_fs.delete.assert_not_awaited()
+
+
+async def test_create_from_stream_repo_dedup_reuses_existing(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
+    """Testuje ponowne użycie zapisanego pliku i wyników analizy dla identycznej treści."""
+    make_grid_in(mock_collection, mock_fs)
+    existing_gridfs_id, source_id = ObjectId(), ObjectId()
+    make_dedup_db(document_repository, {"_id": ObjectId(), "gridfsId": existing_gridfs_id, "refCount": 2})
+    analysis = {"status": "completed", "detectedItems": [{"type": "EMAIL", "value": "a@b.pl"}]}
+    mock_collection.find_one = AsyncMock(return_value={
+        "_id": source_id, "normalizedText": "text", "metadata": {"filename": "a.txt", "size": 4},
+        "conversionTimestamp": NOW, "analysisResult": analysis,
+    })
+    doc_create = DocumentCreate(originalFilename="copy.txt", originalFormat="txt", uploaderEmail=TEST_EMAIL)
+
+    await document_repository.create_from_stream(doc_create, stream_chunks(b"data"), "copy.txt", deduplicate=True)
+
+    mock_fs.delete.assert_awaited_once_with(FAKE_OBJECT_ID_2)
+    inserted = mock_collection.insert_one.call_args[0][0]
+    assert inserted["originalDocumentPath"] == f"gridfs:{existing_gridfs_id}"
+    assert inserted["originalFilename"] == "copy.txt"
+    assert inserted["conversionStatus"] == "completed"
+    assert inserted["normalizedText"] == "text"
+    assert inserted["analysisResult"] == analysis
+    assert inserted["deduplicatedFrom"] == source_id
+
+
+async def test_create_from_stream_repo_dedup_insert_fails_releases_blob(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
+    """Testuje, że przy błędzie współdzielony plik nie jest usuwany, a odwołanie jest zwalniane."""
+    make_grid_in(mock_collection, mock_fs)
+    mock_collection.insert_one.side_effect = Exception("insert failed")
+    mock_collection.find_one = AsyncMock(return_value=None)
+    blob_id, existing_gridfs_id = ObjectId(), ObjectId()
+    blobs = make_dedup_db(document_repository, {"_id": blob_id, "gridfsId": existing_gridfs_id, "refCount": 2})
+    doc_create = DocumentCreate(originalFilename="a.txt", originalFormat="txt", uploaderEmail=TEST_EMAIL)
+
+    blobs.find_one_and_update.side_effect = [
+        {"_id": blob_id, "gridfsId": existing_gridfs_id, "refCount": 2},
+        {"_id": blob_id, "gridfsId": existing_gridfs_id, "refCount": 1},
+    ]
+    with pytest.raises(DatabaseException):
+        await document_repository.create_from_stream(doc_create, stream_chunks(b"data"), "a.txt", deduplicate=True)
+
+    assert blobs.find_one_and_update.await_args.args[1] == {"$inc": {"refCount": -1}}
+    mock_fs.delete.assert_awaited_once_with(FAKE_OBJECT_ID_2)
+
+
+async def test_delete_repo_dedup_keeps_shared_file(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
+    """Testuje, że usunięcie dokumentu zmniejsza licznik odwołań i nie usuwa współdzielonego pliku."""
+    blob_id, gridfs_id = ObjectId(), ObjectId()
+    mock_collection.find_one = AsyncMock(return_value={"_id": FAKE_OBJECT_ID, "originalDocumentPath": f"gridfs:{gridfs_id}", "blobId": blob_id})
+    mock_collection.delete_one = AsyncMock(return_value=MagicMock(deleted_count=1))
+    mock_fs.delete = AsyncMock()
+    blobs = make_dedup_db(document_repository, {"_id": blob_id, "gridfsId": gridfs_id, "refCount": 1})
+
+    assert await document_repository.delete(FAKE_OBJECT_ID_STR) is True
+
+    blobs.find_one_and_update.assert_awaited_once()
+    blobs.delete_one.assert_not_awaited()
+    mock_fs.delete.assert_not_awaited()
+
+
+async def test_delete_repo_dedup_last_reference_deletes_file(document_repository: DocumentRepository, mock_collection: AsyncMock, mock_fs: AsyncMock):
+    blob_id, gridfs_id = ObjectId(), ObjectId()
+    mock_collection.find_one = AsyncMock(return_value={"_id": FAKE_OBJECT_ID, "originalDocumentPath": f"gridfs:{gridfs_id}", "blobId": blob_id})
+    mock_collection.delete_one = AsyncMock(return_value=MagicMock(deleted_count=1))
+    mock_fs.delete = AsyncMock()
+    blobs = make_dedup_db(document_repository, {"_id": blob_id, "gridfsId": gridfs_id, "refCount": 0})
+
+    assert await document_repository.delete(FAKE_OBJECT_ID_STR) is True
+
+    blobs.delete_one.assert_awaited_once_with({"_id": blob_id, "refCount": {"$lte": 0}})
+    mock_fs.delete.assert_awaited_once_with(gridfs_id)
@@ -0,0 +1,157 @@
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.db.repositories.documents import DocumentRepository
+from app.models.documents import ListCountMode
+
+# Benchmark wyszukiwania pełnotekstowego na prawdziwym MongoDB. Uruchamiany tylko, gdy ustawiono
+# MONGODB_BENCHMARK_URL, np.:
+#   MONGODB_BENCHMARK_URL=mongodb://localhost:27017 SEARCH_BENCHMARK_DOCUMENTS=200000 pytest -s tests/test_search_benchmark.py
+# Dane są zapisywane do osobnej bazy, usuwanej po teście.
+
+BENCHMARK_URL = os.getenv("MONGODB_BENCHMARK_URL")
+BENCHMARK_DOCUMENTS = int(os.getenv("SEARCH_BENCHMARK_DOCUMENTS", "200000"))
+BENCHMARK_DATABASE = "tioch_search_benchmark"
+BATCH_SIZE = 5000
+WORDS_PER_DOCUMENT = 300
+REPEATS = 20
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.skipif(not BENCHMARK_URL, reason="MONGODB_BENCHMARK_URL not set"),
+]
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+VOCABULARY = [
+    "umowa", "najmu", "lokalu", "wynagrodzenie", "pracownik", "pracodawca", "faktura", "termin", "płatności",
+    "strony", "zobowiązują", "się", "do", "zachowania", "poufności", "danych", "osobowych", "zgodnie", "z",
+    "rozporządzeniem", "adres", "zamieszkania", "kwota", "brutto", "netto", "podpis", "załącznik", "oświadczenie",
+    "wniosek", "decyzja", "urząd", "skarbowy", "numer", "rachunku", "bankowego", "kredyt", "hipoteczny", "raport",
+]
+LABELS = ["PESEL", "EMAIL", "TELEFON", "ADRES", "NIP", "IMIE I NAZWISKO"]
+# Numer występujący w kilku dokumentach - scenariusz "wszystkie dokumenty z tym numerem PESEL"
+NEEDLE_PESEL = "85010212345"
+NEEDLE_DOCUMENTS = 25
+
+
+def synthetic_pesel(rng: random.Random) -> str:
+    return "".join(rng.choice("0123456789") for _ in range(11))
+
+
+def synthetic_document(i: int, rng: random.Random, needle: bool) -> dict:
+    pesel = NEEDLE_PESEL if needle else synthetic_pesel(rng)
+    words = rng.choices(VOCABULARY, k=WORDS_PER_DOCUMENT)
+    words.insert(rng.randrange(len(words)), pesel)
+    return {
+        "_id": ObjectId(),
+        "originalFilename": f"{rng.choice(['raport', 'umowa', 'faktura'])}_{i}.pdf",
+        "originalFormat": "pdf",
+        "uploaderEmail": f"user{i % 500}@example.com",
+        "uploadTimestamp": START + timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+        "conversionStatus": "completed",
+        "normalizedText": " ".join(words),
+        "analysisResult": {
+            "status": "completed",
+            "detectedItems": [
+                {"type": "id", "value": pesel, "label": "PESEL"},
+                {"type": "contact", "value": f"user{i}@example.com", "label": rng.choice(LABELS)},
+            ],
+        },
+    }
+
+
+def plan_stages(plan: dict) -> list:
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return [stage for stage in stages if stage]
+
+
+async def timed(coro_factory) -> tuple:
+    timings = []
+    result = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = await coro_factory()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(timings), max(timings)
+
+
+@pytest_asyncio.fixture(scope="module")
+async def seeded_repository():
+    client = AsyncIOMotorClient(BENCHMARK_URL)
+    db = client[BENCHMARK_DATABASE]
+    await db.documents.drop()
+    repo = DocumentRepository(db, None)
+
+    rng = random.Random(42)
+    needles = set(rng.sample(range(BENCHMARK_DOCUMENTS), NEEDLE_DOCUMENTS))
+    started = time.perf_counter()
+    for offset in range(0, BENCHMARK_DOCUMENTS, BATCH_SIZE):
+        batch = [
+            synthetic_document(i, rng, i in needles)
+            for i in range(offset, min(offset + BATCH_SIZE, BENCHMARK_DOCUMENTS))
+        ]
+        await db.documents.insert_many(batch, ordered=False)
+    print(f"\nSeeded {BENCHMARK_DOCUMENTS} documents ({WORDS_PER_DOCUMENT} words each) in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    await repo.create_indexes()
+    print(f"Created indexes in {time.perf_counter() - started:.1f}s")
+
+    yield repo
+
+    await client.drop_database(BENCHMARK_DATABASE)
+    client.close()
+
+
+async def test_search_finds_all_documents_with_pesel(seeded_repository: DocumentRepository):
+    """Sprawdza, że wyszukanie numeru PESEL zwraca wszystkie zawierające go dokumenty, korzystając z indeksu tekstowego."""
+    result, median_ms, max_ms = await timed(
+        lambda: seeded_repository.search(NEEDLE_PESEL, limit=100, count=ListCountMode.EXACT)
+    )
+    print(f"PESEL search: {result['total']} hits, median {median_ms:.1f}ms, max {max_ms:.1f}ms")
+
+    assert result["total"] == NEEDLE_DOCUMENTS
+    assert len(result["documents"]) == NEEDLE_DOCUMENTS
+    scores = [hit.score for hit in result["documents"]]
+    assert scores == sorted(scores, reverse=True)
+
+    explain = await seeded_repository.collection.find({"$text": {"$search": NEEDLE_PESEL}}).explain()
+    stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+    assert "COLLSCAN" not in stages
+    assert any(stage.startswith("TEXT") for stage in stages)
+
+
+async def test_search_common_word_pages(seeded_repository: DocumentRepository):
+    """Mierzy stronicowanie wyników dla częstego słowa (koszt rośnie z liczbą trafień - ranking wymaga ich wszystkich)."""
+    first, median_ms, max_ms = await timed(lambda: seeded_repository.search("hipoteczny", limit=20))
+    print(f"Common word, page 1: median {median_ms:.1f}ms, max {max_ms:.1f}ms, total>={first['total']}")
+    second = await seeded_repository.search("hipoteczny", page=2, limit=20, count=ListCountMode.NONE)
+
+    assert first["next_page"] == 2
+    assert {hit.id for hit in first["documents"]}.isdisjoint({hit.id for hit in second["documents"]})
+
+
+async def test_search_compared_with_regex_scan(seeded_repository: DocumentRepository):
+    """Porównuje wyszukiwanie przez indeks tekstowy z wyszukiwaniem $regex po treści (pełny skan kolekcji)."""
+    _, text_ms, _ = await timed(lambda: seeded_repository.search(NEEDLE_PESEL, limit=20, count=ListCountMode.NONE))
+
+    started = time.perf_counter()
+    regex_hits = await seeded_repository.collection.count_documents({"normalizedText": {"$regex": NEEDLE_PESEL}})
+    regex_ms = (time.perf_counter() - started) * 1000
+    print(f"Text index: median {text_ms:.1f}ms; $regex scan: {regex_ms:.1f}ms ({regex_hits} hits)")
+
+    assert regex_hits == NEEDLE_DOCUMENTS
+    assert text_ms < regex_ms
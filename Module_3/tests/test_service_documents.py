@@ -7,6 +7,8 @@ from app.services.documents import DocumentService
 from app.db.repositories.documents import DocumentRepository
 from app.models.documents import (
     DocumentList,
+    DocumentSearchResult,
+    ListCountMode,
     DocumentCreate,
     DocumentUpdate,
     ConversionStatus,
@@ -33,55 +35,44 @@ def document_service(mock_document_repository: AsyncMock) -> DocumentService:
     """Tworzy instancję DocumentService z zamockowanym repozytorium."""
     return DocumentService(document_repository=mock_document_repository)
 
-async def test_create_document_service_success(document_service: DocumentService, mock_document_repository: AsyncMock):
-    """Testuje pomyślne tworzenie dokumentu w serwisie."""
-    mock_document_repository.create.return_value = FAKE_OBJECT_ID
+async def test_create_document_from_stream_service_success(document_service: DocumentService, mock_document_repository: AsyncMock):
+    """Testuje pomyślne tworzenie dokumentu ze strumienia w serwisie."""
+    mock_document_repository.create_from_stream.return_value = FAKE_OBJECT_ID
     file_name = "service_test.txt"
-    file_format = "txt"
-    file_content = b"Service test"
+    chunks = mock_async_file_generator(b"Service test")
 
-    result_id = await document_service.create_document(
+    result_id = await document_service.create_document_from_stream(
         file_name=file_name,
-        file_format=file_format,
-        file_content=file_content,
+        file_format="TXT",
+        chunks=chunks,
         uploader_email=TEST_EMAIL,
     )
 
     assert result_id == FAKE_OBJECT_ID
 
-    mock_document_repository.create.assert_awaited_once()
-    call_args = mock_document_repository.create.call_args[0]
-    create_arg: DocumentCreate = call_args[0]
+    mock_document_repository.create_from_stream.assert_awaited_once()
+    call_args = mock_document_repository.create_from_stream.call_args
+    create_arg: DocumentCreate = call_args.args[0]
 
     assert isinstance(create_arg, DocumentCreate)
     assert create_arg.original_filename == file_name
-    assert create_arg.original_format == file_format
+    assert create_arg.original_format == "txt"
     assert create_arg.uploader_email == TEST_EMAIL
-    assert call_args[1] == file_content
-    assert call_args[2] == file_name
+    assert call_args.args[1] is chunks
+    assert call_args.args[2] == file_name
 
 
-@pytest.mark.parametrize("file_name, file_size, expected_error", [
-    ("", 100, "File name is required."),
-    ("test.txt", 0, "File content cannot be empty."),
-    ("test.txt", -10, "File content cannot be empty."),
-])
-
-async def test_create_document_service_validation_error(document_service: DocumentService, mock_document_repository: AsyncMock, file_name, file_size, expected_error):
-    """Testuje błędy walidacji przy tworzeniu dokumentu w serwisie."""
-
-    file_format = "txt"
-    file_content = b"abc" if file_size > 0 else b""
-
-    with pytest.raises(ValidationException, match=expected_error):
-        await document_service.create_document(
-            file_name=file_name,
-            file_format=file_format,
-            file_content=file_content,
+async def test_create_document_from_stream_service_requires_file_name(document_service: DocumentService, mock_document_repository: AsyncMock):
+    """Testuje błąd walidacji przy tworzeniu dokumentu bez nazwy pliku."""
+    with pytest.raises(ValidationException, match="File name is required."):
+        await document_service.create_document_from_stream(
+            file_name="",
+            file_format="txt",
+            chunks=mock_async_file_generator(b"abc"),
             uploader_email=TEST_EMAIL,
         )
     # Upewnienie się, że repozytorium NIE zostało wywołane
-    mock_document_repository.create.assert_not_awaited()
+    mock_document_repository.create_from_stream.assert_not_awaited()
 
 
 async def test_get_document_service_success(document_service: DocumentService, mock_document_repository: AsyncMock):
@@ -123,10 +114,29 @@ async def test_list_documents_service(document_service: DocumentService, mock_do
 
     mock_document_repository.get_list.assert_awaited_once_with(
         page=1, limit=20, conversion_status=None, original_format="pdf",
-        date_from=None, date_to=None, query=None
+        date_from=None, date_to=None, query=None, cursor=None, count=ListCountMode.EXACT, fields=()
+    )
+
+
+async def test_search_documents_service(document_service: DocumentService, mock_document_repository: AsyncMock):
+    """Testuje wyszukiwanie przez serwis (normalizacja parametrów)."""
+    mock_document_repository.search.return_value = {"total": 0, "page": 1, "limit": 100, "documents": [], "next_page": None}
+
+    result = await document_service.search_documents("  PESEL ", limit=500, original_format="PDF")
+
+    assert isinstance(result, DocumentSearchResult)
+    mock_document_repository.search.assert_awaited_once_with(
+        "PESEL", page=1, limit=100, conversion_status=None, original_format="pdf",
+        count=ListCountMode.ESTIMATE, fields=()
     )
 
 
+async def test_search_documents_service_empty_text(document_service: DocumentService, mock_document_repository: AsyncMock):
+    with pytest.raises(ValidationException):
+        await document_service.search_documents("   ")
+    mock_document_repository.search.assert_not_awaited()
+
+
 async def test_update_document_service_success(document_service: DocumentService, mock_document_repository: AsyncMock):
     """Testuje pomyślną aktualizację dokumentu przez serwis."""
 
@@ -219,4 +229,34 @@ async def test_get_original_document_content_service_no_ref(document_service: Do
     with pytest.raises(FileNotFoundInGridFSException, match="No valid GridFS reference found"):
         await document_service.get_original_document_content(doc_id)
     mock_document_repository.get_by_id.assert_awaited_once_with(doc_id)
-    mock_document_repository.download_gridfs_file.assert_not_awaited()
\ No newline at end of file
+    mock_document_repository.download_gridfs_file.assert_not_awaited()
+
+async def test_create_document_from_stream_service(document_service: DocumentService, mock_document_repository: AsyncMock):
+    """Testuje tworzenie dokumentu ze strumienia fragmentów pliku."""
+    mock_document_repository.create_from_stream.return_value = FAKE_OBJECT_ID
+
+    async def chunks():
+        yield b"Service "
+        yield b"test"
+    stream = chunks()
+
+    result_id = await document_service.create_document_from_stream(
+        file_name="service_test.PDF", file_format="PDF", chunks=stream, uploader_email=TEST_EMAIL
+    )
+
+    assert result_id == FAKE_OBJECT_ID
+    create_arg, chunks_arg, file_name_arg = mock_document_repository.create_from_stream.call_args[0]
+    assert create_arg.original_format == "pdf"
+    assert chunks_arg is stream
+    assert file_name_arg == "service_test.PDF"
+
+
+async def test_create_document_from_stream_service_missing_name(document_service: DocumentService, mock_document_repository: AsyncMock):
+    async def chunks():
+        yield b"content"
+
+    with pytest.raises(ValidationException):
+        await document_service.create_document_from_stream(
+            file_name="", file_format="txt", chunks=chunks(), uploader_email=TEST_EMAIL
+        )
+    mock_document_repository.create_from_stream.assert_not_awaited()
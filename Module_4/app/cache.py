@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+
+import redis
+from dotenv import load_dotenv, find_dotenv
+
+from app.llm import LLM_MODEL
+from app.regex_detector import RegexDetector
+
+# Konfiguracja loggera
+logger = logging.getLogger(__name__)
+
+load_dotenv(find_dotenv())
+
+# Bump when the detection logic changes in a way the pattern/model fingerprint does not capture
+CACHE_FORMAT_VERSION = 1
+
+
+@lru_cache(maxsize=1)
+def _regex_fingerprint() -> str:
+    """
+    Hash of the regex patterns, so that changing a pattern invalidates cached results.
+    """
+    detector = RegexDetector()
+    description = [
+        (label, pattern["regex"].pattern, pattern["regex"].flags, pattern["type"], pattern.get("priority", 0))
+        for label, pattern in detector.patterns.items()
+    ]
+    return hashlib.sha256(json.dumps(description).encode("utf-8")).hexdigest()
+
+
+def detector_fingerprint(use_llm: bool) -> Dict[str, Any]:
+    """
+    Describes the detector configuration that produced a result.
+    """
+    fingerprint: Dict[str, Any] = {
+        "version": CACHE_FORMAT_VERSION,
+        "regex": _regex_fingerprint(),
+        "use_llm": use_llm,
+    }
+    if use_llm:
+        fingerprint["llm_model"] = LLM_MODEL
+        fingerprint["llm_chunk_size"] = os.getenv("LLM_CHUNK_SIZE", "8000")
+        fingerprint["llm_chunk_overlap"] = os.getenv("LLM_CHUNK_OVERLAP", "300")
+    return fingerprint
+
+
+class _LRUStore:
+    """
+    In-process LRU with per-entry expiry, used when Redis is not available.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: str, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DetectionCache:
+    """
+    Cache of detection results keyed on the SHA-256 of the normalized text and the detector configuration.
+
+    Results are kept in Redis (shared by the API and all workers) with a TTL; size is bounded by the
+    server's maxmemory policy. When Redis is not configured or cannot be reached, an in-process LRU
+    limited to max_entries is used instead. Hit/miss counters are kept per process and, with Redis,
+    also globally.
+    """
+    def __init__(
+        self,
+        redis_client: Optional[Any] = None,
+        ttl: int = 7 * 24 * 3600,
+        max_entries: int = 1024,
+        prefix: str = "detection:",
+    ):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.local = _LRUStore(max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "DetectionCache":
+        """
+        Builds the cache from DETECTION_CACHE_* environment variables.
+        An empty DETECTION_CACHE_REDIS_URL disables Redis.
+        """
+        redis_url = os.getenv("DETECTION_CACHE_REDIS_URL", "redis://redis-cache:6379/0")
+        ttl = int(os.getenv("DETECTION_CACHE_TTL", str(7 * 24 * 3600)))
+        max_entries = int(os.getenv("DETECTION_CACHE_MAX_ENTRIES", "1024"))
+
+        redis_client = None
+        if redis_url:
+            try:
+                redis_client = redis.Redis.from_url(redis_url, socket_connect_timeout=1, socket_timeout=1)
+                redis_client.ping()
+                logger.info(f"Cache detekcji: używanie Redis ({redis_url})")
+            except Exception as e:
+                logger.warning(f"Cache detekcji: Redis niedostępny ({e}), używanie lokalnego LRU")
+                redis_client = None
+        return cls(redis_client=redis_client, ttl=ttl, max_entries=max_entries)
+
+    def make_key(self, text: str, use_llm: bool) -> str:
+        digest = hashlib.sha256()
+        digest.update(json.dumps(detector_fingerprint(use_llm), sort_keys=True).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return f"{self.prefix}{digest.hexdigest()}"
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns cached results or None; updates the hit/miss counters.
+        """
+        payload = None
+        if self.redis is not None:
+            try:
+                payload = self.redis.get(key)
+            except Exception as e:
+                logger.warning(f"Cache detekcji: błąd odczytu z Redis: {e}")
+        if payload is None:
+            payload = self.local.get(key)
+
+        self._count("hits" if payload is not None else "misses")
+        if payload is None:
+            return None
+        return json.loads(payload)
+
+    def set(self, key: str, results: List[Dict[str, Any]]) -> None:
+        payload = json.dumps(results)
+        if self.redis is not None:
+            try:
+                self.redis.set(key, payload, ex=self.ttl)
+                return
+            except Exception as e:
+                logger.warning(f"Cache detekcji: błąd zapisu do Redis: {e}")
+        self.local.set(key, payload, self.ttl)
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+        if self.redis is not None:
+            try:
+                self.redis.incr(f"{self.prefix}stats:{counter}")
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "backend": "redis" if self.redis is not None else "local",
+            "hits": self.hits,
+            "misses": self.misses,
+            "local_entries": len(self.local),
+        }
+        if self.redis is not None:
+            try:
+                hits, misses = self.redis.mget(f"{self.prefix}stats:hits", f"{self.prefix}stats:misses")
+                stats["global_hits"] = int(hits or 0)
+                stats["global_misses"] = int(misses or 0)
+            except Exception as e:
+                logger.warning(f"Cache detekcji: błąd odczytu statystyk z Redis: {e}")
+        return stats
+
+
+_detection_cache: Optional[DetectionCache] = None
+_detection_cache_lock = threading.Lock()
+
+
+def get_detection_cache() -> DetectionCache:
+    """
+    Returns the process-wide cache, created on first use.
+    """
+    global _detection_cache
+    if _detection_cache is None:
+        with _detection_cache_lock:
+            if _detection_cache is None:
+                _detection_cache = DetectionCache.from_env()
+    return _detection_cache
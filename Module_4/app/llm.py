@@ -1,11 +1,13 @@
 import os
 import logging
 import time
-from openai import OpenAI
-from typing import List, Dict, Any, Optional
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+from typing import List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv, find_dotenv
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 import backoff  # Dodajemy bibliotekę backoff do obsługi retry
 
 # Konfiguracja loggera
@@ -15,12 +17,36 @@ logger = logging.getLogger(__name__)
 # Load environment variables from .env file (located anywhere in the directory tree)
 load_dotenv(find_dotenv())
 
+# Model used for detection (also part of the detection cache key)
+LLM_MODEL = "o4-mini-2025-04-16"
+
+# Granice, na których preferujemy cięcie tekstu na fragmenty (od najlepszej)
+_CHUNK_BOUNDARIES = [
+    re.compile(r"\n\s*\n"),         # akapit
+    re.compile(r"(?<=[.!?…])\s+"),   # koniec zdania
+    re.compile(r"\n"),               # koniec linii
+    re.compile(r"\s+"),              # dowolny biały znak
+]
+_WHITESPACE = _CHUNK_BOUNDARIES[-1]
+
 class LLMDetector:
     """
     Class for detecting sensitive data using the o4-mini-2025-04-16 model.
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        max_workers: Optional[int] = None,
+    ):
+        # Chunking configuration for long documents (characters / parallel requests)
+        self.chunk_size = chunk_size or int(os.getenv("LLM_CHUNK_SIZE", "8000"))
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else int(os.getenv("LLM_CHUNK_OVERLAP", "300"))
+        self.max_workers = max_workers or int(os.getenv("LLM_MAX_WORKERS", "4"))
+        if self.chunk_overlap >= self.chunk_size // 2:
+            raise ValueError("chunk_overlap musi być mniejszy niż połowa chunk_size")
+
         # Get API key from environment variables
         self.api_key = os.getenv("OPENAI_API_KEY")
         
@@ -29,8 +55,16 @@ class LLMDetector:
             logger.warning("Ostrzeżenie: Brak klucza API OpenAI. Ustaw zmienną OPENAI_API_KEY w pliku .env")
             self.client = None
         else:
-            # Initialize OpenAI client with increased timeout
-            self.client = OpenAI(api_key=self.api_key, timeout=60.0)  # Zwiększony timeout do 60 sekund
+            # Initialize OpenAI client with increased timeout and a keep-alive pool sized for the chunk workers,
+            # so a detector reused across tasks keeps its connections to the API open
+            http_client = DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_workers * 2,
+                    max_keepalive_connections=self.max_workers,
+                    keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120")),
+                )
+            )
+            self.client = OpenAI(api_key=self.api_key, timeout=60.0, http_client=http_client)  # Zwiększony timeout do 60 sekund
         
         # Enhanced prompt template with emphasis on output format
         self.prompt_template = """
@@ -122,7 +156,7 @@ class LLMDetector:
         logger.info("Wywołanie API OpenAI...")
         
         response = self.client.chat.completions.create(
-            model="o4-mini-2025-04-16",
+            model=LLM_MODEL,
             messages=[
                 {"role": "system", "content": "Jesteś ekspertem ds. bezpieczeństwa danych i Twoim zadaniem jest wykrywanie danych wrażliwych w dokumentach tekstowych w języku polskim. Bądź dokładny i kompletny w swojej analizie. Zidentyfikuj wszystkie wystąpienia danych wrażliwych w formacie JSON, używając tylko predefiniowanych typów i etykiet."},
                 {"role": "user", "content": prompt}
@@ -135,13 +169,14 @@ class LLMDetector:
         
         return response
     
-    def _parse_llm_response(self, raw_content: str) -> List[Dict[str, Any]]:
+    def _parse_llm_response(self, raw_content: str) -> Optional[List[Dict[str, Any]]]:
         """
         Parsuje odpowiedź z LLM i obsługuje różne formaty.
+        Zwraca None, gdy odpowiedzi nie da się odczytać (pusta lub bez prawidłowego JSON).
         """
         if not raw_content:
             logger.error("LLMDetector: Otrzymano pustą odpowiedź z modelu")
-            return []
+            return None
         
         try:
             # Próba parsowania jako JSON
@@ -215,39 +250,150 @@ class LLMDetector:
                     except json.JSONDecodeError:
                         logger.warning(f"LLMDetector: Nie udało się sparsować wydobytego tekstu jako JSON")
             
-            # Jeśli wszystkie próby zawiodły, zwróć pustą listę
+            # Jeśli wszystkie próby zawiodły, odpowiedź jest nieczytelna
             logger.error(f"LLMDetector: Nie udało się wydobyć prawidłowego JSON z odpowiedzi")
-            return []
+            return None
     
+    def _split_into_chunks(self, text: str) -> List[Tuple[int, str]]:
+        """
+        Dzieli tekst na fragmenty (offset, fragment) o długości co najwyżej chunk_size.
+        Cięcie następuje na granicy akapitu lub zdania, a sąsiednie fragmenty zachodzą
+        na siebie o około chunk_overlap znaków.
+        """
+        chunks: List[Tuple[int, str]] = []
+        start = 0
+        length = len(text)
+        while start < length:
+            end = min(start + self.chunk_size, length)
+            if end < length:
+                end = self._find_chunk_end(text, start, end)
+            chunks.append((start, text[start:end]))
+            if end >= length:
+                break
+
+            # Początek kolejnego fragmentu cofamy o overlap, ale na początek słowa
+            next_start = max(end - self.chunk_overlap, start + 1)
+            if next_start < end:
+                whitespace = _WHITESPACE.search(text, next_start, end)
+                if whitespace and whitespace.end() < end:
+                    next_start = whitespace.end()
+            start = next_start
+        return chunks
+
+    def _find_chunk_end(self, text: str, start: int, end: int) -> int:
+        """
+        Szuka najlepszej granicy cięcia w drugiej połowie okna [start, end).
+        """
+        window_min = start + self.chunk_size // 2
+        for boundary in _CHUNK_BOUNDARIES:
+            last_match = None
+            for match in boundary.finditer(text, window_min, end):
+                last_match = match
+            if last_match is not None:
+                return last_match.end()
+        return end
+
+    def _detect_in_text(self, text: str) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Wykonuje pojedyncze zapytanie do modelu dla podanego tekstu.
+        Zwraca wykryte elementy oraz informację, czy zapytanie się powiodło.
+        """
+        # Przygotowanie promptu
+        prompt = self.prompt_template.format(text=text)
+
+        # Wywołanie API z mechanizmem retry
+        try:
+            response = self._call_openai_api(prompt)
+            raw_content = response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"LLMDetector: Błąd podczas wywoływania API OpenAI: {str(e)}")
+            return [], False
+
+        # Parsowanie odpowiedzi
+        items = self._parse_llm_response(raw_content)
+        if items is None:
+            return [], False
+        return items, True
+
+    def _detect_in_chunk(self, chunk_start: int, chunk: str) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Wykrywa dane we fragmencie i przelicza ich pozycje na offsety w całym dokumencie.
+        Element, którego wartości nie ma dosłownie we fragmencie, zostaje bez offsetu.
+        """
+        items, complete = self._detect_in_text(chunk)
+        search_from: Dict[str, int] = {}
+        for item in items:
+            value = item["value"]
+            if not isinstance(value, str) or not value:
+                continue
+            position = chunk.find(value, search_from.get(value, 0))
+            if position == -1:
+                position = chunk.find(value)
+            if position == -1:
+                continue
+            search_from[value] = position + 1
+            item["start"] = chunk_start + position
+            item["end"] = chunk_start + position + len(value)
+        return items, complete
+
+    @staticmethod
+    def _merge_chunk_results(chunk_results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """
+        Scala wyniki fragmentów; duplikaty z obszarów zakładki (ta sama wartość w tym
+        samym miejscu dokumentu) są usuwane.
+        """
+        merged: List[Dict[str, Any]] = []
+        seen = set()
+        for items in chunk_results:
+            for item in items:
+                key = (item["type"], item["value"], item["label"], item.get("start"))
+                if key in seen:
+                    continue
+                seen.add(key)
+                merged.append(item)
+        merged.sort(key=lambda item: (item.get("start") is None, item.get("start") or 0))
+        return merged
+
     def detect(self, text: str) -> List[Dict[str, Any]]:
         """
         Detects sensitive data in text using the language model.
+
+        Texts longer than chunk_size are split into overlapping chunks which are sent
+        concurrently (at most max_workers requests at a time); the results carry
+        start/end offsets relative to the whole text.
+        """
+        return self.detect_with_status(text)[0]
+
+    def detect_with_status(self, text: str) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Same as detect, but also returns whether the detection is complete: False when the
+        client is missing or any API call / response of the text or one of its chunks failed
+        (the results are then empty or partial).
         """
         if not self.client:
             logger.warning("LLMDetector: Brak klienta OpenAI. Detekcja LLM pominięta.")
-            return []
+            return [], False
         
         results: List[Dict[str, Any]] = []
+        complete = False
         try:
-            # Przygotowanie promptu
-            prompt = self.prompt_template.format(text=text)
-            
-            # Wywołanie API z mechanizmem retry
-            try:
-                response = self._call_openai_api(prompt)
-                raw_content = response.choices[0].message.content
-            except Exception as e:
-                logger.error(f"LLMDetector: Błąd podczas wywoływania API OpenAI: {str(e)}")
-                return []
-            
-            # Parsowanie odpowiedzi
-            results = self._parse_llm_response(raw_content)
+            if len(text) <= self.chunk_size:
+                results, complete = self._detect_in_text(text)
+            else:
+                chunks = self._split_into_chunks(text)
+                logger.info(f"LLMDetector: Tekst ({len(text)} znaków) podzielony na {len(chunks)} fragmentów")
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+                    chunk_results = list(executor.map(lambda chunk: self._detect_in_chunk(*chunk), chunks))
+                results = self._merge_chunk_results([items for items, _ in chunk_results])
+                complete = all(chunk_complete for _, chunk_complete in chunk_results)
             logger.info(f"LLMDetector: Znaleziono {len(results)} elementów danych wrażliwych")
+            if not complete:
+                logger.warning("LLMDetector: Detekcja LLM niepełna (błąd API lub nieczytelna odpowiedź)")
             
         except Exception as e:
             logger.error(f"LLMDetector: KRYTYCZNY - Nieoczekiwany błąd podczas detekcji LLM: {str(e)}")
             import traceback
             logger.error(traceback.format_exc())
+            complete = False
             
-        return results
-
+        return results, complete
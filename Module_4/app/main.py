@@ -2,13 +2,19 @@ import os
 import logging
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from app.tasks import detect_task, process_document
 from app.celery_app import celery
+from app.cache import get_detection_cache
+from app.results import TaskResultListener
+from app.sensitive_detector import init_detector
+from contextlib import asynccontextmanager
+from celery import states
 import time
+import json
 import asyncio
 import traceback
 
@@ -27,16 +33,37 @@ class DetectionResult(BaseModel):
     value: str
     label: str
 
+class JobStatus(BaseModel):
+    job_id: str
+    status: str  # pending | running | completed | failed
+    result: Optional[List[DetectionResult]] = None
+    error: Optional[str] = None
+
+class JobList(BaseModel):
+    jobs: List[JobStatus]
+
 class APIException(Exception):
     def __init__(self, status_code: int, detail: str):
         self.status_code = status_code
         self.detail = detail
         super().__init__(self.detail)
 
+# Jeden nasłuch wyników zadań na proces zamiast pętli odpytywania w każdym żądaniu
+result_listener = TaskResultListener(celery)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # process_document wykonuje detekcję w procesie API - detektor tworzony raz przy starcie
+    init_detector()
+    await result_listener.start()
+    yield
+    await result_listener.stop()
+
 app = FastAPI(
     title="Sensitive Data Detection Service",
     version="1.0",
-    description="Usługa wykrywania danych wrażliwych zgodna z RODO"
+    description="Usługa wykrywania danych wrażliwych zgodna z RODO",
+    lifespan=lifespan
 )
 
 # Dodanie middleware do obsługi wyjątków
@@ -60,6 +87,34 @@ async def api_exception_handler(request: Request, exc: APIException):
         content={"detail": exc.detail}
     )
 
+def get_task_meta(task_id: str) -> Dict[str, Any]:
+    """Reads the task state from the result backend (blocking - run it in a worker thread)."""
+    async_result = celery.AsyncResult(task_id)
+    state = async_result.state
+    return {"status": state, "result": async_result.result if state in states.READY_STATES else None}
+
+async def wait_for_task(task_id: str, timeout: float) -> Dict[str, Any]:
+    """
+    Waits until a Celery task is ready and returns {"status": ..., "result": ...}.
+
+    Uses the result listener when it is running; otherwise (e.g. rpc:// backend) falls back
+    to polling the backend from a worker thread. Raises asyncio.TimeoutError when the task is not ready in time.
+    """
+    if result_listener.enabled:
+        try:
+            return await result_listener.wait(task_id, timeout)
+        except ConnectionError as e:
+            logger.warning(f"Nasłuchiwanie wyników niedostępne ({e}), przejście na odpytywanie")
+
+    async def poll() -> Dict[str, Any]:
+        while True:
+            meta = await asyncio.to_thread(get_task_meta, task_id)
+            if meta["status"] in states.READY_STATES:
+                return meta
+            await asyncio.sleep(0.5)
+
+    return await asyncio.wait_for(poll(), timeout)
+
 @app.get("/health")
 async def health_check():
     """
@@ -67,6 +122,13 @@ async def health_check():
     """
     return {"status": "ok"}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Detection cache statistics (backend, hit/miss counters).
+    """
+    return get_detection_cache().stats()
+
 @app.post("/detect", response_model=List[DetectionResult])
 async def detect(request: DetectRequest):
     """
@@ -121,36 +183,29 @@ async def detect(request: DetectRequest):
             
             # Wait for the task to complete (with timeout)
             timeout = 120  # seconds - zwiększony timeout
-            start_time = time.time()
-            
-            while time.time() - start_time < timeout:
-                try:
-                    async_result = celery.AsyncResult(task.id)
-                    if async_result.ready():
-                        if async_result.successful():
-                            result = async_result.result
-                            if not isinstance(result, list):
-                                logger.error(f"[{request_id}] Nieprawidłowy format wyniku: {type(result)}")
-                                raise APIException(status_code=500, detail=f"Nieprawidłowy format wyniku: {type(result)}")
-                            
-                            logger.info(f"[{request_id}] Zadanie zakończone pomyślnie, znaleziono {len(result)} elementów")
-                            return result
-                        else:
-                            # Task failed
-                            error_msg = str(async_result.result)
-                            logger.error(f"[{request_id}] Zadanie zakończone niepowodzeniem: {error_msg}")
-                            raise APIException(status_code=500, detail=f"Zadanie zakończone niepowodzeniem: {error_msg}")
-                    
-                    # Zadanie nadal w trakcie wykonywania
-                    await asyncio.sleep(0.5)  # Dłuższy czas oczekiwania między sprawdzeniami
-                except Exception as e:
-                    logger.error(f"[{request_id}] Błąd podczas sprawdzania statusu zadania: {str(e)}")
-                    logger.error(traceback.format_exc())
-                    raise APIException(status_code=500, detail=f"Błąd podczas sprawdzania statusu zadania: {str(e)}")
-            
-            # If we reach here, the task timed out
-            logger.error(f"[{request_id}] Przekroczono limit czasu ({timeout}s) podczas przetwarzania tekstu")
-            raise APIException(status_code=408, detail=f"Przekroczono limit czasu ({timeout}s) podczas przetwarzania tekstu")
+            try:
+                task_meta = await wait_for_task(task.id, timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"[{request_id}] Przekroczono limit czasu ({timeout}s) podczas przetwarzania tekstu")
+                raise APIException(status_code=408, detail=f"Przekroczono limit czasu ({timeout}s) podczas przetwarzania tekstu")
+            except Exception as e:
+                logger.error(f"[{request_id}] Błąd podczas sprawdzania statusu zadania: {str(e)}")
+                logger.error(traceback.format_exc())
+                raise APIException(status_code=500, detail=f"Błąd podczas sprawdzania statusu zadania: {str(e)}")
+
+            if task_meta["status"] != states.SUCCESS:
+                # Task failed
+                error_msg = str(task_meta["result"])
+                logger.error(f"[{request_id}] Zadanie zakończone niepowodzeniem: {error_msg}")
+                raise APIException(status_code=500, detail=f"Zadanie zakończone niepowodzeniem: {error_msg}")
+
+            result = task_meta["result"]
+            if not isinstance(result, list):
+                logger.error(f"[{request_id}] Nieprawidłowy format wyniku: {type(result)}")
+                raise APIException(status_code=500, detail=f"Nieprawidłowy format wyniku: {type(result)}")
+
+            logger.info(f"[{request_id}] Zadanie zakończone pomyślnie, znaleziono {len(result)} elementów")
+            return result
         else:
             # If neither document_id nor text is provided, return an error
             logger.error(f"[{request_id}] Brak wymaganego parametru: document_id lub text")
@@ -164,3 +219,146 @@ async def detect(request: DetectRequest):
         logger.error(traceback.format_exc())
         raise APIException(status_code=500, detail=f"Nieoczekiwany błąd: {str(e)}")
 
+
+# ---------------- asynchroniczne API zadań ----------------
+
+JOB_STATUS_BY_STATE = {
+    states.PENDING: "pending",
+    states.RECEIVED: "pending",
+    states.STARTED: "running",
+    states.RETRY: "running",
+    states.SUCCESS: "completed",
+    states.FAILURE: "failed",
+    states.REVOKED: "failed",
+}
+JOB_FINISHED = {"completed", "failed"}
+MAX_JOB_WAIT = 60  # seconds - maksymalny czas long-poll jednego żądania
+MAX_JOBS_PER_QUERY = 500
+
+def job_status(job_id: str, meta: Optional[Dict[str, Any]]) -> JobStatus:
+    """
+    Maps the result meta of the Celery task behind a job to a JobStatus.
+    Unknown ids (no stored meta) are reported as pending, like Celery does.
+    """
+    state = meta["status"] if meta else states.PENDING
+    status = JOB_STATUS_BY_STATE.get(state, "running")
+    if status == "completed":
+        return JobStatus(job_id=job_id, status=status, result=meta.get("result"))
+    if status == "failed":
+        return JobStatus(job_id=job_id, status=status, error=str(meta.get("result")))
+    return JobStatus(job_id=job_id, status=status)
+
+async def get_job_statuses(job_ids: List[str]) -> List[JobStatus]:
+    """
+    Returns the statuses of the jobs: one MGET through the result listener when it is running,
+    otherwise backend lookups in a worker thread, so the event loop is never blocked.
+    """
+    if result_listener.enabled:
+        try:
+            metas = await result_listener.fetch(job_ids)
+            return [job_status(job_id, metas.get(job_id)) for job_id in job_ids]
+        except ConnectionError as e:
+            logger.warning(f"Odczyt wyników przez Redis niedostępny ({e}), odczyt z backendu")
+    metas = await asyncio.to_thread(lambda: [get_task_meta(job_id) for job_id in job_ids])
+    return [job_status(job_id, meta) for job_id, meta in zip(job_ids, metas)]
+
+async def get_job_status(job_id: str) -> JobStatus:
+    return (await get_job_statuses([job_id]))[0]
+
+async def wait_for_any_job(job_ids: List[str], timeout: float) -> None:
+    """
+    Returns when any of the jobs finishes or after timeout seconds. All ids are registered with
+    the result listener at once; without it, one poll loop checks all jobs together.
+    """
+    if result_listener.enabled:
+        try:
+            await result_listener.wait_any(job_ids, timeout)
+            return
+        except asyncio.TimeoutError:
+            return
+        except ConnectionError as e:
+            logger.warning(f"Nasłuchiwanie wyników niedostępne ({e}), przejście na odpytywanie")
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        jobs = await get_job_statuses(job_ids)
+        if any(job.status in JOB_FINISHED for job in jobs):
+            return
+        await asyncio.sleep(min(0.5, max(deadline - loop.time(), 0)))
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+async def create_job(request: DetectRequest):
+    """
+    Enqueues detection for the given text and returns immediately with the job id.
+    
+    The result is available from GET /jobs/{job_id} (optionally long-polling with ?wait=)
+    or as Server-Sent Events from GET /jobs/{job_id}/events.
+    """
+    if not request.text:
+        raise APIException(status_code=400, detail="Wymagany jest parametr text")
+    use_llm = bool(os.getenv("OPENAI_API_KEY"))
+    try:
+        task = detect_task.delay(request.text, None, use_llm)
+    except Exception as e:
+        logger.error(f"Błąd podczas tworzenia zadania Celery: {str(e)}")
+        raise APIException(status_code=500, detail=f"Błąd podczas tworzenia zadania Celery: {str(e)}")
+    logger.info(f"Utworzono zadanie detekcji {task.id} (długość tekstu: {len(request.text)})")
+    return JobStatus(job_id=task.id, status="pending")
+
+@app.get("/jobs", response_model=JobList)
+async def get_jobs(
+    ids: List[str] = Query(..., description="Job ids"),
+    wait: float = Query(0, ge=0, le=MAX_JOB_WAIT, description="Long-poll: wait up to this many seconds until any job finishes"),
+):
+    """
+    Returns the status of many jobs at once, so a client can track all of its jobs with one request.
+    With wait > 0 and no finished job, the response is delayed until one finishes or the time is up.
+    """
+    if len(ids) > MAX_JOBS_PER_QUERY:
+        raise APIException(status_code=400, detail=f"Maksymalnie {MAX_JOBS_PER_QUERY} zadań w jednym zapytaniu")
+    jobs = await get_job_statuses(ids)
+    if wait > 0 and not any(job.status in JOB_FINISHED for job in jobs):
+        await wait_for_any_job(ids, wait)
+        jobs = await get_job_statuses(ids)
+    return JobList(jobs=jobs)
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=MAX_JOB_WAIT, description="Long-poll: wait up to this many seconds for the job to finish"),
+):
+    """
+    Returns the job status and, once completed, the detection result.
+    """
+    job = await get_job_status(job_id)
+    if wait > 0 and job.status not in JOB_FINISHED:
+        try:
+            await wait_for_task(job_id, wait)
+        except asyncio.TimeoutError:
+            return job
+        job = await get_job_status(job_id)
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-Sent Events stream: a "status" event, then a "result" event when the job finishes.
+    A comment line is sent every 15 s to keep the connection alive.
+    """
+    async def event_stream():
+        job = await get_job_status(job_id)
+        yield f"event: status\ndata: {job.model_dump_json()}\n\n"
+        while job.status not in JOB_FINISHED:
+            try:
+                await wait_for_task(job_id, 15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+                return
+            job = await get_job_status(job_id)
+        yield f"event: result\ndata: {job.model_dump_json()}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
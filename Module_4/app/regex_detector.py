@@ -1,5 +1,6 @@
 import re
-from typing import List, Dict, Any
+from itertools import groupby
+from typing import List, Dict, Any, Tuple
 
 class RegexDetector:
     def __init__(self):
@@ -102,14 +103,91 @@ class RegexDetector:
             }
         }
         
+        self._build_scanner()
+
+    def _build_scanner(self):
+        """
+        Buduje łączone wyrażenia do skanowania tekstu jednym przebiegiem zamiast osobnego finditer dla każdej etykiety.
+
+        self._scanners[k] to alternacja wzorców k..n-1 (w kolejności self.patterns), każdy w osobnej grupie.
+        Wzorce nie mogą używać grup nazwanych ani odwołań wstecznych (numeracja grup się przesuwa).
+        """
+        self._scan_labels = list(self.patterns.keys())
+        sources = []
+        for name in self._scan_labels:
+            regex = self.patterns[name]["regex"]
+            flags = "".join(
+                letter for flag, letter in ((re.IGNORECASE, "i"), (re.MULTILINE, "m"), (re.DOTALL, "s"), (re.VERBOSE, "x"))
+                if regex.flags & flag
+            )
+            sources.append((regex.pattern, flags))
+
+        # Wszystkie wzorce zaczynają się od \b - sprawdzamy granicę słowa raz, przed alternacją
+        prefix = r"\b" if all(src.startswith(r"\b") for src, _ in sources) else ""
+
+        self._scanners = []
+        self._scanner_groups = []
+        for k in range(len(sources)):
+            branches = []
+            for src, flags in sources[k:]:
+                body = src[len(prefix):]
+                branches.append(f"((?{flags}:{body}))" if flags else f"({body})")
+            scanner = re.compile(prefix + "(?:" + "|".join(branches) + ")")
+
+            # Numer grupy otaczającej -> indeks etykiety
+            group_to_label = {}
+            group = 1
+            for j in range(k, len(sources)):
+                group_to_label[group] = j
+                group += 1 + self.patterns[self._scan_labels[j]]["regex"].groups
+            self._scanners.append(scanner)
+            self._scanner_groups.append(group_to_label)
+
+    def _scan(self, text: str) -> Dict[str, List[Tuple[str, int, int]]]:
+        """
+        Zwraca kandydatów (wartość, start, koniec) dla każdej etykiety - dokładnie te same co finditer danego wzorca.
+
+        Szukamy kolejnej pozycji, na której pasuje jakikolwiek wzorzec, a następnie alternacjami "od etykiety j+1"
+        zbieramy pozostałe etykiety pasujące na tej pozycji. last_end odtwarza nienakładanie się dopasowań finditer.
+        """
+        labels = self._scan_labels
+        candidates: Dict[str, List[Tuple[str, int, int]]] = {name: [] for name in labels}
+        if not labels:
+            return candidates
+
+        has_groups = [self.patterns[name]["regex"].groups > 0 for name in labels]
+        last_end = [0] * len(labels)
+        search = self._scanners[0].search
+        pos = 0
+
+        while True:
+            match = search(text, pos)
+            if match is None:
+                break
+            position = match.start()
+            k = 0
+            while match is not None:
+                group = match.lastindex
+                j = self._scanner_groups[k][group]
+                if position >= last_end[j]:
+                    start, end = match.span(group)
+                    last_end[j] = end
+                    value = match.group(group + 1) if has_groups[j] else match.group(group)
+                    candidates[labels[j]].append((value, start, end))
+                k = j + 1
+                if k >= len(labels):
+                    break
+                match = self._scanners[k].match(text, position)
+            pos = position + 1
+
+        return candidates
 
     def detect(self, text: str) -> List[Dict[str, Any]]:
         results: List[Dict[str, Any]] = []
+        candidates = self._scan(text)
         
         for name, pat in self.patterns.items():
-            for match in pat["regex"].finditer(text):
-                value = match.group(1) if match.groups() else match.group()
-                
+            for value, start, end in candidates[name]:
                 if "validator" in pat and callable(pat["validator"]):
                     if not pat["validator"](value):
                         continue
@@ -119,27 +197,12 @@ class RegexDetector:
                     "value": value,
                     "label": name,
                     "priority": pat.get("priority", 5),
-                    "start": match.start(),
-                    "end": match.end()
+                    "start": start,
+                    "end": end
                 })
         
         
-        results.sort(key=lambda x: (-x.get("priority", 5), x.get("start", 0)))
-        
-        filtered_results = []
-        for result in results:
-            is_overlapping = False
-            for existing in filtered_results:
-                if self._ranges_overlap(
-                    (result.get("start", 0), result.get("end", 0)),
-                    (existing.get("start", 0), existing.get("end", 0))
-                ):
-                    is_overlapping = True
-                    break
-            
-            if not is_overlapping:
-                clean_result = {k: v for k, v in result.items() if k not in ["priority", "start", "end"]}
-                filtered_results.append(clean_result)
+        filtered_results = self._resolve_overlaps(results)
         
         unique_results = []
         seen = set()
@@ -151,6 +214,41 @@ class RegexDetector:
         
         return unique_results
 
+    def _resolve_overlaps(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Odrzuca kandydatów nakładających się na już przyjęte wyniki (kolejność: priorytet malejąco, potem start).
+
+        Przyjęte zakresy są rozłączne i posortowane, więc dla każdego priorytetu wystarczy jeden przebieg
+        wskaźnikiem po nich zamiast porównywania z każdym przyjętym wynikiem.
+        """
+        results = sorted(results, key=lambda x: (-x.get("priority", 5), x.get("start", 0)))
+
+        filtered_results = []
+        accepted_ranges: List[Tuple[int, int]] = []
+        for _, group in groupby(results, key=lambda x: x.get("priority", 5)):
+            group_ranges: List[Tuple[int, int]] = []
+            i = 0
+            for result in group:
+                current = (result.get("start", 0), result.get("end", 0))
+
+                # Pierwszy przyjęty zakres kończący się za startem kandydata
+                while i < len(accepted_ranges) and accepted_ranges[i][1] <= current[0]:
+                    i += 1
+                if i < len(accepted_ranges) and self._ranges_overlap(current, accepted_ranges[i]):
+                    continue
+                # Zakresy przyjęte w tej grupie mają start <= current[0], ostatni ma największy koniec
+                if group_ranges and self._ranges_overlap(current, group_ranges[-1]):
+                    continue
+
+                group_ranges.append(current)
+                clean_result = {k: v for k, v in result.items() if k not in ["priority", "start", "end"]}
+                filtered_results.append(clean_result)
+
+            # Scalenie dwóch posortowanych list - sort wykrywa obie serie i łączy je liniowo
+            accepted_ranges = sorted(accepted_ranges + group_ranges)
+
+        return filtered_results
+
     def _ranges_overlap(self, range1, range2):
         """Sprawdza czy dwa zakresy się nakładają"""
         return range1[0] < range2[1] and range2[0] < range1[1]
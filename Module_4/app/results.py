@@ -0,0 +1,186 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from celery import Celery, states
+from celery.backends.redis import RedisBackend
+
+# Konfiguracja loggera
+logger = logging.getLogger(__name__)
+
+# Opóźnienie ponownego połączenia po utracie subskrypcji (podwajane do maksimum)
+RECONNECT_INITIAL_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30.0
+
+
+class TaskResultListener:
+    """
+    Resolves asyncio futures when Celery stores a task result.
+
+    The Redis result backend publishes every stored result on a channel named like its key
+    (celery-task-meta-<id>). A single pattern subscription per process receives all of them
+    and wakes the requests waiting for the matching task, so waiting requests do not poll.
+    When the subscription is lost, the listener resubscribes with backoff and then checks the
+    stored results of the waiting tasks once, so results published during the gap still resolve.
+    """
+    def __init__(self, celery_app: Celery):
+        self.celery_app = celery_app
+        self._futures: Dict[str, List[asyncio.Future]] = {}
+        self._redis: Optional[aioredis.Redis] = None
+        self._pubsub = None
+        self._listener_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._listener_task is not None and not self._listener_task.done()
+
+    async def start(self) -> None:
+        """
+        Subscribes to result notifications. Leaves the listener disabled when the result
+        backend is not Redis or Redis cannot be reached.
+        """
+        backend = self.celery_app.backend
+        if not isinstance(backend, RedisBackend):
+            logger.warning(f"Backend wyników {type(backend).__name__} nie obsługuje powiadomień, używane będzie odpytywanie")
+            return
+        try:
+            self._redis = aioredis.from_url(self.celery_app.conf.result_backend)
+            await self._subscribe()
+        except Exception as e:
+            logger.warning(f"Nie udało się zasubskrybować wyników zadań w Redis: {e}, używane będzie odpytywanie")
+            await self.stop()
+            return
+        self._listener_task = asyncio.create_task(self._listen())
+        logger.info("Nasłuchiwanie wyników zadań Celery uruchomione")
+
+    async def _subscribe(self) -> None:
+        """(Re)creates the pattern subscription to the result channels."""
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+        pubsub = self._redis.pubsub()
+        await pubsub.psubscribe(self.celery_app.backend.task_keyprefix + b"*")
+        self._pubsub = pubsub
+
+    async def stop(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener_task = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def fetch(self, task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Reads the stored result metas of the tasks with one MGET and returns them by task id
+        (tasks without a stored result are missing). Raises ConnectionError when Redis is unavailable.
+        """
+        if not task_ids:
+            return {}
+        backend = self.celery_app.backend
+        try:
+            payloads = await self._redis.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+        except RedisError as e:
+            raise ConnectionError(f"Błąd odczytu wyniku z Redis: {e}") from e
+        return {
+            task_id: backend.decode_result(payload)
+            for task_id, payload in zip(task_ids, payloads)
+            if payload is not None
+        }
+
+    async def wait(self, task_id: str, timeout: float) -> Dict[str, Any]:
+        """
+        Waits for the task to reach a ready state and returns its result meta
+        (status, result, ...). Raises asyncio.TimeoutError after timeout seconds and
+        ConnectionError when Redis becomes unavailable.
+        """
+        return await self.wait_any([task_id], timeout)
+
+    async def wait_any(self, task_ids: List[str], timeout: float) -> Dict[str, Any]:
+        """
+        Waits until any of the tasks reaches a ready state and returns its result meta. All ids share
+        one future and the already stored results are checked with one MGET. Raises asyncio.TimeoutError
+        after timeout seconds and ConnectionError when Redis becomes unavailable.
+        """
+        task_ids = list(dict.fromkeys(task_ids))
+        future = asyncio.get_running_loop().create_future()
+        for task_id in task_ids:
+            self._futures.setdefault(task_id, []).append(future)
+        try:
+            # The result may have been stored before the request started waiting
+            ready = await self._fetch_ready(task_ids)
+            if ready:
+                return next(iter(ready.values()))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            for task_id in task_ids:
+                waiting = self._futures.get(task_id, [])
+                if future in waiting:
+                    waiting.remove(future)
+                if not waiting:
+                    self._futures.pop(task_id, None)
+
+    async def _fetch_ready(self, task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Returns the stored result metas of the tasks that are ready, by task id."""
+        metas = await self.fetch(task_ids)
+        return {task_id: meta for task_id, meta in metas.items() if meta["status"] in states.READY_STATES}
+
+    def _resolve(self, task_id: str, meta: Dict[str, Any]) -> None:
+        for future in self._futures.get(task_id, []):
+            if not future.done():
+                future.set_result(meta)
+
+    async def _listen(self) -> None:
+        delay = RECONNECT_INITIAL_DELAY
+        while True:
+            try:
+                await self._dispatch_messages()
+                error = "subskrypcja zakończona"
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e
+            # Oczekujące żądania czekają dalej - po ponownym połączeniu dostaną wynik z kanału lub z Redis
+            logger.error(f"Nasłuchiwanie wyników zadań przerwane: {error}, ponowne połączenie za {delay} s")
+            while True:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                try:
+                    await self._subscribe()
+                    # Wyniki opublikowane w czasie przerwy są już zapisane w Redis
+                    for task_id, meta in (await self._fetch_ready(list(self._futures))).items():
+                        self._resolve(task_id, meta)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Ponowna subskrypcja wyników zadań nieudana: {e}, kolejna próba za {delay} s")
+                    continue
+                logger.info("Nasłuchiwanie wyników zadań wznowione")
+                delay = RECONNECT_INITIAL_DELAY
+                break
+
+    async def _dispatch_messages(self) -> None:
+        backend = self.celery_app.backend
+        async for message in self._pubsub.listen():
+            if message["type"] != "pmessage":
+                continue
+            try:
+                meta = backend.decode_result(message["data"])
+            except Exception as e:
+                logger.warning(f"Nie udało się odczytać wyniku zadania z kanału {message['channel']}: {e}")
+                continue
+            if meta.get("status") not in states.READY_STATES:
+                continue
+            self._resolve(meta.get("task_id"), meta)
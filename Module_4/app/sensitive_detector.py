@@ -1,10 +1,68 @@
 import logging
-from typing import List, Dict, Any
+import threading
+from collections import deque
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
 from app.regex_detector import RegexDetector
 from app.llm import LLMDetector
 
 logger = logging.getLogger(__name__)
 
+
+def _find_contained_values(values: Iterable[str]) -> Set[str]:
+    """
+    Returns the values that occur as a proper substring of another value in the collection.
+
+    Uses the Aho-Corasick automaton of all values. Feeding a value through its own trie always
+    stays on the trie path of its prefixes, so every occurrence of a value inside another one is
+    either a proper prefix (a terminal node with children) or reachable through a dictionary
+    suffix link from some node. Cost is linear in the total length of the values.
+    """
+    unique_values = set(values)
+    contained: Set[str] = set()
+    if "" in unique_values:
+        unique_values.discard("")
+        if unique_values:
+            contained.add("")
+
+    # Trie: goto[node] maps a character to the child node, output[node] is the value ending there
+    goto: List[Dict[str, int]] = [{}]
+    output: List[Any] = [None]
+    for value in unique_values:
+        node = 0
+        for ch in value:
+            child = goto[node].get(ch)
+            if child is None:
+                child = len(goto)
+                goto.append({})
+                output.append(None)
+                goto[node][ch] = child
+            node = child
+        output[node] = value
+
+    # Failure links and dictionary links (nearest proper suffix that is a whole value), built breadth-first
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        if output[node] is not None and goto[node]:
+            contained.add(output[node])
+        for ch, child in goto[node].items():
+            state = fail[node]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            target = goto[state].get(ch, 0)
+            fail[child] = target if target != child else 0
+
+            suffix = fail[child]
+            while suffix and output[suffix] is None:
+                suffix = fail[suffix]
+            if suffix:
+                contained.add(output[suffix])
+            queue.append(child)
+
+    return contained
+
+
 class SensitiveDataDetector:
     """
     Optimized wrapper for sensitive data detection using RegexDetector and LLMDetector.
@@ -24,18 +82,31 @@ class SensitiveDataDetector:
         Returns:
             List of detected sensitive data in required format
         """
+        return self.detect_with_status(text, use_llm=use_llm)[0]
+
+    def detect_with_status(self, text: str, use_llm: bool = True) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Same as detect, but also returns whether the result is complete.
+        
+        Returns:
+            Tuple of detected sensitive data and a flag that is False when any detector failed
+            (e.g. an LLM API error), so the result must not be reused as if it were final
+        """
         all_raw_results: List[Dict[str, Any]] = []
+        complete = True
         
         # Step 1: Collect LLM results
         if use_llm:
             try:
-                llm_detections = self.llm.detect(text)
+                llm_detections, llm_complete = self.llm.detect_with_status(text)
+                complete = complete and llm_complete
                 for item in llm_detections:
                     if item.get("value", "").strip():
                         item["source"] = "llm"
                         all_raw_results.append(item)
             except Exception as e:
                 logger.error(f"LLM detection error in SensitiveDataDetector: {str(e)}", exc_info=True)
+                complete = False
         
         # Step 2: Collect Regex results
         try:
@@ -46,6 +117,7 @@ class SensitiveDataDetector:
                     all_raw_results.append(item)
         except Exception as e:
             logger.error(f"Regex detection error in SensitiveDataDetector: {str(e)}", exc_info=True)
+            complete = False
 
         try:
             # Step 3: Deduplication - Stage 1 (normalized key, LLM priority)
@@ -91,34 +163,20 @@ class SensitiveDataDetector:
                 key=lambda x: (-len(x.get("value", "")), 0 if x.get("source") == "llm" else 1)
             )
 
-            stage2_unique_items: List[Dict[str, Any]] = []
-            for item_to_consider in sorted_for_overlap_dedup:
-                current_val = item_to_consider.get("value", "")
-                current_type = item_to_consider.get("type")
-                is_redundant_substring = False
-
-                # Check if item_to_consider is a substring of an already added item of the same type
-                for existing_item in stage2_unique_items:
-                    if existing_item.get("type") == current_type and \
-                       current_val in existing_item.get("value", "") and \
-                       current_val != existing_item.get("value", ""):
-                        is_redundant_substring = True
-                        break
-                
-                if is_redundant_substring:
-                    continue
-
-                # Remove from stage2_unique_items those that are substrings of item_to_consider
-                new_stage2_list = []
-                for existing_item in stage2_unique_items:
-                    if existing_item.get("type") == current_type and \
-                       existing_item.get("value", "") in current_val and \
-                       existing_item.get("value", "") != current_val:
-                        continue
-                    new_stage2_list.append(existing_item)
-                stage2_unique_items = new_stage2_list
-                
-                stage2_unique_items.append(item_to_consider)
+            # An item is redundant when its value is a proper substring of another value of the same type.
+            # Items are visited longest first, so a kept item can never become a substring of a later one.
+            values_by_type: Dict[Any, List[str]] = {}
+            for item in sorted_for_overlap_dedup:
+                values_by_type.setdefault(item.get("type"), []).append(item.get("value", ""))
+            redundant_by_type = {
+                item_type: _find_contained_values(type_values)
+                for item_type, type_values in values_by_type.items()
+            }
+
+            stage2_unique_items: List[Dict[str, Any]] = [
+                item for item in sorted_for_overlap_dedup
+                if item.get("value", "") not in redundant_by_type[item.get("type")]
+            ]
 
             # Step 5: Prepare final result (remove 'source' and sort)
             final_results = [
@@ -128,7 +186,38 @@ class SensitiveDataDetector:
             
             final_results = sorted(final_results, key=lambda x: (x.get("type", ""), x.get("value", "")))
             
-            return final_results
+            return final_results, complete
         except Exception as e:
             logger.error(f"Error during deduplication/final processing in SensitiveDataDetector: {str(e)}", exc_info=True)
-            return [] # Return empty list in case of error during this stage
+            return [], False # Return empty list in case of error during this stage
+
+
+# Detektor współdzielony w obrębie procesu (worker Celery / proces API)
+_shared_detector: Optional[SensitiveDataDetector] = None
+_shared_detector_lock = threading.RLock()
+
+
+def init_detector() -> SensitiveDataDetector:
+    """
+    Creates the detector shared by the current process.
+
+    Called after a Celery worker process is forked and on API startup, so that the compiled
+    patterns and the OpenAI client's connection pool are built once per process (never
+    inherited across fork) and reused by every task.
+    """
+    global _shared_detector
+    with _shared_detector_lock:
+        _shared_detector = SensitiveDataDetector()
+        logger.info("Shared SensitiveDataDetector initialized for this process")
+        return _shared_detector
+
+
+def get_detector() -> SensitiveDataDetector:
+    """
+    Returns the detector shared by the current process, creating it on first use.
+    """
+    if _shared_detector is None:
+        with _shared_detector_lock:
+            if _shared_detector is None:
+                init_detector()
+    return _shared_detector
@@ -1,16 +1,25 @@
 from app.celery_app import celery
-from app.sensitive_detector import SensitiveDataDetector
+from app.sensitive_detector import get_detector, init_detector
+from celery.signals import worker_process_init
+from app.cache import get_detection_cache
 import os
 import httpx
 import time
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
 import logging
 
 # Get a logger instance
 logger = logging.getLogger(__name__)
 
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """
+    Builds the shared detector in each worker process right after fork.
+    """
+    init_detector()
+
 async def get_document(document_id: str) -> Dict[str, Any]:
     """
     Retrieves a document from module 3 database.
@@ -67,6 +76,52 @@ async def get_normalized_text(document_id: str):
     except Exception as e:
         raise Exception(f"Failed to get normalized text for document {document_id}: {str(e)}")
 
+def detect_with_cache(text: str, use_llm: bool, log_prefix: str = "") -> Tuple[List[Dict[str, Any]], float]:
+    """
+    Returns formatted detection results for text, using the detection cache when possible.
+    Incomplete results (a failed LLM call or chunk) are returned but not cached.
+    
+    Args:
+        text: Text to analyze
+        use_llm: Whether to use LLM model for detection
+        log_prefix: Prefix for log messages
+        
+    Returns:
+        Tuple of formatted results and detection time in seconds (0.0 for a cache hit)
+    """
+    cache = get_detection_cache()
+    cache_key = cache.make_key(text, use_llm)
+    cached_results = cache.get(cache_key)
+    if cached_results is not None:
+        logger.info(f"{log_prefix} Detection cache hit ({len(cached_results)} items), detectors skipped.")
+        return cached_results, 0.0
+    
+    detector = get_detector()
+    
+    logger.info(f"{log_prefix} Calling detector.detect() with use_llm={use_llm}...")
+    detection_start_time = time.time()
+    results, complete = detector.detect_with_status(text, use_llm=use_llm)
+    detection_duration = time.time() - detection_start_time
+    logger.info(f"{log_prefix} detector.detect() took {detection_duration:.4f}s and returned {len(results) if results is not None else 'None'} items.")
+    
+    # Ensure results are in the required format
+    formatted_results = []
+    for item in results:
+        if "type" in item and "value" in item:
+            formatted_item = {
+                "type": item["type"],
+                "value": item["value"],
+                "label": item.get("label", "UNKNOWN")
+            }
+            formatted_results.append(formatted_item)
+    
+    # A degraded result (e.g. regex only after an OpenAI outage) must not be served for this text later
+    if complete:
+        cache.set(cache_key, formatted_results)
+    else:
+        logger.warning(f"{log_prefix} Detection incomplete (a detector failed), result not cached.")
+    return formatted_results, detection_duration
+
 async def process_document(document_id: str) -> List[Dict[str, Any]]:
     """
     Processes a document from database, detects sensitive data and updates results in module 3.
@@ -85,25 +140,11 @@ async def process_document(document_id: str) -> List[Dict[str, Any]]:
         normalized_text, document_identifier = await get_normalized_text(document_id)
         logger.info(f"[process_document:{document_id}] Normalized text received (length: {len(normalized_text) if normalized_text else 0}). Identifier: {document_identifier}")
         
-        # Perform sensitive data detection
-        detector = SensitiveDataDetector()
+        # Perform sensitive data detection (cached by text and detector configuration)
         use_llm = bool(os.getenv("OPENAI_API_KEY"))
-        
-        logger.info(f"[process_document:{document_id}] Calling detector.detect() with use_llm={use_llm}...")
-        detection_start_time = time.time()
-        results = detector.detect(normalized_text, use_llm=use_llm)
-        detection_duration = time.time() - detection_start_time
-        logger.info(f"[process_document:{document_id}] detector.detect() took {detection_duration:.4f}s and returned {len(results) if results is not None else 'None'} items.")
-        
-        formatted_results = []
-        for item in results:
-            if "type" in item and "value" in item:
-                formatted_item = {
-                    "type": item["type"],
-                    "value": item["value"],
-                    "label": item.get("label", "UNKNOWN")  
-                }
-                formatted_results.append(formatted_item)
+        formatted_results, detection_duration = detect_with_cache(
+            normalized_text, use_llm, log_prefix=f"[process_document:{document_id}]"
+        )
         
         # Calculate total processing time for the function
         total_processing_time = time.time() - overall_start_time
@@ -175,26 +216,12 @@ def detect_task(self, text: str, document_id: str = None, use_llm: bool = True):
     task_id = self.request.id
     overall_task_start_time = time.time()
     logger.info(f"detect_task started. Task ID: {task_id}, Document ID: {document_id}, use_llm: {use_llm}, text length: {len(text) if text else 0}")
-    detector = SensitiveDataDetector()
     
     try:
-        # Perform detection
-        logger.info(f"[detect_task:{task_id}] Calling detector.detect()...")
-        detection_start_time = time.time()
-        results = detector.detect(text, use_llm=use_llm)
-        detection_duration = time.time() - detection_start_time
-        logger.info(f"[detect_task:{task_id}] detector.detect() took {detection_duration:.4f}s and returned {len(results) if results is not None else 'None'} items.")
-        
-        # Ensure results are in the required format
-        formatted_results = []
-        for item in results:
-            if "type" in item and "value" in item:
-                formatted_item = {
-                    "type": item["type"],
-                    "value": item["value"],
-                    "label": item.get("label", "UNKNOWN")
-                }
-                formatted_results.append(formatted_item)
+        # Perform detection (cached by text and detector configuration)
+        formatted_results, detection_duration = detect_with_cache(
+            text, use_llm, log_prefix=f"[detect_task:{task_id}]"
+        )
         
         # If document_id is provided, update Module 3 database with results
         if document_id:
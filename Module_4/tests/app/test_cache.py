@@ -0,0 +1,119 @@
+import pytest
+from unittest.mock import patch
+
+# Add project root to sys.path for imports
+import sys
+from pathlib import Path
+project_root = Path(__file__).resolve().parent.parent.parent # Adjust based on test file location
+sys.path.insert(0, str(project_root))
+
+from app.cache import DetectionCache, _LRUStore
+
+
+class _DictRedis:
+    """Minimal in-memory stand-in for the redis client methods used by the cache."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode("utf-8")
+        self.ttls[key] = ex
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+
+class _BrokenRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis down")
+        return fail
+
+
+RESULTS = [{"type": "ID", "value": "85010212345", "label": "PESEL"}]
+
+
+def test_key_depends_on_text_and_configuration():
+    cache = DetectionCache()
+    key = cache.make_key("tekst", use_llm=True)
+    assert key == cache.make_key("tekst", use_llm=True)
+    assert key != cache.make_key("tekst", use_llm=False)
+    assert key != cache.make_key("tekst 2", use_llm=True)
+    assert key.startswith("detection:")
+
+
+def test_local_cache_counts_hits_and_misses():
+    cache = DetectionCache()
+    key = cache.make_key("tekst", use_llm=False)
+
+    assert cache.get(key) is None
+    cache.set(key, RESULTS)
+    assert cache.get(key) == RESULTS
+    assert cache.stats() == {"backend": "local", "hits": 1, "misses": 1, "local_entries": 1}
+
+
+def test_lru_store_evicts_least_recently_used():
+    store = _LRUStore(max_entries=2)
+    store.set("a", "1", ttl=60)
+    store.set("b", "2", ttl=60)
+    store.get("a")
+    store.set("c", "3", ttl=60)
+
+    assert store.get("b") is None
+    assert store.get("a") == "1"
+    assert store.get("c") == "3"
+
+
+def test_lru_store_expires_entries():
+    store = _LRUStore(max_entries=2)
+    with patch("app.cache.time.monotonic", return_value=100.0):
+        store.set("a", "1", ttl=10)
+    with patch("app.cache.time.monotonic", return_value=109.0):
+        assert store.get("a") == "1"
+    with patch("app.cache.time.monotonic", return_value=110.0):
+        assert store.get("a") is None
+    assert len(store) == 0
+
+
+def test_redis_backend_stores_with_ttl_and_global_counters():
+    redis_client = _DictRedis()
+    cache = DetectionCache(redis_client=redis_client, ttl=300)
+    key = cache.make_key("tekst", use_llm=True)
+
+    assert cache.get(key) is None
+    cache.set(key, RESULTS)
+    assert redis_client.ttls[key] == 300
+    assert len(cache.local) == 0
+
+    # A second process sharing the same Redis sees the entry
+    other = DetectionCache(redis_client=redis_client)
+    assert other.get(key) == RESULTS
+    stats = other.stats()
+    assert stats["backend"] == "redis"
+    assert (stats["hits"], stats["misses"]) == (1, 0)
+    assert (stats["global_hits"], stats["global_misses"]) == (1, 1)
+
+
+def test_redis_errors_fall_back_to_local_lru():
+    cache = DetectionCache(redis_client=_BrokenRedis())
+    key = cache.make_key("tekst", use_llm=False)
+
+    cache.set(key, RESULTS)
+    assert cache.get(key) == RESULTS
+    assert cache.stats()["hits"] == 1
+
+
+def test_from_env_without_redis_uses_local_store():
+    with patch.dict("os.environ", {"DETECTION_CACHE_REDIS_URL": "", "DETECTION_CACHE_MAX_ENTRIES": "5"}):
+        cache = DetectionCache.from_env()
+    assert cache.redis is None
+    assert cache.local.max_entries == 5
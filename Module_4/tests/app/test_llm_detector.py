@@ -2,6 +2,10 @@ import pytest
 from unittest.mock import patch, MagicMock
 import os
 import json
+import re
+import threading
+import time
+from types import SimpleNamespace
 
 # Add project root to sys.path for imports
 import sys
@@ -118,4 +122,130 @@ def test_detect_api_call_failure(MockOpenAI, mock_openai_client, capsys):
     
     assert results == []
     captured = capsys.readouterr()
-    assert "Wystąpił błąd podczas detekcji danych wrażliwych za pomocą GPT: API Error" in captured.out 
\ No newline at end of file
+    assert "Wystąpił błąd podczas detekcji danych wrażliwych za pomocą GPT: API Error" in captured.out 
+
+class _StubOpenAI:
+    """Local stand-in for the OpenAI client: reports every e-mail found in the document part of the prompt."""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, response_format):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            document = messages[-1]["content"].split("DOCUMENT TO ANALYZE:", 1)[1]
+            emails = re.findall(r"[\w.]+@[\w.]+\.pl", document)
+            content = json.dumps({"result": [{"type": "contact", "value": e, "label": "EMAIL"} for e in emails]})
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def _long_document(sentences: int = 400) -> str:
+    paragraphs = []
+    for i in range(0, sentences, 8):
+        paragraphs.append(" ".join(
+            f"Zdanie numer {j} wysłano na adres osoba{j}@firma.pl bez opóźnień." for j in range(i, min(i + 8, sentences))
+        ))
+    return "\n\n".join(paragraphs)
+
+
+@patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"})
+@patch("app.llm.OpenAI")
+def test_split_into_chunks_respects_size_overlap_and_boundaries(MockOpenAI):
+    detector = LLMDetector(chunk_size=1000, chunk_overlap=100)
+    text = _long_document()
+    chunks = detector._split_into_chunks(text)
+
+    assert len(chunks) > 1
+    assert chunks[0][0] == 0
+    assert chunks[-1][0] + len(chunks[-1][1]) == len(text)
+    for (start, chunk), (next_start, _) in zip(chunks, chunks[1:]):
+        assert text[start:start + len(chunk)] == chunk
+        assert len(chunk) <= 1000
+        # Cut after a full sentence, next chunk starts inside the previous one
+        assert chunk.rstrip().endswith(".")
+        assert start < next_start < start + len(chunk)
+
+
+@patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"})
+@patch("app.llm.OpenAI")
+def test_detect_chunked_merges_results_with_offsets(MockOpenAI):
+    stub = _StubOpenAI()
+    MockOpenAI.return_value = stub
+    detector = LLMDetector(chunk_size=1000, chunk_overlap=200, max_workers=3)
+    text = _long_document()
+
+    results = detector.detect(text)
+
+    assert stub.calls == len(detector._split_into_chunks(text))
+    assert 1 < stub.max_in_flight <= 3
+    assert [item["value"] for item in results] == [f"osoba{j}@firma.pl" for j in range(400)]
+    for item in results:
+        assert text[item["start"]:item["end"]] == item["value"]
+        assert item["source"] == "llm"
+
+
+@patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"})
+@patch("app.llm.OpenAI")
+def test_detect_short_text_uses_single_request(MockOpenAI):
+    stub = _StubOpenAI(delay=0)
+    MockOpenAI.return_value = stub
+    detector = LLMDetector(chunk_size=1000, chunk_overlap=100)
+
+    results = detector.detect("Kontakt: jan@firma.pl")
+
+    assert stub.calls == 1
+    assert results == [{"type": "contact", "value": "jan@firma.pl", "label": "EMAIL", "source": "llm"}]
+
+
+@patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"})
+@patch("app.llm.OpenAI")
+def test_detect_with_status_marks_failed_call_incomplete(MockOpenAI, mock_openai_client):
+    MockOpenAI.return_value = mock_openai_client
+    detector = LLMDetector()
+
+    with patch.object(LLMDetector, "_call_openai_api", side_effect=Exception("rate limited")):
+        assert detector.detect_with_status("Kontakt: jan@firma.pl") == ([], False)
+
+    mock_openai_client.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="not json at all"))]
+    )
+    assert detector.detect_with_status("Kontakt: jan@firma.pl") == ([], False)
+
+    mock_openai_client.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps({"result": []})))]
+    )
+    assert detector.detect_with_status("Brak danych") == ([], True)
+
+
+@patch.dict(os.environ, {"OPENAI_API_KEY": "test_key"})
+@patch("app.llm.OpenAI")
+def test_detect_with_status_keeps_partial_chunk_results_incomplete(MockOpenAI):
+    stub = _StubOpenAI(delay=0)
+    MockOpenAI.return_value = stub
+    detector = LLMDetector(chunk_size=1000, chunk_overlap=200, max_workers=3)
+    text = _long_document()
+
+    def call_api(prompt):
+        # Jeden fragment kończy się błędem API (bez ponawiania przez backoff)
+        if "osoba0@firma.pl" in prompt:
+            raise Exception("API Error")
+        return stub.chat.completions.create(model=None, messages=[{"content": prompt}], response_format=None)
+
+    with patch.object(detector, "_call_openai_api", side_effect=call_api):
+        results, complete = detector.detect_with_status(text)
+
+    assert complete is False
+    assert results
+    assert "osoba0@firma.pl" not in [item["value"] for item in results]
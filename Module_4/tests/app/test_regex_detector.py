@@ -1,4 +1,6 @@
 import pytest
+import random
+import time
 
 # Add project root to sys.path for imports
 import sys
@@ -106,4 +108,74 @@ def test_deduplication_within_regex_detector(detector):
     assert len(results_kw) == 1 
     assert results_kw[0]["type"] == "finansowe"
     assert results_kw[0]["value"] == "faktura"
-    assert results_kw[0]["label"] == "FATURA" 
\ No newline at end of file
+    assert results_kw[0]["label"] == "FATURA" 
+
+def test_combined_scan_matches_per_pattern_finditer(detector):
+    # The single-pass scanner must report exactly the spans each pattern's own finditer would
+    text = (
+        "Jan ur. w Krakowie, PESEL 44051401359, NIP 123-456-32-18, tel. +48 501 234 567, "
+        "ul. Długa 12/3 00-950 Warszawa, dyplom nr 123456, ABC123456 AB1234567, "
+        "jan.kowalski@example.com, PL61109010140000071219812874, 4111111111111111, 01.02.1990"
+    )
+    expected = {}
+    for name, pat in detector.patterns.items():
+        expected[name] = [
+            (m.group(1) if m.groups() else m.group(), m.start(), m.end())
+            for m in pat["regex"].finditer(text)
+        ]
+
+    assert detector._scan(text) == expected
+
+
+def _synthetic_candidates(count, seed=0):
+    rnd = random.Random(seed)
+    candidates = []
+    for i in range(count):
+        start = rnd.randrange(count * 10)
+        candidates.append({
+            "type": "ID",
+            "value": f"v{i}",
+            "label": f"L{i % 7}",
+            "priority": rnd.choice([6, 7, 8, 9, 10]),
+            "start": start,
+            "end": start + rnd.randint(1, 30),
+        })
+    return candidates
+
+
+def _resolve_overlaps_reference(detector, candidates):
+    ordered = sorted(candidates, key=lambda x: (-x["priority"], x["start"]))
+    accepted = []
+    for c in ordered:
+        if not any(detector._ranges_overlap((c["start"], c["end"]), (a["start"], a["end"])) for a in accepted):
+            accepted.append(c)
+    return [{k: v for k, v in a.items() if k not in ["priority", "start", "end"]} for a in accepted]
+
+
+def test_resolve_overlaps_matches_pairwise_check(detector):
+    candidates = _synthetic_candidates(2000, seed=1)
+    assert detector._resolve_overlaps(candidates) == _resolve_overlaps_reference(detector, candidates)
+
+
+def test_detect_drops_lower_priority_overlap(detector):
+    # ID_CARD (priority 9) and STUDENT_ID (priority 6) match the same span
+    results = detector.detect("Dowód ABC123456 wydany")
+    assert {"type": "ID", "value": "ABC123456", "label": "ID_CARD"} in results
+    assert all(r["label"] != "STUDENT_ID" for r in results)
+
+
+def test_resolve_overlaps_scales_linearly(detector):
+    def best_time(candidates):
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            detector._resolve_overlaps(candidates)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    small = best_time(_synthetic_candidates(5_000, seed=2))
+    large = best_time(_synthetic_candidates(50_000, seed=2))
+
+    # 10x more matches: a linear (n log n) resolver stays far below the ~100x of a pairwise check
+    assert large < small * 30, f"5k: {small:.4f}s, 50k: {large:.4f}s"
+    assert large < 2.0
@@ -0,0 +1,233 @@
+import pytest
+import asyncio
+from unittest.mock import patch
+from celery import Celery
+
+# Add project root to sys.path for imports
+import sys
+from pathlib import Path
+project_root = Path(__file__).resolve().parent.parent.parent # Adjust based on test file location
+sys.path.insert(0, str(project_root))
+
+from app.results import TaskResultListener
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.pubsubs = []
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def pubsub(self):
+        self.pubsubs.append(_FakePubSub())
+        return self.pubsubs[-1]
+
+    async def aclose(self):
+        pass
+
+
+class _FakePubSub:
+    """Feeds messages put on a queue to TaskResultListener like redis PubSub.listen()."""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+
+    async def listen(self):
+        while True:
+            message = await self.queue.get()
+            if isinstance(message, Exception):
+                raise message
+            yield message
+
+    async def psubscribe(self, pattern):
+        self.pattern = pattern
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture
+def redis_celery():
+    # CELERY_RESULT_BACKEND from .env would take precedence over the backend argument
+    with patch.dict("os.environ", {"CELERY_RESULT_BACKEND": "redis://localhost:6379/1"}):
+        app = Celery("test", broker="memory://")
+        app.backend
+        yield app
+
+
+def _start(listener):
+    listener._redis = _FakeRedis()
+    listener._pubsub = _FakePubSub()
+    listener._listener_task = asyncio.create_task(listener._listen())
+
+
+def _message(backend, task_id, status, result):
+    payload = backend.encode({"task_id": task_id, "status": status, "result": result})
+    return {"type": "pmessage", "channel": backend.get_key_for_task(task_id), "data": payload}
+
+
+@pytest.mark.asyncio
+async def test_wait_resolves_on_published_result(redis_celery):
+    listener = TaskResultListener(redis_celery)
+    _start(listener)
+    backend = redis_celery.backend
+
+    waiter = asyncio.create_task(listener.wait("task-1", timeout=5))
+    await asyncio.sleep(0)
+    await listener._pubsub.queue.put(_message(backend, "task-1", "STARTED", None))
+    await listener._pubsub.queue.put(_message(backend, "task-2", "SUCCESS", []))
+    await listener._pubsub.queue.put(_message(backend, "task-1", "SUCCESS", [{"value": "x"}]))
+
+    meta = await waiter
+    assert meta["status"] == "SUCCESS"
+    assert meta["result"] == [{"value": "x"}]
+    assert listener._futures == {}
+    await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_many_waiters_share_one_subscription(redis_celery):
+    listener = TaskResultListener(redis_celery)
+    _start(listener)
+    backend = redis_celery.backend
+
+    waiters = [asyncio.create_task(listener.wait(f"task-{i}", timeout=5)) for i in range(200)]
+    await asyncio.sleep(0)
+    for i in reversed(range(200)):
+        await listener._pubsub.queue.put(_message(backend, f"task-{i}", "SUCCESS", i))
+
+    results = await asyncio.gather(*waiters)
+    assert [meta["result"] for meta in results] == list(range(200))
+    await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_wait_returns_result_stored_before_waiting(redis_celery):
+    listener = TaskResultListener(redis_celery)
+    _start(listener)
+    backend = redis_celery.backend
+    listener._redis.data[backend.get_key_for_task("done")] = backend.encode(
+        {"task_id": "done", "status": "SUCCESS", "result": [1]}
+    )
+
+    meta = await listener.wait("done", timeout=1)
+    assert meta["result"] == [1]
+    await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out(redis_celery):
+    listener = TaskResultListener(redis_celery)
+    _start(listener)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await listener.wait("never", timeout=0.05)
+    assert listener._futures == {}
+    await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_lost_subscription_resubscribes_and_resolves_results_from_the_gap(redis_celery):
+    listener = TaskResultListener(redis_celery)
+    _start(listener)
+    backend = redis_celery.backend
+    lost_pubsub = listener._pubsub
+
+    waiters = [asyncio.create_task(listener.wait(f"task-{i}", timeout=5)) for i in range(2)]
+    await asyncio.sleep(0)
+    with patch("app.results.RECONNECT_INITIAL_DELAY", 0.01):
+        # Wynik task-0 zapisany w czasie przerwy - jego publikacja nie dotarła do nikogo
+        listener._redis.data[backend.get_key_for_task("task-0")] = backend.encode(
+            {"task_id": "task-0", "status": "SUCCESS", "result": [0]}
+        )
+        await lost_pubsub.queue.put(RuntimeError("connection lost"))
+        meta = await waiters[0]
+
+    assert meta["result"] == [0]
+    assert listener.enabled
+    assert listener._pubsub is not lost_pubsub
+    assert listener._pubsub.pattern == backend.task_keyprefix + b"*"
+
+    await listener._pubsub.queue.put(_message(backend, "task-1", "SUCCESS", [1]))
+    assert (await waiters[1])["result"] == [1]
+    await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_resubscribe_is_retried_with_backoff(redis_celery):
+    listener = TaskResultListener(redis_celery)
+    _start(listener)
+    attempts = []
+    subscribe = listener._subscribe
+
+    async def flaky_subscribe():
+        attempts.append(asyncio.get_running_loop().time())
+        if len(attempts) < 3:
+            raise ConnectionError("redis down")
+        await subscribe()
+
+    listener._subscribe = flaky_subscribe
+    with patch("app.results.RECONNECT_INITIAL_DELAY", 0.01):
+        await listener._pubsub.queue.put(RuntimeError("connection lost"))
+        while len(attempts) < 3:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+
+    assert len(attempts) == 3
+    # Odstęp między próbami rośnie
+    assert attempts[2] - attempts[1] > attempts[1] - attempts[0]
+    assert listener.enabled
+    await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_listener_disabled_for_non_redis_backend():
+    listener = TaskResultListener(Celery("test", broker="memory://", backend="rpc://"))
+    await listener.start()
+    assert not listener.enabled
+
+
+@pytest.mark.asyncio
+async def test_wait_any_shares_one_future_and_one_mget(redis_celery):
+    listener = TaskResultListener(redis_celery)
+    _start(listener)
+    backend = redis_celery.backend
+    mget_calls = []
+    mget = listener._redis.mget
+
+    async def counting_mget(keys):
+        mget_calls.append(keys)
+        return await mget(keys)
+
+    listener._redis.mget = counting_mget
+    ids = [f"task-{i}" for i in range(500)]
+
+    waiter = asyncio.create_task(listener.wait_any(ids, timeout=5))
+    await asyncio.sleep(0)
+    assert len(mget_calls) == 1 and len(mget_calls[0]) == 500
+    assert len({id(future) for waiting in listener._futures.values() for future in waiting}) == 1
+
+    await listener._pubsub.queue.put(_message(backend, "task-321", "SUCCESS", [321]))
+    meta = await waiter
+    assert meta["task_id"] == "task-321"
+    assert listener._futures == {}
+    await listener.stop()
+
+
+@pytest.mark.asyncio
+async def test_fetch_returns_stored_metas(redis_celery):
+    listener = TaskResultListener(redis_celery)
+    _start(listener)
+    backend = redis_celery.backend
+    listener._redis.data[backend.get_key_for_task("running")] = backend.encode(
+        {"task_id": "running", "status": "STARTED", "result": None}
+    )
+    listener._redis.data[backend.get_key_for_task("done")] = backend.encode(
+        {"task_id": "done", "status": "SUCCESS", "result": [1]}
+    )
+
+    metas = await listener.fetch(["running", "done", "unknown"])
+    assert {task_id: meta["status"] for task_id, meta in metas.items()} == {"running": "STARTED", "done": "SUCCESS"}
+    await listener.stop()
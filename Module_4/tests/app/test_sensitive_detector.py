@@ -1,4 +1,6 @@
 import pytest
+import os
+import time
 from unittest.mock import MagicMock, patch
 
 # Add project root to sys.path for imports
@@ -7,7 +9,7 @@ from pathlib import Path
 project_root = Path(__file__).resolve().parent.parent.parent # Adjust based on test file location
 sys.path.insert(0, str(project_root))
 
-from app.sensitive_detector import SensitiveDataDetector
+from app.sensitive_detector import SensitiveDataDetector, _find_contained_values, get_detector, init_detector
 
 @pytest.fixture
 def mock_regex_detector():
@@ -19,6 +21,8 @@ def mock_regex_detector():
 def mock_llm_detector():
     detector = MagicMock()
     detector.detect = MagicMock(return_value=[])
+    # detect_with_status delegates to detect, so tests can keep configuring detect
+    detector.detect_with_status = MagicMock(side_effect=lambda text: (detector.detect(text), True))
     return detector
 
 @patch('app.sensitive_detector.LLMDetector') # Path to LLMDetector where it's imported in SensitiveDataDetector
@@ -128,4 +132,117 @@ def test_detect_sorting_and_deduplication_order_matters(
     expected_results = [
         {"type": "ID", "value": "123", "label": "REGEX_ID_LATE", "start": 10}
     ]
-    assert results == expected_results 
\ No newline at end of file
+    assert results == expected_results
+
+
+def test_find_contained_values():
+    values = ["12345", "123", "45", "abc", "bc", "abc", "x"]
+    assert _find_contained_values(values) == {"123", "45", "bc"}
+    assert _find_contained_values([]) == set()
+    assert _find_contained_values(["same", "same"]) == set()
+
+
+@patch('app.sensitive_detector.LLMDetector')
+@patch('app.sensitive_detector.RegexDetector')
+def test_detect_drops_substrings_only_within_same_type(
+    MockRegexDetector, MockLLMDetector,
+    mock_regex_detector, mock_llm_detector
+):
+    mock_regex_detector.detect.return_value = [
+        {"type": "ID", "value": "12345678", "label": "REGEX_ID"},
+        {"type": "ID", "value": "5678", "label": "REGEX_ID"},
+        {"type": "PHONE", "value": "5678", "label": "REGEX_PHONE"},
+    ]
+    mock_llm_detector.detect.return_value = [
+        {"type": "ID", "value": "234", "label": "LLM_ID"},
+    ]
+
+    MockRegexDetector.return_value = mock_regex_detector
+    MockLLMDetector.return_value = mock_llm_detector
+
+    detector = SensitiveDataDetector()
+    results = detector.detect("text")
+
+    assert results == [
+        {"type": "ID", "value": "12345678", "label": "REGEX_ID"},
+        {"type": "PHONE", "value": "5678", "label": "REGEX_PHONE"},
+    ]
+
+
+@patch('app.sensitive_detector.LLMDetector')
+@patch('app.sensitive_detector.RegexDetector')
+def test_detect_substring_dedup_scales_to_many_items(
+    MockRegexDetector, MockLLMDetector,
+    mock_regex_detector, mock_llm_detector
+):
+    items = [{"type": "ID", "value": f"{i:09d}", "label": "REGEX_ID"} for i in range(20000)]
+    items += [{"type": "ID", "value": f"X{i:09d}Y", "label": "REGEX_ID"} for i in range(0, 20000, 2)]
+    mock_regex_detector.detect.return_value = items
+    mock_llm_detector.detect.return_value = []
+
+    MockRegexDetector.return_value = mock_regex_detector
+    MockLLMDetector.return_value = mock_llm_detector
+
+    detector = SensitiveDataDetector()
+    start = time.perf_counter()
+    results = detector.detect("text")
+    elapsed = time.perf_counter() - start
+
+    # Even numbers are wrapped in a longer value and dropped, odd ones stay
+    assert len(results) == 20000
+    assert sum(1 for item in results if item["value"].startswith("X")) == 10000
+    assert elapsed < 5.0
+
+
+def test_get_detector_reuses_instance_until_reinitialized():
+    first = get_detector()
+    assert get_detector() is first
+    second = init_detector()
+    assert second is not first
+    assert get_detector() is second
+
+
+@patch.dict(os.environ, {"OPENAI_API_KEY": "sk-test"})
+def test_shared_detector_per_task_overhead():
+    # Benchmark: a task building its own detector vs. the per-process shared one
+    text = "Jan Kowalski, PESEL 85010212345, email jan.kowalski@example.com, tel. 123 456 789."
+    runs = 20
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        SensitiveDataDetector().detect(text, use_llm=False)
+    per_task_new = (time.perf_counter() - start) / runs
+
+    detector = init_detector()
+    start = time.perf_counter()
+    for _ in range(runs):
+        get_detector().detect(text, use_llm=False)
+    per_task_shared = (time.perf_counter() - start) / runs
+
+    assert detector.llm.client is not None
+    assert per_task_shared * 5 < per_task_new, (
+        f"per-task overhead: new detector {per_task_new * 1000:.2f} ms, shared detector {per_task_shared * 1000:.2f} ms"
+    )
+
+
+@patch('app.sensitive_detector.LLMDetector')
+@patch('app.sensitive_detector.RegexDetector')
+def test_detect_with_status_reports_degraded_llm(
+    MockRegexDetector, MockLLMDetector,
+    mock_regex_detector, mock_llm_detector
+):
+    mock_regex_detector.detect.return_value = [{"type": "ID", "value": "85010212345", "label": "PESEL"}]
+    mock_llm_detector.detect_with_status = MagicMock(return_value=([], False))
+    MockRegexDetector.return_value = mock_regex_detector
+    MockLLMDetector.return_value = mock_llm_detector
+
+    detector = SensitiveDataDetector()
+
+    results, complete = detector.detect_with_status("PESEL 85010212345")
+    assert results == [{"type": "ID", "value": "85010212345", "label": "PESEL"}]
+    assert complete is False
+    # Regex-only detection does not depend on the LLM
+    assert detector.detect_with_status("PESEL 85010212345", use_llm=False)[1] is True
+
+    mock_llm_detector.detect_with_status = MagicMock(side_effect=RuntimeError("boom"))
+    assert detector.detect_with_status("PESEL 85010212345")[1] is False